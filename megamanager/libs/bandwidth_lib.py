@@ -0,0 +1,206 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Bandwidth classes. Split one global speed limit between all concurrent transfers.
+###
+
+from contextlib import contextmanager
+from logging import getLogger
+from threading import Condition, Lock
+from time import monotonic, sleep
+
+__author__ = 'szmania'
+
+# KB/s. Transfers wait for other transfers to release share rather than start with less than this, unless an equal
+# split of the limit is smaller.
+BANDWIDTH_MIN_SHARE = 16
+
+
+class TokenBucket(object):
+    def __init__(self, rate, capacity=None):
+        """
+        Token bucket limiting throughput of all callers sharing it to rate. Callers that take more tokens than are
+        available go into debt and sleep it off, so concurrent callers are served in turn.
+
+        Args:
+            rate (float): Tokens added per second. ie: bytes per second.
+            capacity (float): Most tokens bucket holds, which is the largest burst. Defaults to one second of rate.
+        """
+        self.__rate = float(rate)
+        self.__capacity = float(capacity) if capacity else self.__rate
+        self.__tokens = self.__capacity
+        self.__updated = monotonic()
+        self.__lock = Lock()
+
+    def _refill(self):
+        """
+        Add tokens accrued since last update. Must be called holding lock.
+        """
+        now = monotonic()
+        self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+
+    @property
+    def rate(self):
+        """
+        Getter for rate.
+
+        Returns:
+            Float: Tokens added per second.
+        """
+        return self.__rate
+
+    @rate.setter
+    def rate(self, rate):
+        """
+        Setter for rate. Tokens accrued so far are kept.
+
+        Args:
+            rate (float): Tokens added per second.
+        """
+        with self.__lock:
+            self._refill()
+            self.__rate = float(rate)
+            self.__capacity = self.__rate
+
+    def consume(self, amount):
+        """
+        Take tokens from bucket, sleeping until they are paid for.
+
+        Args:
+            amount (int): Number of tokens to take. ie: bytes transferred.
+        """
+        with self.__lock:
+            self._refill()
+            self.__tokens -= amount
+            wait = -self.__tokens / self.__rate if self.__tokens < 0 else 0
+        if wait > 0:
+            sleep(wait)
+
+
+class BandwidthAllocator(object):
+    def __init__(self, speed_limit=None, concurrency=1, log_level='DEBUG'):
+        """
+        Splits one speed limit between all concurrent transfers of a direction (download or upload), over all
+        profiles and backends.
+        Transfers run by external processes (ie: megatools) are given a fixed share of the limit when they start, as
+        their speed can not be changed afterwards. Shares are an equal split of the limit between the planned
+        concurrency of callers (ie: download workers), so the first transfers of a burst do not take the whole limit.
+        Shares never add up to more than the limit. A transfer that would get less than its minimum share waits for
+        another to finish. In-process transfers share one token bucket whose rate is whatever the external processes
+        leave over, so idle share is reassigned to them immediately.
+
+        Args:
+            speed_limit (int): Total speed limit in KB/s. None or 0 for no limit.
+            concurrency (int): Planned number of concurrent transfers, ie: download workers.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__speed_limit = int(speed_limit) if speed_limit else 0
+        self.__min_share = min(BANDWIDTH_MIN_SHARE, self.__speed_limit)
+        self.__concurrency = max(1, concurrency)
+        self.__log_level = log_level
+        self.__process_shares = {}
+        self.__native_count = 0
+        self.__next_id = 0
+        self.__lock = Lock()
+        self.__condition = Condition(self.__lock)
+        self.__bucket = TokenBucket(rate=self.__speed_limit * 1024) if self.__speed_limit else None
+
+    def _update_bucket_rate(self):
+        """
+        Give token bucket of in-process transfers the share left over by external processes. Must be called holding
+        lock.
+        """
+        left_over = self.__speed_limit - sum(self.__process_shares.values())
+        self.__bucket.rate = max(left_over, 1) * 1024
+
+    @property
+    def concurrency(self):
+        """
+        Getter for planned number of concurrent transfers.
+
+        Returns:
+            Integer: Planned concurrent transfers.
+        """
+        return self.__concurrency
+
+    @concurrency.setter
+    def concurrency(self, concurrency):
+        """
+        Setter for planned number of concurrent transfers. Applies to transfers started from then on.
+
+        Args:
+            concurrency (int): Planned concurrent transfers.
+        """
+        with self.__lock:
+            self.__concurrency = max(1, concurrency)
+
+    @property
+    def speed_limit(self):
+        """
+        Getter for total speed limit.
+
+        Returns:
+            Integer: Speed limit in KB/s. 0 for no limit.
+        """
+        return self.__speed_limit
+
+    @contextmanager
+    def native_transfer(self):
+        """
+        Register an in-process transfer for the duration of the with block.
+
+        Returns:
+            function: Throttle to be called with number of bytes transferred, or None if there is no limit.
+        """
+        if not self.__speed_limit:
+            yield None
+            return
+        with self.__lock:
+            self.__native_count += 1
+            self._update_bucket_rate()
+        try:
+            yield self.__bucket.consume
+        finally:
+            with self.__lock:
+                self.__native_count -= 1
+
+    @contextmanager
+    def process_transfer(self):
+        """
+        Register an external process transfer for the duration of the with block, and allot it a share of the limit.
+        Share is an equal split between planned concurrency, or running transfers if there are more, capped at what
+        other processes have not taken. Waits for other processes to finish if that is less than minimum share.
+
+        Returns:
+            int: Speed limit in KB/s to start process with, or None if there is no limit.
+        """
+        logger = getLogger('BandwidthAllocator.process_transfer')
+        logger.setLevel(self.__log_level)
+
+        if not self.__speed_limit:
+            yield None
+            return
+        with self.__condition:
+            while True:
+                slot_count = max(self.__concurrency, len(self.__process_shares) + 1) + (1 if self.__native_count else 0)
+                equal_share = max(1, self.__speed_limit // slot_count)
+                left_over = self.__speed_limit - sum(self.__process_shares.values())
+                share = min(equal_share, left_over)
+                if share >= min(self.__min_share, equal_share) or not self.__process_shares:
+                    share = max(1, share)
+                    break
+                self.__condition.wait()
+            transfer_id = self.__next_id
+            self.__next_id += 1
+            self.__process_shares[transfer_id] = share
+            self._update_bucket_rate()
+        logger.debug(' Allotted {} KB/s of {} KB/s to transfer.'.format(share, self.__speed_limit))
+        try:
+            yield share
+        finally:
+            with self.__condition:
+                del self.__process_shares[transfer_id]
+                self._update_bucket_rate()
+                self.__condition.notify_all()
@@ -3,15 +3,31 @@
 # Date: 6/5/2017
 # Initial Creation.
 ###
+from io import BytesIO
+from libs.file_hasher_lib import get_hash_object
 from libs.lib import Lib
 from logging import getLogger
-from os import path
+from os import access, makedirs, path, W_OK
+from PIL import Image, ImageFile
 from re import IGNORECASE, match
+from shutil import which
+from subprocess import PIPE, run, STDOUT
+from tempfile import TemporaryDirectory
 from tools.compressImages import CompressImage, DeleteBackupImage
 # from tools import CompressImage, DeleteBackupImage
 
 __author__ = 'szmania'
 
+IMAGE_REENCODE_QUALITY_PERCENTAGE = 90  # Quality images are re-encoded at by PIL, before jpegoptim.
+JPEG_MAX_SEARCH_QUALITY_PERCENTAGE = 95  # Highest quality tried in target size mode.
+JPEG_MIN_QUALITY_PERCENTAGE = 40  # Lowest quality tried in target size mode.
+PNG_MIN_PALETTE_COLORS = 16  # Fewest palette colors tried in target size mode.
+# Luminance quantization table of the JPEG standard (Annex K), scaled by encoders according to quality.
+JPEG_STANDARD_LUMINANCE_QUANTIZATION_TABLE = (
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55, 14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62, 18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99)
+
 
 class CompressImages_Lib:
     def __init__(self, log_level='DEBUG'):
@@ -27,6 +43,196 @@ class CompressImages_Lib:
         self.__compress_images_obj = CompressImage()
         self.__deleteBackupImageObj = DeleteBackupImage()
         self.__lib = Lib(log_level=self.__log_level)
+        self.__jpegoptim_missing = False
+
+    def _get_target_size(self, orig_size, pixels, target_bytes_per_megapixel, target_saving_percentage):
+        """
+        Get size image should be compressed to in target size mode. If both targets are set, smaller size is used.
+
+        Args:
+            orig_size (int): Size of image file in bytes.
+            pixels (int): Pixels of image, from its header.
+            target_bytes_per_megapixel (int): Target bytes per megapixel. 0 for none.
+            target_saving_percentage (int): Target percentage of file size to save. 0 for none.
+
+        Returns:
+            Integer: Target size in bytes, or None if target size mode is off.
+        """
+        target_sizes = []
+        if target_bytes_per_megapixel:
+            target_sizes.append(target_bytes_per_megapixel * pixels / 1000000)
+        if target_saving_percentage:
+            target_sizes.append(orig_size * (100 - target_saving_percentage) / 100)
+        return int(min(target_sizes)) if target_sizes else None
+
+    def _optimize_jpeg_files(self, datas, quality_percentage):
+        """
+        Optimize JPEG data of many files with a single jpegoptim run, parsing result of each file from its output.
+
+        Args:
+            datas (list): JPEG data of each file.
+            quality_percentage (int): Maximum quality percentage of output.
+
+        Returns:
+            List: Optimized JPEG data of each file, or its input data if it was skipped as not worth optimizing. None
+                for files jpegoptim rejected, ie: as corrupt.
+
+        Raises:
+            OSError: If jpegoptim could not be run.
+        """
+        logger = getLogger('CompressImages_Lib._optimize_jpeg_files')
+        logger.setLevel(self.__log_level)
+
+        optimized_datas = []
+        for data, (lines, out_data) in zip(datas, self._run_batch_optimizer(
+                args=['jpegoptim', '--max={}'.format(quality_percentage), '--dest={dest}'], datas=datas,
+                extension='jpg')):
+            if 'optimized' in lines and out_data:
+                optimized_datas.append(out_data)
+            elif 'skipped' in lines:
+                optimized_datas.append(data)
+            else:
+                logger.debug(' jpegoptim could not optimize JPEG data: {}'.format(lines.strip()))
+                optimized_datas.append(None)
+        return optimized_datas
+
+    def _optimize_png_files(self, datas):
+        """
+        Optimize PNG data of many files losslessly with a single optipng run, if optipng is installed.
+
+        Args:
+            datas (list): PNG data of each file.
+
+        Returns:
+            List: Optimized PNG data of each file, or its input data if it could not be optimized.
+        """
+        if not which('optipng'):
+            return datas
+        return [out_data if out_data else data for data, (lines, out_data) in zip(datas, self._run_batch_optimizer(
+            args=['optipng', '-quiet', '-o2', '-dir', '{dest}'], datas=datas, extension='png'))]
+
+    def _run_batch_optimizer(self, args, datas, extension):
+        """
+        Run optimizer command once on many files. Data of each file is written to a temporary directory, and command
+        writes optimized files into another one, so input files are never modified in place.
+
+        Args:
+            args (list): Command and its arguments. "{dest}" is replaced by output directory. Input file paths are
+                appended.
+            datas (list): Data of each file.
+            extension (str): Extension of temporary files.
+
+        Returns:
+            List: Tuple of output lines mentioning each file, and data of its output file or None if not written.
+
+        Raises:
+            OSError: If command could not be run.
+        """
+        logger = getLogger('CompressImages_Lib._run_batch_optimizer')
+        logger.setLevel(self.__log_level)
+
+        with TemporaryDirectory(prefix='megamanager_optimize_') as temp_dir_path:
+            in_dir_path = path.join(temp_dir_path, 'in')
+            dest_dir_path = path.join(temp_dir_path, 'out')
+            makedirs(in_dir_path)
+            makedirs(dest_dir_path)
+            in_file_paths = []
+            for index, data in enumerate(datas):
+                in_file_paths.append(path.join(in_dir_path, '{}.{}'.format(index, extension)))
+                with open(in_file_paths[-1], 'wb') as f:
+                    f.write(data)
+            command = [arg.replace('{dest}', dest_dir_path) for arg in args] + in_file_paths
+            logger.debug(' Running "{}" on {} files.'.format(args[0], len(datas)))
+            proc = run(command, stdout=PIPE, stderr=STDOUT)
+            output_lines = proc.stdout.decode('utf-8', errors='replace').splitlines()
+
+            results = []
+            for in_file_path in in_file_paths:
+                out_file_path = path.join(dest_dir_path, path.basename(in_file_path))
+                out_data = None
+                if path.isfile(out_file_path):
+                    with open(out_file_path, 'rb') as f:
+                        out_data = f.read()
+                results.append(('\n'.join(line for line in output_lines if in_file_path in line), out_data))
+            return results
+
+    def _search_jpeg_quality(self, image, target_size, min_quality_percentage, max_quality_percentage):
+        """
+        Binary search highest JPEG quality whose encode fits target size. Image is encoded into memory only, and
+        decoded once, on first encode.
+
+        Args:
+            image (PIL.Image.Image): JPEG image, as opened by PIL.
+            target_size (int): Target size in bytes.
+            min_quality_percentage (int): Lowest quality tried.
+            max_quality_percentage (int): Highest quality tried.
+
+        Returns:
+            Tuple: Quality and data of winning encode. Encode at lowest quality if none fits target size.
+        """
+        logger = getLogger('CompressImages_Lib._search_jpeg_quality')
+        logger.setLevel(self.__log_level)
+
+        best_encode = None
+        low_quality = min_quality_percentage
+        high_quality = max(min_quality_percentage, max_quality_percentage)
+        while low_quality <= high_quality:
+            quality = (low_quality + high_quality) // 2
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=quality, optimize=True)
+            logger.debug(' Quality {}%: {} bytes, target {} bytes.'.format(quality, buffer.tell(), target_size))
+            if buffer.tell() <= target_size:
+                best_encode = (quality, buffer.getvalue())
+                low_quality = quality + 1
+            else:
+                high_quality = quality - 1
+        if best_encode is None:
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=min_quality_percentage, optimize=True)
+            best_encode = (min_quality_percentage, buffer.getvalue())
+        return best_encode
+
+    def _search_png_palette(self, image, target_size):
+        """
+        Search PNG encode that fits target size. Image is first encoded losslessly at highest zlib level. If that does
+        not fit, most palette colors whose encode fits are binary searched. Image is encoded into memory only.
+
+        Args:
+            image (PIL.Image.Image): PNG image, as opened by PIL.
+            target_size (int): Target size in bytes.
+
+        Returns:
+            Tuple: Palette colors, None if lossless, and data of winning encode. Encode with fewest palette colors if
+                none fits target size.
+        """
+        logger = getLogger('CompressImages_Lib._search_png_palette')
+        logger.setLevel(self.__log_level)
+
+        buffer = BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+        logger.debug(' Lossless: {} bytes, target {} bytes.'.format(buffer.tell(), target_size))
+        if buffer.tell() <= target_size or image.mode not in ('RGB', 'RGBA'):
+            return None, buffer.getvalue()
+
+        best_encode = None
+        low_colors = PNG_MIN_PALETTE_COLORS
+        high_colors = 256
+        while low_colors <= high_colors:
+            colors = (low_colors + high_colors) // 2
+            buffer = BytesIO()
+            image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE).save(buffer, format='PNG', optimize=True)
+            logger.debug(' {} colors: {} bytes, target {} bytes.'.format(colors, buffer.tell(), target_size))
+            if buffer.tell() <= target_size:
+                best_encode = (colors, buffer.getvalue())
+                low_colors = colors + 1
+            else:
+                high_colors = colors - 1
+        if best_encode is None:
+            buffer = BytesIO()
+            image.quantize(colors=PNG_MIN_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE).save(
+                buffer, format='PNG', optimize=True)
+            best_encode = (PNG_MIN_PALETTE_COLORS, buffer.getvalue())
+        return best_encode
 
     def compress_image_file(self, file_path, jpeg_compression_quality_percentage, delete_backup=False,
                             delete_corrupt_images=False):
@@ -75,6 +281,195 @@ class CompressImages_Lib:
         logger.debug(' Error, image file "%s" NOT compressed successfully!' % file_path)
         return False
 
+    def compress_image_file_in_memory(self, file_path, jpeg_compression_quality_percentage, hash_algorithm='md5',
+                                      delete_corrupt_images=False, target_bytes_per_megapixel=0,
+                                      target_saving_percentage=0,
+                                      min_jpeg_quality_percentage=JPEG_MIN_QUALITY_PERCENTAGE):
+        """
+        Compress image file in a single pass. See compress_image_files_in_memory.
+
+        Args:
+            file_path (str): File path of image to compress.
+            jpeg_compression_quality_percentage (int): Quality percentage compression for jpeg files.
+            hash_algorithm (str): Hash algorithm of digest, one of HASH_ALGORITHMS of file_hasher_lib.
+            delete_corrupt_images (bool): Delete JPEG files that neither PIL nor jpegoptim can read.
+            target_bytes_per_megapixel (int): Target bytes per megapixel of target size mode. 0 for none.
+            target_saving_percentage (int): Target percentage of file size to save of target size mode. 0 for none.
+            min_jpeg_quality_percentage (int): Lowest JPEG quality of target size mode.
+
+        Returns:
+            Tuple: Whether compression operation was successful or not, hex digest of file, and bytes saved. Digest
+                is None if file could not be read or was deleted.
+        """
+        return self.compress_image_files_in_memory(
+            file_paths=[file_path], jpeg_compression_quality_percentage=jpeg_compression_quality_percentage,
+            hash_algorithm=hash_algorithm, delete_corrupt_images=delete_corrupt_images,
+            target_bytes_per_megapixel=target_bytes_per_megapixel, target_saving_percentage=target_saving_percentage,
+            min_jpeg_quality_percentage=min_jpeg_quality_percentage)[0]
+
+    def compress_image_files_in_memory(self, file_paths, jpeg_compression_quality_percentage, hash_algorithm='md5',
+                                       delete_corrupt_images=False, target_bytes_per_megapixel=0,
+                                       target_saving_percentage=0,
+                                       min_jpeg_quality_percentage=JPEG_MIN_QUALITY_PERCENTAGE):
+        """
+        Compress image files, each in a single pass. Each file is read and decoded once and encoded again into memory.
+        JPEG data of all files is then optimized by a single jpegoptim run, and PNG data by a single optipng run if
+        installed. A file is only replaced if result is smaller, by writing a temporary file and moving it over file.
+        Digest is computed from data that ends up in file, so file is not read again.
+        Quality of JPEG files is estimated from their header first, without decoding pixels. Files at or below jpeg
+        compression quality are already optimal, and are neither decoded nor optimized. They are reported as
+        compressed, so they are recorded in compressed ledger and never opened again. Files at or below re-encode
+        quality are only optimized by jpegoptim, as re-encoding them would only lose detail.
+        In target size mode, when a target bytes per megapixel or saving percentage is set, JPEG quality and PNG palette
+        colors are instead binary searched in memory for the best encode that fits target size, and only that encode
+        is written. Files already within target size, or JPEG files at or below lowest quality, are not decoded.
+
+        Args:
+            file_paths (list): File paths of images to compress.
+            jpeg_compression_quality_percentage (int): Quality percentage compression for jpeg files.
+            hash_algorithm (str): Hash algorithm of digest, one of HASH_ALGORITHMS of file_hasher_lib.
+            delete_corrupt_images (bool): Delete JPEG files that neither PIL nor jpegoptim can read.
+            target_bytes_per_megapixel (int): Target bytes per megapixel of target size mode. 0 for none.
+            target_saving_percentage (int): Target percentage of file size to save of target size mode. 0 for none.
+            min_jpeg_quality_percentage (int): Lowest JPEG quality of target size mode.
+
+        Returns:
+            List: Tuple for each file of whether compression operation was successful or not, hex digest of file, and
+                bytes saved. Digest is None if file could not be read or was deleted.
+        """
+        logger = getLogger('CompressImages_Lib.compress_image_files_in_memory')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Compressing {} image files in memory.'.format(len(file_paths)))
+
+        images = []
+        for file_path in file_paths:
+            try:
+                with open(file_path, 'rb') as f:
+                    orig_data = f.read()
+            except OSError as e:
+                logger.warning(' Could not read image file "{}". Exception: {}'.format(file_path, e))
+                images.append(None)
+                continue
+            image = {'file_path': file_path, 'orig_data': orig_data, 'data': orig_data, 'format': None,
+                     'done': False, 'results': []}
+            images.append(image)
+            try:
+                # Only header is parsed here. Pixels are decoded once saved.
+                decoded_image = Image.open(BytesIO(orig_data))
+                image['format'] = decoded_image.format
+                quality = self.estimate_jpeg_quality(image=decoded_image) if image['format'] == 'JPEG' else None
+                target_size = self._get_target_size(
+                    orig_size=len(orig_data), pixels=decoded_image.size[0] * decoded_image.size[1],
+                    target_bytes_per_megapixel=target_bytes_per_megapixel,
+                    target_saving_percentage=target_saving_percentage) if image['format'] in ('JPEG', 'PNG') else None
+                if target_size is not None and (len(orig_data) <= target_size or (
+                        quality is not None and quality <= min_jpeg_quality_percentage)):
+                    logger.debug(' Image file "{}" {}x{} already optimal, {} bytes, target {} bytes.'.format(
+                        file_path, decoded_image.size[0], decoded_image.size[1], len(orig_data), target_size))
+                    image['done'] = True
+                    image['results'].append(True)
+                elif target_size is not None:
+                    # This line avoids problems that can arise saving larger JPEG files with PIL
+                    ImageFile.MAXBLOCK = max(ImageFile.MAXBLOCK, decoded_image.size[0] * decoded_image.size[1])
+                    if image['format'] == 'JPEG':
+                        quality, data = self._search_jpeg_quality(
+                            image=decoded_image, target_size=target_size,
+                            min_quality_percentage=min_jpeg_quality_percentage,
+                            max_quality_percentage=min(quality or 100, JPEG_MAX_SEARCH_QUALITY_PERCENTAGE))
+                        setting = 'quality {}%'.format(quality)
+                    else:
+                        colors, data = self._search_png_palette(image=decoded_image, target_size=target_size)
+                        setting = '{} colors'.format(colors) if colors else 'lossless'
+                    logger.debug(' Encoded image file "{}" at {} to {} bytes, target {} bytes.'.format(
+                        file_path, setting, len(data), target_size))
+                    image['done'] = True
+                    image['results'].append(len(data) < len(orig_data))
+                    if image['results'][-1]:
+                        image['data'] = data
+                elif quality is not None and quality <= jpeg_compression_quality_percentage:
+                    logger.debug(' JPEG image file "{}" {}x{} already optimal, quality estimated at {}%.'.format(
+                        file_path, decoded_image.size[0], decoded_image.size[1], quality))
+                    image['done'] = True
+                    image['results'].append(True)
+                elif quality is not None and quality <= IMAGE_REENCODE_QUALITY_PERCENTAGE:
+                    logger.debug(' JPEG image file "{}" quality estimated at {}%. Not re-encoding.'.format(
+                        file_path, quality))
+                elif image['format'] in ('JPEG', 'PNG'):
+                    # This line avoids problems that can arise saving larger JPEG files with PIL
+                    ImageFile.MAXBLOCK = max(ImageFile.MAXBLOCK, decoded_image.size[0] * decoded_image.size[1])
+                    buffer = BytesIO()
+                    # The 'quality' option is ignored for PNG files
+                    decoded_image.save(buffer, format=image['format'], quality=IMAGE_REENCODE_QUALITY_PERCENTAGE,
+                                       optimize=True)
+                    image['results'].append(buffer.tell() < len(orig_data))
+                    if image['results'][-1]:
+                        image['data'] = buffer.getvalue()
+                    else:
+                        logger.debug(' Cannot further compress "{}".'.format(file_path))
+                else:
+                    logger.debug(' Ignoring file "{}" with unsupported format {}.'.format(file_path, image['format']))
+            except Exception as e:
+                logger.debug(' Could not decode image file "{}". Exception: {}'.format(file_path, e))
+
+        jpeg_images = [image for image in images
+                       if image and not image['done'] and
+                       match('jpe{0,1}g', image['file_path'].split('.')[-1], IGNORECASE)]
+        if jpeg_images:
+            try:
+                optimized_datas = self._optimize_jpeg_files(datas=[image['data'] for image in jpeg_images],
+                                                            quality_percentage=jpeg_compression_quality_percentage)
+                for image, optimized_data in zip(jpeg_images, optimized_datas):
+                    image['results'].append(optimized_data is not None)
+                    if optimized_data is None and image['format'] is None and delete_corrupt_images:
+                        logger.debug(' Deleting CORRUPT JPEG or JPG image file: "{}"'.format(image['file_path']))
+                        self.__lib.delete_local_file(file_path=image['file_path'])
+                        image['data'] = None
+                    elif optimized_data is not None and len(optimized_data) < len(image['data']):
+                        image['data'] = optimized_data
+            except OSError as e:
+                if not self.__jpegoptim_missing:
+                    logger.warning(' Could not run jpegoptim. JPEG files are only re-encoded. Exception: {}'.format(e))
+                self.__jpegoptim_missing = True
+
+        png_images = [image for image in images if image and not image['done'] and image['format'] == 'PNG']
+        if png_images:
+            try:
+                for image, optimized_data in zip(png_images, self._optimize_png_files(
+                        datas=[image['data'] for image in png_images])):
+                    if len(optimized_data) < len(image['data']):
+                        image['data'] = optimized_data
+                        image['results'].append(True)
+            except OSError as e:
+                logger.warning(' Could not run optipng. Exception: {}'.format(e))
+
+        results = []
+        for image in images:
+            if image is None or image['data'] is None:
+                results.append((False, None, 0))
+                continue
+            file_path = image['file_path']
+            orig_data = image['orig_data']
+            data = image['data']
+            if len(data) < len(orig_data):
+                if not access(file_path, W_OK):
+                    logger.debug(' Ignoring read-only file "{}".'.format(file_path))
+                    data = orig_data
+                    image['results'] = []
+                elif not self.__lib.write_file_atomically(file_path=file_path, data=data):
+                    data = orig_data
+                    image['results'] = []
+
+            hash_object = get_hash_object(hash_algorithm)
+            hash_object.update(data)
+            if True in image['results']:
+                logger.debug(' Success, image file "{}" compressed successfully. Saved {} bytes.'.format(
+                    file_path, len(orig_data) - len(data)))
+                results.append((True, hash_object.hexdigest(), len(orig_data) - len(data)))
+            else:
+                logger.debug(' Error, image file "%s" NOT compressed successfully!' % file_path)
+                results.append((False, hash_object.hexdigest(), 0))
+        return results
+
     def compress_jpeg_image_file(self, file_path, quality_percentage):
         """
         Compress images file.
@@ -139,3 +534,25 @@ class CompressImages_Lib:
         else:
             logger.error(' Error, could NOT remove backup image compression files in direcotry "%s"' % dirPath)
             return False
+
+    def estimate_jpeg_quality(self, image):
+        """
+        Estimate quality percentage JPEG image was encoded at, from its luminance quantization table, without decoding
+        pixels. Table is compared to standard table, scaled the way libjpeg scales it for a quality.
+
+        Args:
+            image (PIL.Image.Image): JPEG image, as opened by PIL.
+
+        Returns:
+            Integer: Estimated quality percentage, 1 to 100. None if image has no usable quantization table.
+        """
+        logger = getLogger('CompressImages_Lib.estimate_jpeg_quality')
+        logger.setLevel(self.__log_level)
+
+        table = getattr(image, 'quantization', None) or {}
+        if not table.get(0) or len(table[0]) != len(JPEG_STANDARD_LUMINANCE_QUANTIZATION_TABLE):
+            logger.debug(' No luminance quantization table found.')
+            return None
+        scale = sum(table[0]) * 100.0 / sum(JPEG_STANDARD_LUMINANCE_QUANTIZATION_TABLE)
+        quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+        return int(min(100, max(1, round(quality))))
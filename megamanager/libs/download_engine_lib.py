@@ -0,0 +1,209 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Download engine class. Fetches missing and outdated remote files through a bounded pool of workers.
+###
+
+from .remote_snapshot_lib import REMOTE_TYPE_DIR, REMOTE_TYPE_FILE
+from .upload_planner_lib import MEGA_TEMP_FILE_MARKER
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from os import makedirs, path, remove, replace, stat
+from threading import BoundedSemaphore, Lock
+
+__author__ = 'szmania'
+
+DOWNLOAD_WORKERS = 4  # Concurrent downloads, over all accounts.
+ACCOUNT_DOWNLOAD_WORKERS = 2  # Concurrent downloads per account.
+# Outdated local files are downloaded next to themselves first, and only replaced once complete.
+DOWNLOAD_TEMP_FILE_SUFFIX = MEGA_TEMP_FILE_MARKER + 'download'
+
+
+class DownloadTask(object):
+    __slots__ = ('remote_path', 'local_path', 'size', 'replace_local', 'mtime')
+
+    def __init__(self, remote_path, local_path, size, replace_local=False, mtime=0):
+        """
+        Remote file to download.
+
+        Args:
+            remote_path (str): Remote file path.
+            local_path (str): Local file path to download to.
+            size (int): Remote file size in bytes.
+            replace_local (bool): Whether an outdated local file is replaced.
+            mtime (int): Remote file modified time in seconds since epoch.
+        """
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.size = size
+        self.replace_local = replace_local
+        self.mtime = mtime
+
+    def __repr__(self):
+        return 'DownloadTask(%r, %r, %r, %r, %r)' % (self.remote_path, self.local_path, self.size, self.replace_local,
+                                                     self.mtime)
+
+
+class DownloadEngine(object):
+    def __init__(self, max_workers=DOWNLOAD_WORKERS, max_account_workers=ACCOUNT_DOWNLOAD_WORKERS, log_level='DEBUG'):
+        """
+        Downloads files through one bounded pool of workers shared by all profiles. Each account additionally has its
+        own cap on concurrent downloads, so one large account cannot take every worker.
+
+        Args:
+            max_workers (int): Maximum concurrent downloads over all accounts.
+            max_account_workers (int): Maximum concurrent downloads per account.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__max_workers = max(1, max_workers)
+        self.__max_account_workers = max(1, min(max_account_workers, self.__max_workers))
+        self.__log_level = log_level
+        self.__executor = ThreadPoolExecutor(max_workers=self.__max_workers, thread_name_prefix='download')
+        self.__account_semaphores = {}
+        self.__account_semaphores_lock = Lock()
+
+    def _download_task(self, backend, username, password, task):
+        """
+        Download a single task. Outdated local files are only replaced once the new file is complete. Tasks whose
+        local file is already in place, ie: resumed from transfer queue after an interrupted run, are not downloaded
+        again.
+
+        Args:
+            backend (StorageBackend): Backend of account.
+            username (str): username of account to download from
+            password (str): password of account to download from
+            task (DownloadTask): Task to download.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('DownloadEngine._download_task')
+        logger.setLevel(self.__log_level)
+
+        try:
+            if path.isfile(task.local_path) and (not task.replace_local or path.getsize(task.local_path) == task.size):
+                logger.debug(' Local file already in place. Skipping "{}".'.format(task.local_path))
+                return True
+            makedirs(path.dirname(task.local_path) or '.', exist_ok=True)
+            if not task.replace_local:
+                return bool(backend.download_file(username=username, password=password, localFilePath=task.local_path,
+                                                  remoteFilePath=task.remote_path))
+
+            temp_file_path = task.local_path + DOWNLOAD_TEMP_FILE_SUFFIX
+            if path.exists(temp_file_path):
+                remove(temp_file_path)
+            if not backend.download_file(username=username, password=password, localFilePath=temp_file_path,
+                                         remoteFilePath=task.remote_path):
+                return False
+            replace(temp_file_path, task.local_path)
+            return True
+        except Exception as e:
+            logger.warning(' Could not download "{}". Exception: {}'.format(task.remote_path, e))
+            return False
+
+    def _get_account_semaphore(self, username):
+        """
+        Get semaphore capping concurrent downloads of account.
+
+        Args:
+            username (str): username of account.
+
+        Returns:
+            BoundedSemaphore: Semaphore of account.
+        """
+        with self.__account_semaphores_lock:
+            semaphore = self.__account_semaphores.get(username)
+            if semaphore is None:
+                semaphore = BoundedSemaphore(self.__max_account_workers)
+                self.__account_semaphores[username] = semaphore
+            return semaphore
+
+    def close(self):
+        """
+        Cancel queued downloads and stop workers. Running downloads are not waited for.
+        """
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def download(self, backend, username, password, tasks):
+        """
+        Download tasks through worker pool. Blocks until all tasks are done. Tasks are only handed to the pool while
+        account is below its concurrency cap, so waiting tasks never hold a worker.
+
+        Args:
+            backend (StorageBackend): Backend of account.
+            username (str): username of account to download from
+            password (str): password of account to download from
+            tasks (list): DownloadTasks to download.
+
+        Returns:
+            List: DownloadTasks that failed.
+        """
+        logger = getLogger('DownloadEngine.download')
+        logger.setLevel(self.__log_level)
+
+        semaphore = self._get_account_semaphore(username=username)
+        futures = []
+        for task in tasks:
+            semaphore.acquire()
+            try:
+                future = self.__executor.submit(self._download_task, backend, username, password, task)
+            except Exception:
+                semaphore.release()
+                raise
+            future.add_done_callback(lambda done_future: semaphore.release())
+            futures.append((task, future))
+
+        failed_tasks = [task for task, future in futures if not future.result()]
+        logger.debug(' Downloaded {} of {} files for account "{}".'.format(len(tasks) - len(failed_tasks), len(tasks),
+                                                                          username))
+        return failed_tasks
+
+    def plan(self, local_root, remote_root, remote_snapshot, local_index=None):
+        """
+        Work out which remote files to download from remote snapshot. Remote files missing locally are downloaded.
+        Remote files whose size differs from their local counterpart and that are newer replace it, but only if
+        snapshot comes from a live listing.
+
+        Args:
+            local_root (str): Local root path to download to.
+            remote_root (str): Remote root path to download from.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root.
+            local_index (LocalIndex): Index to stat local files from. Stated on disk if None.
+
+        Returns:
+            Tuple: List of local directories to create, and list of DownloadTasks.
+        """
+        logger = getLogger('DownloadEngine.plan')
+        logger.setLevel(self.__log_level)
+
+        local_dirs = []
+        tasks = []
+        remote_root = remote_root.rstrip('/')
+        prefix_length = len(remote_root) + 1
+        stat_local_file = local_index.stat if local_index else stat
+        for handle, parent, remote_type, size, mtime, remote_path in remote_snapshot.iter_entries():
+            if not remote_path.startswith(remote_root + '/') or '?' in remote_path:
+                continue
+            local_path = path.join(local_root, *remote_path[prefix_length:].split('/'))
+            if remote_type == REMOTE_TYPE_DIR:
+                if not path.isdir(local_path):
+                    local_dirs.append(local_path)
+                continue
+            if remote_type != REMOTE_TYPE_FILE:
+                continue
+
+            try:
+                local_stat = stat_local_file(local_path)
+            except OSError:
+                tasks.append(DownloadTask(remote_path=remote_path, local_path=local_path, size=size, mtime=mtime))
+                continue
+            if remote_snapshot.verified and local_stat.st_size != size and int(local_stat.st_mtime) < mtime:
+                tasks.append(DownloadTask(remote_path=remote_path, local_path=local_path, size=size,
+                                          replace_local=True, mtime=mtime))
+
+        local_dirs.sort(key=len)
+        logger.debug(' Download plan for "{}": {} files ({} bytes), {} outdated, {} directories to create.'.format(
+            remote_root, len(tasks), sum(task.size for task in tasks), sum(1 for task in tasks if task.replace_local),
+            len(local_dirs)))
+        return local_dirs, tasks
@@ -0,0 +1,194 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# File hasher class. Hashes file contents with large reads, several files at a time.
+###
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b, md5
+from logging import getLogger
+import os
+from threading import Lock
+from time import perf_counter
+
+__author__ = 'szmania'
+
+HASH_ALGORITHM = 'md5'
+HASH_ALGORITHMS = ('md5', 'blake2b')  # blake2b digests are 16 bytes, same as md5, and usually faster to compute.
+HASH_BUFFER_SIZE = 1024 * 1024  # Bytes read at a time. hashlib releases the GIL while hashing buffers this large.
+HASH_WORKERS = 4  # Files hashed concurrently.
+HASH_DROP_CACHE_MIN_SIZE = 64 * 1024 * 1024  # Files at least this large are dropped from page cache once hashed.
+
+
+def get_hash_object(algorithm):
+    """
+    Get new hash object of algorithm.
+
+    Args:
+        algorithm (str): Hash algorithm, one of HASH_ALGORITHMS.
+
+    Returns:
+        Object: hashlib hash object.
+    """
+    if algorithm == 'md5':
+        return md5()
+    if algorithm == 'blake2b':
+        return blake2b(digest_size=16)
+    raise ValueError('Unsupported hash algorithm "{}". Supported: {}'.format(algorithm, ', '.join(HASH_ALGORITHMS)))
+
+
+class FileHasher(object):
+    def __init__(self, algorithm=HASH_ALGORITHM, buffer_size=HASH_BUFFER_SIZE, workers=HASH_WORKERS,
+                 log_level='DEBUG'):
+        """
+        Hashes file contents. Files are read sequentially in large buffers, hinting the kernel to read ahead, and large
+        files are dropped from page cache once hashed so hashing videos does not evict everything else. Several files
+        are hashed at a time, as hashlib releases the GIL.
+
+        Args:
+            algorithm (str): Hash algorithm, one of HASH_ALGORITHMS.
+            buffer_size (int): Bytes read at a time.
+            workers (int): Files hashed concurrently.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        get_hash_object(algorithm)
+        self.__algorithm = algorithm
+        self.__buffer_size = max(4096, buffer_size)
+        self.__workers = max(1, workers)
+        self.__log_level = log_level
+        self.__lock = Lock()
+        self.__bytes_hashed = 0
+        self.__files_hashed = 0
+        self.__seconds = 0.0
+
+    def _hash_file(self, file_path, algorithms):
+        """
+        Hash file with each algorithm, reading it once.
+
+        Args:
+            file_path (str): File path.
+            algorithms (tuple): Hash algorithms.
+
+        Returns:
+            Tuple: Hex digest of each algorithm.
+        """
+        hash_objects = [get_hash_object(algorithm) for algorithm in algorithms]
+        buffer = bytearray(self.__buffer_size)
+        view = memoryview(buffer)
+        start_time = perf_counter()
+        size = 0
+        with open(file_path, 'rb', buffering=0) as f:
+            fd = f.fileno()
+            fadvise = getattr(os, 'posix_fadvise', None)
+            if fadvise:
+                fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                read_size = f.readinto(buffer)
+                if not read_size:
+                    break
+                chunk = view[:read_size]
+                for hash_object in hash_objects:
+                    hash_object.update(chunk)
+                size += read_size
+            if fadvise and size >= HASH_DROP_CACHE_MIN_SIZE:
+                fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        seconds = perf_counter() - start_time
+        with self.__lock:
+            self.__bytes_hashed += size
+            self.__files_hashed += 1
+            self.__seconds += seconds
+        return tuple(hash_object.hexdigest() for hash_object in hash_objects)
+
+    @property
+    def algorithm(self):
+        """
+        Getter for hash algorithm.
+
+        Returns:
+            String: Hash algorithm.
+        """
+        return self.__algorithm
+
+    def get_stats(self):
+        """
+        Get totals of files hashed since last reset.
+
+        Returns:
+            Tuple: Files hashed, bytes hashed, and throughput in MB/s of time spent hashing, summed over threads.
+        """
+        with self.__lock:
+            throughput = self.__bytes_hashed / self.__seconds / 1000000 if self.__seconds else 0.0
+            return self.__files_hashed, self.__bytes_hashed, throughput
+
+    def hash_file(self, file_path, algorithms=None):
+        """
+        Hash file.
+
+        Args:
+            file_path (str): File path.
+            algorithms (tuple): Hash algorithms, computed in a single read. Defaults to algorithm of hasher.
+
+        Returns:
+            String: Hex digest, or tuple of hex digests if algorithms given. False on failure.
+        """
+        logger = getLogger('FileHasher.hash_file')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Getting {} hash of file: "{}"'.format('/'.join(algorithms or (self.__algorithm,)), file_path))
+
+        try:
+            digests = self._hash_file(file_path=file_path, algorithms=algorithms or (self.__algorithm,))
+        except OSError as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+        return digests if algorithms else digests[0]
+
+    def hash_files(self, file_paths, hash_function=None):
+        """
+        Hash files concurrently. Digests are yielded in order of file paths, as soon as each is ready, so caller can
+        work on the first files while later ones are hashed. Logs throughput once done.
+
+        Args:
+            file_paths (iterable): File paths.
+            hash_function (function): Called with file path in worker thread, returning digest, ie: to look up a hash
+                cache first. Defaults to hash_file.
+
+        Returns:
+            Generator: Tuple of file path and digest, False on failure.
+        """
+        logger = getLogger('FileHasher.hash_files')
+        logger.setLevel(self.__log_level)
+
+        hash_function = hash_function if hash_function else self.hash_file
+        start_time = perf_counter()
+        start_files, start_bytes, _ = self.get_stats()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='hasher') as executor:
+            try:
+                for file_path in file_paths:
+                    pending.append((file_path, executor.submit(hash_function, file_path)))
+                    if len(pending) >= self.__workers * 4:
+                        file_path, future = pending.popleft()
+                        yield file_path, future.result()
+                while pending:
+                    file_path, future = pending.popleft()
+                    yield file_path, future.result()
+            finally:
+                for file_path, future in pending:
+                    future.cancel()
+        files_hashed, bytes_hashed, _ = self.get_stats()
+        seconds = perf_counter() - start_time
+        if files_hashed > start_files:
+            logger.info(' Hashed {} files, {:.1f} MB in {:.1f} seconds ({:.1f} MB/s, {} workers).'.format(
+                files_hashed - start_files, (bytes_hashed - start_bytes) / 1000000, seconds,
+                (bytes_hashed - start_bytes) / 1000000 / seconds if seconds else 0.0, self.__workers))
+
+    def reset_stats(self):
+        """
+        Reset totals of files hashed.
+        """
+        with self.__lock:
+            self.__bytes_hashed = 0
+            self.__files_hashed = 0
+            self.__seconds = 0.0
@@ -0,0 +1,295 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# File watcher class. Watches local trees for changes with inotify, falling back to polling.
+###
+
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from errno import ENOSPC
+from logging import getLogger
+from os import close, fsdecode, fsencode, path, read, scandir, sep, strerror
+from platform import system
+from select import POLLIN, poll
+from struct import calcsize, unpack_from
+from time import monotonic, sleep
+
+__author__ = 'szmania'
+
+WATCH_DEBOUNCE_SECONDS = 2  # Changes are reported once no further event arrived for this long.
+WATCH_MAX_DELAY_SECONDS = 30  # Changes are reported at most this long after their first event, even if events go on.
+WATCH_POLL_INTERVAL_SECONDS = 30  # Seconds between reporting roots as changed, when polling.
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+# Written files are reported once closed, not on every write.
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | \
+    IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+INOTIFY_EVENT_FORMAT = 'iIII'
+INOTIFY_EVENT_SIZE = calcsize(INOTIFY_EVENT_FORMAT)
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+class FileWatcher(object):
+    def __init__(self, debounce_seconds=WATCH_DEBOUNCE_SECONDS, max_delay_seconds=WATCH_MAX_DELAY_SECONDS,
+                 poll_interval_seconds=WATCH_POLL_INTERVAL_SECONDS, log_level='DEBUG'):
+        """
+        Watches local directory trees and reports directories whose entries changed. Uses inotify on Linux, with one
+        watch per directory. Where inotify is unavailable, or watches run out, watcher falls back to polling:
+        watched roots are reported as changed every poll interval, for caller to rescan.
+
+        Args:
+            debounce_seconds (float): Seconds without events after which changes are reported.
+            max_delay_seconds (float): Most seconds changes are held back for, while events keep arriving.
+            poll_interval_seconds (float): Seconds between reports of roots, when polling.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__debounce_seconds = debounce_seconds
+        self.__max_delay_seconds = max_delay_seconds
+        self.__poll_interval_seconds = poll_interval_seconds
+        self.__log_level = log_level
+        self.__root_paths = []
+        self.__watch_paths = {}
+        self.__fd = None
+        self.__poller = None
+        self.__libc = None
+        self.__polling = True
+        self._setup_inotify()
+
+    def _add_watch(self, dir_path):
+        """
+        Add inotify watch of directory. Switches to polling if watches run out.
+
+        Args:
+            dir_path (str): Directory path.
+
+        Returns:
+            Boolean: Whether watch was added or not.
+        """
+        logger = getLogger('FileWatcher._add_watch')
+        logger.setLevel(self.__log_level)
+
+        if self.__polling:
+            return False
+        wd = self.__libc.inotify_add_watch(self.__fd, fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            errno = get_errno()
+            if errno == ENOSPC:
+                logger.warning(' Ran out of inotify watches after {} directories. Raise '
+                               '"fs.inotify.max_user_watches" to watch all. Polling instead.'.format(
+                                len(self.__watch_paths)))
+                self._close_inotify()
+            else:
+                logger.debug(' Could not watch "{}": {}'.format(dir_path, strerror(errno)))
+            return False
+        self.__watch_paths[wd] = dir_path
+        return True
+
+    def _add_watch_tree(self, root_path, dir_paths=None):
+        """
+        Add inotify watches of directory and all directories below it.
+
+        Args:
+            root_path (str): Root directory path.
+            dir_paths (iterable): Directories below root, if already known. Listed on disk if None.
+        """
+        if dir_paths is not None:
+            self._add_watch(dir_path=root_path)
+            for dir_path in dir_paths:
+                if dir_path != root_path and not self._add_watch(dir_path=dir_path) and self.__polling:
+                    return
+            return
+
+        pending = [root_path]
+        while pending and not self.__polling:
+            dir_path = pending.pop()
+            if not self._add_watch(dir_path=dir_path):
+                continue
+            try:
+                with scandir(dir_path) as entries:
+                    pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def _close_inotify(self):
+        """
+        Close inotify instance and switch to polling.
+        """
+        self.__polling = True
+        self.__watch_paths = {}
+        if self.__fd is not None:
+            try:
+                close(self.__fd)
+            except OSError:
+                pass
+        self.__fd = None
+        self.__poller = None
+
+    def _read_events(self, changed_dir_paths):
+        """
+        Read pending inotify events, adding directories whose entries changed to changed directory paths. New
+        directories are watched, and watches of moved away directories dropped.
+
+        Args:
+            changed_dir_paths (set): Set to add changed directory paths to.
+
+        Returns:
+            Boolean: Whether any event was read.
+        """
+        logger = getLogger('FileWatcher._read_events')
+        logger.setLevel(self.__log_level)
+
+        try:
+            data = read(self.__fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + INOTIFY_EVENT_SIZE <= len(data):
+            wd, mask, cookie, name_length = unpack_from(INOTIFY_EVENT_FORMAT, data, offset)
+            offset += INOTIFY_EVENT_SIZE
+            name = fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                logger.debug(' Inotify event queue overflowed. Reporting all roots as changed.')
+                changed_dir_paths.update(self.__root_paths)
+                continue
+            dir_path = self.__watch_paths.get(wd)
+            if mask & IN_IGNORED:
+                self.__watch_paths.pop(wd, None)
+                continue
+            if dir_path is None:
+                continue
+            changed_dir_paths.add(dir_path)
+            if not name or not mask & IN_ISDIR:
+                continue
+            child_path = path.join(dir_path, name)
+            if mask & IN_MOVED_FROM:
+                self._remove_watch_tree(dir_path=child_path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch_tree(root_path=child_path)
+                changed_dir_paths.add(child_path)
+        return True
+
+    def _remove_watch_tree(self, dir_path):
+        """
+        Remove inotify watches of directory and all directories below it, ie: when it was moved away.
+
+        Args:
+            dir_path (str): Directory path.
+        """
+        prefix = dir_path.rstrip(sep) + sep
+        for wd, watch_path in list(self.__watch_paths.items()):
+            if watch_path == dir_path or watch_path.startswith(prefix):
+                self.__libc.inotify_rm_watch(self.__fd, wd)
+                del self.__watch_paths[wd]
+
+    def _setup_inotify(self):
+        """
+        Create inotify instance. Watcher polls if inotify is unavailable.
+        """
+        logger = getLogger('FileWatcher._setup_inotify')
+        logger.setLevel(self.__log_level)
+
+        if system() != 'Linux':
+            logger.debug(' Inotify is only available on Linux. Polling instead.')
+            return
+        try:
+            self.__libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+            fd = self.__libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                logger.warning(' Could not create inotify instance: {}. Polling instead.'.format(
+                    strerror(get_errno())))
+                return
+        except (OSError, AttributeError) as e:
+            logger.warning(' Inotify is unavailable. Polling instead. Exception: {}'.format(e))
+            return
+        self.__fd = fd
+        self.__poller = poll()
+        self.__poller.register(fd, POLLIN)
+        self.__polling = False
+
+    def close(self):
+        """
+        Stop watching.
+        """
+        self._close_inotify()
+
+    @property
+    def polling(self):
+        """
+        Getter for whether watcher polls instead of using inotify.
+
+        Returns:
+            Boolean: Whether polling or not.
+        """
+        return self.__polling
+
+    def wait_for_changes(self, timeout):
+        """
+        Block until directories change, then collect events until they settle. Returns once no event arrived for
+        debounce seconds, or max delay after the first event. When polling, sleeps one poll interval and reports all
+        roots.
+
+        Args:
+            timeout (float): Most seconds to wait for a first event.
+
+        Returns:
+            Set: Paths of directories whose entries changed. Empty if timeout passed without changes.
+        """
+        logger = getLogger('FileWatcher.wait_for_changes')
+        logger.setLevel(self.__log_level)
+
+        if self.__polling:
+            wait_seconds = max(0, min(timeout, self.__poll_interval_seconds))
+            sleep(wait_seconds)
+            return set(self.__root_paths) if wait_seconds == self.__poll_interval_seconds else set()
+
+        changed_dir_paths = set()
+        if not self.__poller.poll(max(0, timeout) * 1000):
+            return changed_dir_paths
+        first_event_time = monotonic()
+        self._read_events(changed_dir_paths=changed_dir_paths)
+        while not self.__polling:
+            wait_seconds = min(self.__debounce_seconds,
+                               first_event_time + self.__max_delay_seconds - monotonic())
+            if wait_seconds <= 0 or not self.__poller.poll(wait_seconds * 1000):
+                break
+            self._read_events(changed_dir_paths=changed_dir_paths)
+        if self.__polling:
+            changed_dir_paths.update(self.__root_paths)
+        logger.debug(' {} directories changed.'.format(len(changed_dir_paths)))
+        return changed_dir_paths
+
+    def watch(self, root_path, dir_paths=None):
+        """
+        Watch directory tree.
+
+        Args:
+            root_path (str): Root directory path.
+            dir_paths (iterable): Directories below root, if already known ie: from local index. Listed on disk if
+                None.
+        """
+        logger = getLogger('FileWatcher.watch')
+        logger.setLevel(self.__log_level)
+
+        self.__root_paths.append(root_path)
+        self._add_watch_tree(root_path=root_path, dir_paths=dir_paths)
+        if self.__polling:
+            logger.debug(' Polling "{}" every {} seconds.'.format(root_path, self.__poll_interval_seconds))
+        else:
+            logger.debug(' Watching "{}". {} directories watched in total.'.format(root_path,
+                                                                                  len(self.__watch_paths)))
@@ -0,0 +1,207 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Hash cache class. Persistent cache of file content hashes, keyed by file identity.
+###
+
+from logging import getLogger
+from os import makedirs, path, stat
+from sqlite3 import connect
+from threading import Lock
+from time import time
+
+__author__ = 'szmania'
+
+HASH_CACHE_COMMIT_BATCH_SIZE = 256  # New hashes are written in batches, rather than one transaction per file.
+HASH_CACHE_RETENTION_DAYS = 30  # Hashes not used for this many days are purged at startup, ie: of deleted files.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    used_day INTEGER NOT NULL,
+    PRIMARY KEY (dev, inode, size, mtime_ns)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _get_day():
+    """
+    Get current day number, used to track when hashes were last used.
+
+    Returns:
+        Integer: Days since epoch.
+    """
+    return int(time() // 86400)
+
+
+class HashCache(object):
+    def __init__(self, db_path, algorithm='md5', log_level='DEBUG'):
+        """
+        Persistent cache of file hashes, keyed by dev, inode, size and mtime_ns of file. A file is only hashed again
+        once it was replaced or modified, as either changes its key. Cached hashes are dropped if the hash algorithm
+        changed since they were cached.
+
+        Args:
+            db_path (str): Path of cache database file.
+            algorithm (str): Hash algorithm of cached hashes.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__db_path = db_path
+        self.__algorithm = algorithm
+        self.__log_level = log_level
+        self.__lock = Lock()
+        self.__pending_count = 0
+        db_dir_path = path.dirname(db_path)
+        if db_dir_path:
+            makedirs(db_dir_path, exist_ok=True)
+        self.__connection = connect(db_path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(_SCHEMA)
+        self.__connection.commit()
+        self._set_algorithm()
+        self._purge()
+
+    def _commit(self, force=False):
+        """
+        Commit pending writes once a batch is full. Must be called holding lock.
+
+        Args:
+            force (bool): Whether to commit whatever is pending.
+        """
+        if self.__pending_count and (force or self.__pending_count >= HASH_CACHE_COMMIT_BATCH_SIZE):
+            self.__connection.commit()
+            self.__pending_count = 0
+
+    def _purge(self):
+        """
+        Purge hashes not used within retention.
+        """
+        logger = getLogger('HashCache._purge')
+        logger.setLevel(self.__log_level)
+
+        with self.__lock, self.__connection:
+            purged_count = self.__connection.execute('DELETE FROM hashes WHERE used_day < ?',
+                                                     (_get_day() - HASH_CACHE_RETENTION_DAYS,)).rowcount
+        if purged_count:
+            logger.debug(' Purged {} unused hashes.'.format(purged_count))
+
+    def _set_algorithm(self):
+        """
+        Record hash algorithm of cache, dropping hashes of another algorithm. Caches without a recorded algorithm hold
+        md5 hashes.
+        """
+        logger = getLogger('HashCache._set_algorithm')
+        logger.setLevel(self.__log_level)
+
+        with self.__lock, self.__connection:
+            row = self.__connection.execute("SELECT value FROM meta WHERE name = 'algorithm'").fetchone()
+            cached_algorithm = row[0] if row else 'md5'
+            if cached_algorithm != self.__algorithm:
+                logger.info(' Hash algorithm changed from "{}" to "{}". Dropping cached hashes.'.format(
+                    cached_algorithm, self.__algorithm))
+                self.__connection.execute('DELETE FROM hashes')
+            self.__connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('algorithm', ?)",
+                                      (self.__algorithm,))
+
+    def close(self):
+        """
+        Commit pending hashes and close cache database.
+        """
+        logger = getLogger('HashCache.close')
+        logger.setLevel(self.__log_level)
+
+        with self.__lock:
+            try:
+                self._commit(force=True)
+                self.__connection.close()
+            except Exception as e:
+                logger.warning(' Exception: {}'.format(e))
+
+    def flush(self):
+        """
+        Commit pending hashes.
+        """
+        with self.__lock:
+            self._commit(force=True)
+
+    def get_file_hash(self, file_path, hash_function):
+        """
+        Get hash of file from cache, hashing file only if it is not cached. Hashes of files that change while being
+        hashed are not cached.
+
+        Args:
+            file_path (str): File path.
+            hash_function (function): Called with file path to hash file. Returns hash, or False on failure.
+
+        Returns:
+            String: Hash of file, or False on failure.
+        """
+        logger = getLogger('HashCache.get_file_hash')
+        logger.setLevel(self.__log_level)
+
+        try:
+            file_stat = stat(file_path)
+        except OSError as e:
+            logger.debug(' Exception: {}'.format(e))
+            return False
+        key = (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        day = _get_day()
+        with self.__lock:
+            row = self.__connection.execute(
+                'SELECT digest, used_day FROM hashes WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+                key).fetchone()
+            if row:
+                if row[1] != day:
+                    self.__connection.execute(
+                        'UPDATE hashes SET used_day = ? WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+                        (day,) + key)
+                    self.__pending_count += 1
+                    self._commit()
+                logger.debug(' Cached hash of file "{}": "{}"'.format(file_path, row[0]))
+                return row[0]
+
+        digest = hash_function(file_path)
+        if digest:
+            self.put(file_path=file_path, digest=digest, file_stat=file_stat)
+        return digest
+
+    def put(self, file_path, digest, file_stat):
+        """
+        Cache hash of file, ie: computed along with another algorithm. Not cached if file changed since it was stated.
+
+        Args:
+            file_path (str): File path.
+            digest (str): Hash of file.
+            file_stat (os.stat_result): Stat of file from before it was hashed.
+
+        Returns:
+            Boolean: Whether hash was cached or not.
+        """
+        logger = getLogger('HashCache.put')
+        logger.setLevel(self.__log_level)
+
+        key = (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        try:
+            new_stat = stat(file_path)
+        except OSError:
+            return False
+        if (new_stat.st_dev, new_stat.st_ino, new_stat.st_size, new_stat.st_mtime_ns) != key:
+            logger.debug(' File changed while being hashed. Not caching hash of "{}".'.format(file_path))
+            return False
+        with self.__lock:
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO hashes (dev, inode, size, mtime_ns, digest, used_day) VALUES (?, ?, ?, ?, ?, ?)',
+                key + (digest, _get_day()))
+            self.__pending_count += 1
+            self._commit()
+        return True
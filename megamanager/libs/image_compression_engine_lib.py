@@ -0,0 +1,186 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Image compression engine class. Compresses image files in a pool of worker processes.
+###
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from multiprocessing import get_context
+from os import cpu_count, stat
+
+from libs.compress_images_lib import CompressImages_Lib, JPEG_MIN_QUALITY_PERCENTAGE
+from libs.file_hasher_lib import HASH_ALGORITHM
+
+__author__ = 'szmania'
+
+# Images compressed concurrently. Decoding and encoding is CPU bound, so half the cores are used, leaving the rest for
+# video compression and transfers.
+IMAGE_COMPRESSION_WORKERS = max(1, (cpu_count() or 2) // 2)
+# Images sent to a worker at a time. Each batch is optimized by a single jpegoptim and optipng run, rather than one
+# process per image.
+IMAGE_COMPRESSION_BATCH_SIZE = 16
+
+ImageCompressionResult = namedtuple('ImageCompressionResult',
+                                    ['file_path', 'compressed', 'digest', 'bytes_saved', 'file_stat', 'error'])
+
+_worker_compress_images_lib = None
+_worker_hash_algorithm = HASH_ALGORITHM
+
+
+def _compress_images(file_paths, compression_settings):
+    """
+    Compress batch of image files in memory, in worker process. Digests are computed from data written, and stat of
+    each file taken right after, so caller can cache it.
+
+    Args:
+        file_paths (list): Image file paths.
+        compression_settings (dict): Keyword arguments of CompressImages_Lib.compress_image_files_in_memory, ie: jpeg
+            compression quality percentage and targets of target size mode.
+
+    Returns:
+        List: ImageCompressionResult of each file. Digest is False if file is gone, ie: deleted as corrupt.
+    """
+    try:
+        compression_results = _worker_compress_images_lib.compress_image_files_in_memory(
+            file_paths=file_paths, hash_algorithm=_worker_hash_algorithm, delete_corrupt_images=True,
+            **compression_settings)
+    except Exception as e:
+        return [ImageCompressionResult(file_path, False, False, 0, None, str(e)) for file_path in file_paths]
+
+    results = []
+    for file_path, (compressed, digest, bytes_saved) in zip(file_paths, compression_results):
+        try:
+            if not digest:
+                results.append(ImageCompressionResult(file_path, compressed, False, 0, None, None))
+            else:
+                results.append(ImageCompressionResult(file_path, compressed, digest, bytes_saved, stat(file_path),
+                                                      None))
+        except OSError as e:
+            results.append(ImageCompressionResult(file_path, False, False, 0, None, str(e)))
+    return results
+
+
+def _setup_worker(hash_algorithm, log_level):
+    """
+    Setup worker process.
+
+    Args:
+        hash_algorithm (str): Hash algorithm of compressed file digests.
+        log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+    """
+    global _worker_compress_images_lib, _worker_hash_algorithm
+    _worker_compress_images_lib = CompressImages_Lib(log_level=log_level)
+    _worker_hash_algorithm = hash_algorithm
+
+
+class ImageCompressionEngine(object):
+    def __init__(self, workers=IMAGE_COMPRESSION_WORKERS, jpeg_quality_percentage=60, hash_algorithm=HASH_ALGORITHM,
+                 batch_size=IMAGE_COMPRESSION_BATCH_SIZE, target_bytes_per_megapixel=0, target_saving_percentage=0,
+                 min_jpeg_quality_percentage=JPEG_MIN_QUALITY_PERCENTAGE, log_level='DEBUG'):
+        """
+        Compresses image files in a pool of worker processes, so decoding and encoding is not limited by the GIL.
+        Workers compress each file in memory, and send back the result, so ledgers are only updated by caller. Workers
+        are spawned, not forked, as caller runs other threads, and are kept for the life of engine. Files are sent to
+        workers in batches, so external optimizers are run once per batch.
+
+        Args:
+            workers (int): Images compressed concurrently. 1 compresses in the calling process.
+            jpeg_quality_percentage (int): Quality percentage of jpeg files.
+            hash_algorithm (str): Hash algorithm of compressed file digests.
+            batch_size (int): Images sent to a worker at a time.
+            target_bytes_per_megapixel (int): Target bytes per megapixel of target size mode. 0 for none.
+            target_saving_percentage (int): Target percentage of file size to save of target size mode. 0 for none.
+            min_jpeg_quality_percentage (int): Lowest JPEG quality of target size mode.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__batch_size = max(1, batch_size)
+        self.__workers = max(1, workers)
+        self.__compression_settings = {'jpeg_compression_quality_percentage': jpeg_quality_percentage,
+                                       'target_bytes_per_megapixel': target_bytes_per_megapixel,
+                                       'target_saving_percentage': target_saving_percentage,
+                                       'min_jpeg_quality_percentage': min_jpeg_quality_percentage}
+        self.__hash_algorithm = hash_algorithm
+        self.__log_level = log_level
+        self.__executor = None
+
+    def _get_batches(self, file_paths):
+        """
+        Group file paths into batches.
+
+        Args:
+            file_paths (iterable): File paths.
+
+        Returns:
+            Generator: Lists of up to batch size file paths.
+        """
+        batch = []
+        for file_path in file_paths:
+            batch.append(file_path)
+            if len(batch) >= self.__batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _get_executor(self):
+        """
+        Get pool of worker processes, starting it on first use.
+
+        Returns:
+            ProcessPoolExecutor: Pool of worker processes.
+        """
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.__workers, mp_context=get_context('spawn'),
+                                                  initializer=_setup_worker,
+                                                  initargs=(self.__hash_algorithm, self.__log_level))
+        return self.__executor
+
+    def close(self):
+        """
+        Stop worker processes.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            self.__executor = None
+
+    def compress_files(self, file_paths):
+        """
+        Compress image files. Results are yielded in order of file paths. File paths are consumed in batches as
+        workers free up, so they may be produced lazily, ie: while still being hashed. If a worker process dies, pool
+        is restarted and exception raised, leaving remaining files for next run.
+
+        Args:
+            file_paths (iterable): Image file paths.
+
+        Returns:
+            Generator: ImageCompressionResult of each file.
+        """
+        logger = getLogger('ImageCompressionEngine.compress_files')
+        logger.setLevel(self.__log_level)
+
+        if self.__workers == 1:
+            if _worker_compress_images_lib is None:
+                _setup_worker(hash_algorithm=self.__hash_algorithm, log_level=self.__log_level)
+            for batch in self._get_batches(file_paths):
+                yield from _compress_images(file_paths=batch, compression_settings=self.__compression_settings)
+            return
+
+        executor = self._get_executor()
+        pending = deque()
+        try:
+            for batch in self._get_batches(file_paths):
+                pending.append(executor.submit(_compress_images, batch, self.__compression_settings))
+                if len(pending) >= self.__workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        except Exception as e:
+            logger.warning(' Image compression worker failed. Restarting worker processes. Exception: {}'.format(e))
+            self.close()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
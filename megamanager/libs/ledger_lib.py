@@ -0,0 +1,469 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Ledger class. Persistent set of strings, kept as a snapshot file plus an append-only journal.
+###
+
+from json import dumps, loads
+from logging import getLogger
+from os import fsync, makedirs, path, replace
+from threading import Lock
+from time import monotonic
+
+from numpy import array, frombuffer, insert, load, minimum, save, searchsorted, uint8, unique
+
+__author__ = 'szmania'
+
+LEDGER_FSYNC_BATCH_SIZE = 64  # Journal is synced to disk once this many items were added since last sync...
+LEDGER_FSYNC_INTERVAL_SECONDS = 5  # ...or this many seconds passed since last sync, whichever comes first.
+LEDGER_COMPACT_MIN_ITEMS = 10000  # Journal is compacted into snapshot once it holds this many items, and...
+LEDGER_COMPACT_RATIO = 0.5  # ...at least this share of the items in the snapshot.
+DIGEST_SIZE = 16  # Bytes of md5 and blake2b(digest_size=16) digests.
+DIGEST_LEDGER_DELTA_SIZE = 4096  # Digests added are merged into sorted array once this many are buffered.
+
+
+class Ledger(object):
+    def __init__(self, file_path, log_level='DEBUG'):
+        """
+        Persistent set of strings, ie: hashes of compressed files. Items are kept in a NumPy snapshot file, with items
+        added since in an append-only journal next to it ("<file_path>.journal"), one JSON string per line. Adding an
+        item appends one line, and the journal is synced to disk in batches. Once the journal grows large, it is
+        compacted into a new snapshot, written to a temporary file and moved over the old one. Snapshot files written
+        by Lib.dump_set_into_numpy_file are loaded as is.
+
+        Args:
+            file_path (str): Snapshot file path, ie: "compressed_images.npy".
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__file_path = file_path
+        self.__journal_path = file_path + '.journal'
+        self.__log_level = log_level
+        self.__lock = Lock()
+        self.__items = set()
+        self.__journal = None
+        self.__journal_count = 0
+        self.__unsynced_count = 0
+        self.__synced_time = monotonic()
+        self._load()
+
+    def _append(self, items):
+        """
+        Append items to journal, syncing it once batch is full. Must be called holding lock.
+
+        Args:
+            items (list): Items to append.
+        """
+        if self.__journal is None:
+            dir_path = path.dirname(self.__journal_path)
+            if dir_path:
+                makedirs(dir_path, exist_ok=True)
+            self.__journal = open(self.__journal_path, 'a', encoding='utf-8')
+        self.__journal.write(''.join(dumps(item) + '\n' for item in items))
+        self.__journal.flush()
+        self.__journal_count += len(items)
+        self.__unsynced_count += len(items)
+        if self.__unsynced_count >= LEDGER_FSYNC_BATCH_SIZE \
+                or monotonic() - self.__synced_time >= LEDGER_FSYNC_INTERVAL_SECONDS:
+            self._sync()
+        if self.__journal_count >= max(LEDGER_COMPACT_MIN_ITEMS, self._count() * LEDGER_COMPACT_RATIO):
+            self._compact()
+
+    def _add_items(self, items):
+        """
+        Add items to storage of ledger. Must be called holding lock.
+
+        Args:
+            items (iterable): Items to add.
+
+        Returns:
+            List: Items that were not in ledger yet.
+        """
+        new_items = [item for item in items if item not in self.__items]
+        self.__items.update(new_items)
+        return new_items
+
+    def _compact(self):
+        """
+        Write items into new snapshot and empty journal. Must be called holding lock.
+
+        Returns:
+            Boolean: Whether compaction was successful or not.
+        """
+        logger = getLogger('Ledger._compact')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Compacting {} journal items into "{}".'.format(self.__journal_count, self.__file_path))
+
+        temp_file_path = self.__file_path + '.tmp'
+        try:
+            dir_path = path.dirname(self.__file_path)
+            if dir_path:
+                makedirs(dir_path, exist_ok=True)
+            with open(temp_file_path, 'wb') as f:
+                save(f, self._get_snapshot())
+                f.flush()
+                fsync(f.fileno())
+            replace(temp_file_path, self.__file_path)
+            if self.__journal is not None:
+                self.__journal.close()
+            # Snapshot holds every journal item now, so a crash before truncating only replays them again.
+            self.__journal = open(self.__journal_path, 'w', encoding='utf-8')
+            fsync(self.__journal.fileno())
+            self.__journal_count = 0
+            self.__unsynced_count = 0
+            self.__synced_time = monotonic()
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def _contains(self, item):
+        """
+        Check whether item is in storage of ledger. Must be called holding lock.
+
+        Args:
+            item (str): Item.
+
+        Returns:
+            Boolean: Whether item is in ledger or not.
+        """
+        return item in self.__items
+
+    def _contains_many(self, items):
+        """
+        Check which items are in storage of ledger. Must be called holding lock.
+
+        Args:
+            items (list): Items.
+
+        Returns:
+            List: Whether each item is in ledger or not.
+        """
+        return [item in self.__items for item in items]
+
+    def _count(self):
+        """
+        Count items in storage of ledger.
+
+        Returns:
+            Integer: Number of items.
+        """
+        return len(self.__items)
+
+    def _get_items(self):
+        """
+        Get items in storage of ledger. Must be called holding lock.
+
+        Returns:
+            List: Items.
+        """
+        return list(self.__items)
+
+    def _get_snapshot(self):
+        """
+        Get items in storage of ledger as array to save into snapshot file. Must be called holding lock.
+
+        Returns:
+            numpy.ndarray: Items.
+        """
+        return array(list(self.__items), dtype=str)
+
+    def _load(self):
+        """
+        Load snapshot, then replay journal. A journal left by a previous run is compacted right away.
+        """
+        logger = getLogger('Ledger._load')
+        logger.setLevel(self.__log_level)
+
+        if path.isfile(self.__file_path):
+            try:
+                self._set_items(items=load(file=self.__file_path, allow_pickle=False))
+            except Exception as e:
+                logger.warning(' Could not load ledger snapshot "{}". Exception: {}'.format(self.__file_path, e))
+        journal_count = 0
+        if path.isfile(self.__journal_path):
+            with open(self.__journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        item = loads(line)
+                    except ValueError:
+                        # Last line is cut short if a run was killed while appending to journal.
+                        logger.debug(' Skipping incomplete journal line of "{}".'.format(self.__journal_path))
+                        continue
+                    self._add_items(items=[item])
+                    journal_count += 1
+        logger.debug(' Loaded {} items from "{}", {} of them from journal.'.format(self._count(),
+                                                                                  self.__file_path, journal_count))
+        if journal_count:
+            with self.__lock:
+                self.__journal_count = journal_count
+                self._compact()
+
+    def _set_items(self, items):
+        """
+        Replace items in storage of ledger. Must be called holding lock.
+
+        Args:
+            items (iterable): Items, ie: array loaded from snapshot file.
+        """
+        self.__items = set(items.tolist() if hasattr(items, 'tolist') else items)
+
+    def _sync(self):
+        """
+        Sync journal to disk. Must be called holding lock.
+        """
+        if self.__journal is not None and self.__unsynced_count:
+            fsync(self.__journal.fileno())
+        self.__unsynced_count = 0
+        self.__synced_time = monotonic()
+
+    def __contains__(self, item):
+        with self.__lock:
+            return self._contains(item)
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(self._get_items())
+
+    def __len__(self):
+        return self._count()
+
+    def __repr__(self):
+        return '{}("{}", {} items)'.format(type(self).__name__, self.__file_path, self._count())
+
+    def add(self, item):
+        """
+        Add item to ledger.
+
+        Args:
+            item (str): Item to add.
+        """
+        self.update(items=[item])
+
+    def close(self):
+        """
+        Compact journal into snapshot and close journal.
+        """
+        with self.__lock:
+            if self.__journal_count:
+                self._compact()
+            if self.__journal is not None:
+                self.__journal.close()
+                self.__journal = None
+
+    def contains_many(self, items):
+        """
+        Check which of many items are in ledger, at once.
+
+        Args:
+            items (iterable): Items.
+
+        Returns:
+            List: Whether each item is in ledger or not, in order of items.
+        """
+        items = list(items)
+        with self.__lock:
+            return [bool(contained) for contained in self._contains_many(items)]
+
+    def flush(self):
+        """
+        Sync journal to disk, ie: after a batch of files was processed.
+        """
+        with self.__lock:
+            self._sync()
+
+    def replace(self, items):
+        """
+        Replace all items of ledger, writing a new snapshot.
+
+        Args:
+            items (iterable): New items.
+
+        Returns:
+            Boolean: Whether new snapshot was written or not.
+        """
+        with self.__lock:
+            self._set_items(items=items)
+            return self._compact()
+
+    def update(self, items):
+        """
+        Add items to ledger. Items already in ledger are not journaled again.
+
+        Args:
+            items (iterable): Items to add.
+        """
+        with self.__lock:
+            new_items = self._add_items(items=items)
+            if new_items:
+                self._append(items=new_items)
+
+
+def _get_digest(item):
+    """
+    Get raw digest of hex digest.
+
+    Args:
+        item (str): Hex digest, ie: of md5.
+
+    Returns:
+        Bytes: Digest, or None if item is not a hex digest of DIGEST_SIZE bytes.
+    """
+    try:
+        digest = bytes.fromhex(item)
+    except (TypeError, ValueError):
+        return None
+    return digest if len(digest) == DIGEST_SIZE else None
+
+
+class DigestLedger(Ledger):
+    def __init__(self, file_path, log_level='DEBUG'):
+        """
+        Ledger of hex digests, ie: hashes of compressed files. Digests are kept as raw bytes in a sorted NumPy array,
+        16 bytes each, plus a small unsorted buffer of digests added since, which is merged into the array once full.
+        Membership is looked up with a binary search of the array, many digests at once with contains_many. Snapshot
+        files hold the raw digest array. Snapshot files of hex digests, as written by Lib.dump_set_into_numpy_file,
+        are converted on load.
+
+        Args:
+            file_path (str): Snapshot file path, ie: "compressed_images.npy".
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__log_level = log_level
+        self.__digests = array([], dtype='S{}'.format(DIGEST_SIZE))
+        self.__delta = set()
+        super(DigestLedger, self).__init__(file_path=file_path, log_level=log_level)
+
+    def _add_items(self, items):
+        """
+        Add hex digests to delta buffer, merging it into sorted array once full. Items that are not hex digests are
+        skipped. Must be called holding lock.
+
+        Args:
+            items (iterable): Hex digests to add.
+
+        Returns:
+            List: Hex digests that were not in ledger yet.
+        """
+        logger = getLogger('DigestLedger._add_items')
+        logger.setLevel(self.__log_level)
+
+        new_items = []
+        for item in items:
+            digest = _get_digest(item)
+            if digest is None:
+                logger.warning(' Not adding "{}" to ledger. Not a hex digest of {} bytes.'.format(item, DIGEST_SIZE))
+                continue
+            if digest in self.__delta or self._search(digest=digest):
+                continue
+            self.__delta.add(digest)
+            new_items.append(item)
+        if len(self.__delta) >= DIGEST_LEDGER_DELTA_SIZE:
+            self._merge()
+        return new_items
+
+    def _contains(self, item):
+        """
+        Check whether hex digest is in ledger. Must be called holding lock.
+
+        Args:
+            item (str): Hex digest.
+
+        Returns:
+            Boolean: Whether digest is in ledger or not.
+        """
+        digest = _get_digest(item)
+        return digest is not None and (digest in self.__delta or self._search(digest=digest))
+
+    def _contains_many(self, items):
+        """
+        Check which hex digests are in ledger, with one vectorized binary search. Must be called holding lock.
+
+        Args:
+            items (list): Hex digests.
+
+        Returns:
+            numpy.ndarray: Whether each digest is in ledger or not.
+        """
+        self._merge()
+        digests = [_get_digest(item) for item in items]
+        valid = array([digest is not None for digest in digests], dtype=bool)
+        if not len(self.__digests):
+            return valid & False
+        queries = array([digest or b'' for digest in digests], dtype=self.__digests.dtype)
+        indexes = minimum(searchsorted(self.__digests, queries), len(self.__digests) - 1)
+        return valid & (self.__digests[indexes] == queries)
+
+    def _count(self):
+        """
+        Count digests in ledger.
+
+        Returns:
+            Integer: Number of digests.
+        """
+        return len(self.__digests) + len(self.__delta)
+
+    def _get_items(self):
+        """
+        Get hex digests in ledger. Must be called holding lock.
+
+        Returns:
+            List: Hex digests.
+        """
+        self._merge()
+        return [row.tobytes().hex() for row in frombuffer(self.__digests.tobytes(), dtype=uint8).reshape(
+            -1, DIGEST_SIZE)]
+
+    def _get_snapshot(self):
+        """
+        Get sorted raw digest array to save into snapshot file. Must be called holding lock.
+
+        Returns:
+            numpy.ndarray: Digests.
+        """
+        self._merge()
+        return self.__digests
+
+    def _merge(self):
+        """
+        Merge delta buffer into sorted array. Must be called holding lock.
+        """
+        if self.__delta:
+            new_digests = array(sorted(self.__delta), dtype=self.__digests.dtype)
+            self.__digests = insert(self.__digests, searchsorted(self.__digests, new_digests), new_digests)
+            self.__delta = set()
+
+    def _search(self, digest):
+        """
+        Binary search sorted array for digest.
+
+        Args:
+            digest (bytes): Raw digest.
+
+        Returns:
+            Boolean: Whether digest is in sorted array or not.
+        """
+        index = searchsorted(self.__digests, digest)
+        # Array items drop trailing null bytes, so compare raw bytes of item.
+        return index < len(self.__digests) and self.__digests[index:index + 1].tobytes() == digest
+
+    def _set_items(self, items):
+        """
+        Replace digests of ledger. Must be called holding lock.
+
+        Args:
+            items (iterable): Raw digest array loaded from snapshot file, or hex digests.
+        """
+        logger = getLogger('DigestLedger._set_items')
+        logger.setLevel(self.__log_level)
+
+        self.__delta = set()
+        if hasattr(items, 'dtype') and items.dtype.kind == 'S':
+            self.__digests = unique(items.astype(self.__digests.dtype))
+            return
+        items = items.tolist() if hasattr(items, 'tolist') else list(items)
+        digests = [digest for digest in (_get_digest(item) for item in items) if digest is not None]
+        if len(digests) < len(items):
+            logger.warning(' Dropped {} items that are not hex digests of {} bytes.'.format(
+                len(items) - len(digests), DIGEST_SIZE))
+        self.__digests = unique(array(digests, dtype=self.__digests.dtype))
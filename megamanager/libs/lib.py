@@ -9,7 +9,7 @@ import shutil
 from hashlib import md5
 from logging import getLogger
 from numpy import array, load, save
-from os import chdir, kill, listdir, path, remove, rename, sep
+from os import chdir, fsync, kill, listdir, path, remove, rename, replace, sep
 from platform import system
 from re import split, sub
 from signal import SIGTERM
@@ -301,7 +301,7 @@ class Lib(object):
 
         try:
             # out = check_output(shlex.split(command), stderr=STDOUT)
-            proc = Popen(shlex.split(command), stdout=PIPE, stderr=PIPE)
+            proc = Popen(shlex.split(command), stdout=PIPE, stderr=PIPE, universal_newlines=True, errors='replace')
             (out, err) = proc.communicate()
             if output_file:
                 with open(output_file, 'a') as out_file:
@@ -311,6 +311,55 @@ class Lib(object):
             return None, None
         return out, err
 
+    def exec_cmd_and_iter_output(self, command, working_dir=None, output_file=None, err_lines=None):
+        """
+        Execute given command and yield stdout line by line, as the process writes it. Output is never buffered whole,
+        so memory stays flat regardless of output size.
+
+        Args:
+            command (str): Command to execute.
+            working_dir (str): Working directory.
+            output_file (str): File to pipe process output to.
+            err_lines (list): If given, stderr lines are appended to it, followed by a non-zero exit code message.
+
+        Returns:
+            Generator: Lines of stdout, without line endings.
+        """
+        logger = getLogger('Lib.exec_cmd_and_iter_output')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Executing command: "%s"' % command)
+
+        if working_dir:
+            chdir(working_dir)
+
+        err_lines = err_lines if err_lines is not None else []
+        try:
+            proc = Popen(shlex.split(command), stdout=PIPE, stderr=PIPE, universal_newlines=True, errors='replace')
+        except Exception as e:
+            logger.warning(' Exception: %s' % str(e))
+            err_lines.append(str(e))
+            return
+
+        err_thread = Thread(target=lambda: err_lines.extend(line.rstrip('\r\n') for line in proc.stderr),
+                            name='thread_stderr_{}'.format(proc.pid))
+        err_thread.start()
+        out_file = open(output_file, 'a') if output_file else None
+        try:
+            for line in proc.stdout:
+                if out_file:
+                    out_file.write(line)
+                yield line.rstrip('\r\n')
+        finally:
+            if out_file:
+                out_file.close()
+            if proc.poll() is None:
+                proc.stdout.close()
+                proc.kill()
+            proc.wait()
+            err_thread.join()
+            if proc.returncode:
+                err_lines.append('Command exited with code {}.'.format(proc.returncode))
+
     def get_file_md5_hash(self, file_path):
         """
         Gets file md5 hash.
@@ -541,6 +590,38 @@ class Lib(object):
             sum += path.getsize(path.join(dir_path,file))
         return sum
 
+    def write_file_atomically(self, file_path, data, temp_extension='tmp'):
+        """
+        Replace file with data. Data is written to a temporary file next to it, synced to disk and moved over file, so
+        file is never left half written. Permissions of file are kept.
+
+        Args:
+            file_path (str): File path to replace.
+            data (bytes): New content of file.
+            temp_extension (str): Extension of temporary file.
+
+        Returns:
+            Boolean: Whether file was replaced or not.
+        """
+        logger = getLogger('Lib.write_file_atomically')
+        logger.setLevel(self.__log_level)
+
+        temp_file_path = '{}.{}'.format(file_path, temp_extension)
+        try:
+            with open(temp_file_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                fsync(f.fileno())
+            if path.exists(file_path):
+                shutil.copymode(file_path, temp_file_path)
+            replace(temp_file_path, file_path)
+            return True
+        except Exception as e:
+            logger.warning(' Could not replace file "{}". Exception: {}'.format(file_path, e))
+            if path.exists(temp_file_path):
+                self.delete_local_file(file_path=temp_file_path)
+            return False
+
 
 
 class ProcessNameNotFound(Exception):
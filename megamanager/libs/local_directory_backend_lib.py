@@ -0,0 +1,367 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Local directory backend class. Storage backend treating a local directory as the remote.
+###
+
+from .remote_snapshot_lib import RemoteSnapshot, REMOTE_TYPE_DIR, REMOTE_TYPE_FILE, REMOTE_TYPE_SYSTEM
+from .storage_backend_lib import StorageBackend
+from logging import getLogger
+from os import lstat, makedirs, path, remove, scandir, walk
+from shutil import copy2, disk_usage, rmtree
+
+__author__ = 'szmania'
+
+# Top level remote directories MEGA lists as system nodes.
+SYSTEM_DIR_NAMES = ('Root', 'Inbox', 'Rubbish')
+
+
+class LocalDirectoryBackend(StorageBackend):
+    def __init__(self, root_dir_path, log_level='DEBUG'):
+        """
+        Storage backend treating a local directory as the remote. Remote path "/Root/dir" maps to
+        "<root dir path>/Root/dir". Used to run and profile the whole sync engine without network or MEGA accounts.
+        Username and password are ignored.
+
+        Args:
+            root_dir_path (str): Local directory standing in for remote account root.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        super(LocalDirectoryBackend, self).__init__(log_level=log_level)
+        self.__root_dir_path = path.abspath(path.expanduser(root_dir_path))
+        self.__log_level = log_level
+
+    def _get_local_path(self, remote_path):
+        """
+        Get backing local path of remote path.
+
+        Args:
+            remote_path (str): Remote path. ie: "/Root/dir/file.txt"
+
+        Returns:
+            String: Backing local path.
+        """
+        return path.join(self.__root_dir_path, *[name for name in remote_path.split('/') if name])
+
+    def _get_remote_type(self, remote_path, is_dir):
+        """
+        Get MEGA remote type of remote path.
+
+        Args:
+            remote_path (str): Remote path.
+            is_dir (bool): Whether remote path is a directory.
+
+        Returns:
+            Integer: Remote type. 0 = file, 1 = directory, 2 = MEGA account system file ie: "/Root".
+        """
+        if not is_dir:
+            return REMOTE_TYPE_FILE
+        parent_path, _, name = remote_path.rstrip('/').rpartition('/')
+        return REMOTE_TYPE_SYSTEM if not parent_path and name in SYSTEM_DIR_NAMES else REMOTE_TYPE_DIR
+
+    def _get_space(self):
+        """
+        Get disk space of root directory.
+
+        Returns:
+            Tuple: Used and total space in bytes. (0, 0) if space could not be gotten.
+        """
+        logger = getLogger('LocalDirectoryBackend._get_space')
+        logger.setLevel(self.__log_level)
+
+        try:
+            usage = disk_usage(self.__root_dir_path)
+            return usage.used, usage.total
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return 0, 0
+
+    def create_remote_dir(self, username, password, remote_path, process_priority_class=None,
+                          process_set_priority_timeout=60):
+        """
+        Create remote directory, and any missing parents.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            remote_path (str): Remote path of directory to create.
+            process_priority_class (str): Unused.
+            process_set_priority_timeout (int): Unused.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('LocalDirectoryBackend.create_remote_dir')
+        logger.setLevel(self.__log_level)
+
+        try:
+            makedirs(self._get_local_path(remote_path=remote_path), exist_ok=True)
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def download_all_files_from_account(self, username, password, local_root, remote_root,
+                                        process_set_priority_timeout=60):
+        """
+        Copy all remote files of remote root that do not exist locally.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            local_root (str): Local path to download files to.
+            remote_root (str): Remote path to download files from.
+            process_set_priority_timeout (int): Unused.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('LocalDirectoryBackend.download_all_files_from_account')
+        logger.setLevel(self.__log_level)
+
+        remote_root_path = self._get_local_path(remote_path=remote_root)
+        try:
+            for dir_path, dir_names, file_names in walk(remote_root_path):
+                local_dir = path.join(local_root, path.relpath(dir_path, remote_root_path))
+                makedirs(local_dir, exist_ok=True)
+                for file_name in file_names:
+                    local_file_path = path.join(local_dir, file_name)
+                    if not path.exists(local_file_path):
+                        copy2(path.join(dir_path, file_name), local_file_path)
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def download_file(self, username, password, localFilePath, remoteFilePath):
+        """
+        Copy remote file to local file path.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            localFilePath (str): Local file path to download to.
+            remoteFilePath (str): Remote file path to download.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('LocalDirectoryBackend.download_file')
+        logger.setLevel(self.__log_level)
+
+        try:
+            makedirs(path.dirname(localFilePath) or '.', exist_ok=True)
+            copy2(self._get_local_path(remote_path=remoteFilePath), localFilePath)
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def get_account_free_space(self, username, password):
+        """
+        Get free space of root directory disk in gigabytes
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+
+        Returns:
+             String: Free space in gigabytes. ie: "12.34 GiB"
+        """
+        used, total = self._get_space()
+        return '%.2f GiB' % ((total - used) / 1024.0 ** 3)
+
+    def get_account_total_space(self, username, password):
+        """
+        Get total space of root directory disk in gigabytes
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+
+        Returns:
+             String: Total space in gigabytes. ie: "50.00 GiB"
+        """
+        used, total = self._get_space()
+        return '%.2f GiB' % (total / 1024.0 ** 3)
+
+    def get_account_used_space(self, username, password):
+        """
+        Get used space of root directory disk in gigabytes
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+
+        Returns:
+             String: Used space in gigabytes. ie: "37.66 GiB"
+        """
+        used, total = self._get_space()
+        return '%.2f GiB' % (used / 1024.0 ** 3)
+
+    def get_remote_snapshot(self, username, password, remote_path, process_priority_class=None,
+                            process_set_priority_timeout=60, max_age=None, create_remote_root=True):
+        """
+        Get snapshot of remote tree by scanning backing directory.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            remote_path (str): root path to get remote snapshot of.
+            process_priority_class (str): Unused.
+            process_set_priority_timeout (int): Unused.
+            max_age (int): Unused. Backing directory is always scanned.
+            create_remote_root (bool): Whether to create remote path if it does not exist.
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree, or None if remote path does not exist.
+        """
+        logger = getLogger('LocalDirectoryBackend.get_remote_snapshot')
+        logger.setLevel(self.__log_level)
+
+        if create_remote_root:
+            self.create_remote_dir(username=username, password=password, remote_path=remote_path)
+        err_lines = []
+        snapshot = RemoteSnapshot.from_megals_entries(
+            entries=self.iter_remote_file_data_recursively(username=username, password=password,
+                                                           remote_path=remote_path, err_lines=err_lines),
+            remote_root=remote_path, log_level=self.__log_level)
+        if len(snapshot) and not err_lines:
+            logger.debug(' Success, could get remote snapshot with {} entries.'.format(len(snapshot)))
+            return snapshot
+
+        logger.warning(' Error, could not scan remote path "{}": {}'.format(remote_path, err_lines))
+        return None
+
+    def iter_remote_file_data_recursively(self, username, password, remote_path='/', err_lines=None):
+        """
+        Iterate all remote file data of remote path, scanning backing directory with scandir.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            remote_path (str): root path to get remote files from.
+            err_lines (list): If given, scan errors are appended to it.
+
+        Returns:
+            Generator: Tuples of (handle, parent, type, size, mtime, path). Handles are inode numbers in hex.
+        """
+        remote_path = '/' + remote_path.strip('/')
+        local_path = self._get_local_path(remote_path=remote_path)
+        try:
+            stat = lstat(local_path)
+        except OSError as e:
+            if err_lines is not None:
+                err_lines.append(str(e))
+            return
+        is_dir = path.isdir(local_path)
+        handle = '%x' % stat.st_ino
+        yield (handle, '', self._get_remote_type(remote_path=remote_path, is_dir=is_dir),
+               -1 if is_dir else stat.st_size, int(stat.st_mtime), remote_path)
+
+        pending = [(local_path, remote_path.rstrip('/'), handle)] if is_dir else []
+        while pending:
+            dir_path, remote_dir_path, parent = pending.pop()
+            try:
+                entries = list(scandir(dir_path))
+            except OSError as e:
+                if err_lines is not None:
+                    err_lines.append(str(e))
+                continue
+            for entry in entries:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError as e:
+                    if err_lines is not None:
+                        err_lines.append(str(e))
+                    continue
+                handle = '%x' % stat.st_ino
+                entry_remote_path = remote_dir_path + '/' + entry.name
+                yield (handle, parent, REMOTE_TYPE_DIR if is_dir else REMOTE_TYPE_FILE,
+                       -1 if is_dir else stat.st_size, int(stat.st_mtime), entry_remote_path)
+                if is_dir:
+                    pending.append((entry.path, entry_remote_path, handle))
+
+    def lookup_remote_path(self, username, password, remote_path, remote_root=None):
+        """
+        Look up remote path details by stat of backing path.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            remote_path (str): Remote path to look up.
+            remote_root (str): Unused.
+
+        Returns:
+            Dictionary: Keys "exists" (bool), "type" (int), "size" (int) and "mtime" (int epoch seconds). Type, size
+                and mtime are None if remote path does not exist.
+        """
+        local_path = self._get_local_path(remote_path=remote_path)
+        try:
+            stat = lstat(local_path)
+        except OSError:
+            return {'exists': False, 'type': None, 'size': None, 'mtime': None}
+        is_dir = path.isdir(local_path)
+        return {'exists': True, 'type': self._get_remote_type(remote_path=remote_path, is_dir=is_dir),
+                'size': -1 if is_dir else stat.st_size, 'mtime': int(stat.st_mtime)}
+
+    def remove_remote_path(self, username, password, remote_file_path, process_priority_class=None,
+                           process_set_priority_timeout=60):
+        """
+        Remove remote file or directory.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            remote_file_path (str): remote file path to remove.
+            process_priority_class (str): Unused.
+            process_set_priority_timeout (int): Unused.
+
+        Returns:
+            boolean: whether successful or not.
+        """
+        logger = getLogger('LocalDirectoryBackend.remove_remote_path')
+        logger.setLevel(self.__log_level)
+
+        local_path = self._get_local_path(remote_path=remote_file_path)
+        try:
+            if path.isdir(local_path) and not path.islink(local_path):
+                rmtree(local_path)
+            else:
+                remove(local_path)
+            logger.debug(' Success, could remove remote file: "{}"'.format(remote_file_path))
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def upload_files(self, username, password, local_file_paths, remote_dir_path, process_priority_class=None,
+                     process_set_priority_timeout=60):
+        """
+        Copy local files into remote directory.
+
+        Args:
+            username (str): Unused.
+            password (str): Unused.
+            local_file_paths (list): Local file paths to copy.
+            remote_dir_path (str): Remote directory path to copy into.
+            process_priority_class (str): Unused.
+            process_set_priority_timeout (int): Unused.
+
+        Returns:
+            List: Local file paths that were copied.
+        """
+        logger = getLogger('LocalDirectoryBackend.upload_files')
+        logger.setLevel(self.__log_level)
+
+        remote_dir = self._get_local_path(remote_path=remote_dir_path)
+        uploaded_paths = []
+        for local_file_path in local_file_paths:
+            try:
+                copy2(local_file_path, path.join(remote_dir, path.basename(local_file_path)))
+                uploaded_paths.append(local_file_path)
+            except Exception as e:
+                logger.warning(' Could not copy "{}". Exception: {}'.format(local_file_path, e))
+        return uploaded_paths
@@ -0,0 +1,469 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Local index class. Persistent index of local files, refreshed incrementally each sync cycle.
+###
+
+from .parallel_walker_lib import ParallelWalker, WALKER_WORKERS
+from collections import namedtuple
+from logging import getLogger
+from os import makedirs, path, scandir, sep, stat
+from sqlite3 import connect
+from threading import Lock
+from time import time, time_ns
+
+__author__ = 'szmania'
+
+LOCAL_INDEX_FULL_REFRESH_SECONDS = 6 * 60 * 60  # Every directory of a root is listed again at least this often.
+# Directories modified this recently may still change within the same mtime tick, so they are listed again next time.
+LOCAL_INDEX_RACY_NS = 2 * 10 ** 9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    changed_cycle INTEGER NOT NULL,
+    PRIMARY KEY (dir, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Stat of an indexed file. Fields match os.stat_result, so either can be used.
+LocalIndexStat = namedtuple('LocalIndexStat', ['st_dev', 'st_ino', 'st_size', 'st_mtime', 'st_mtime_ns'])
+
+
+class LocalIndexEntry(object):
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, name, path, stat=None):
+        """
+        Directory entry served from local index. Same interface as os.DirEntry.
+
+        Args:
+            name (str): Entry name.
+            path (str): Entry path.
+            stat (LocalIndexStat): Stat of file. None for directories.
+        """
+        self.name = name
+        self.path = path
+        self._stat = stat
+
+    def __repr__(self):
+        return '<LocalIndexEntry %r>' % self.name
+
+    def is_dir(self, follow_symlinks=True):
+        return self._stat is None
+
+    def is_file(self, follow_symlinks=True):
+        return self._stat is not None
+
+    def stat(self, follow_symlinks=True):
+        return self._stat
+
+
+class _IndexedDir(object):
+    __slots__ = ('mtime_ns', 'files', 'subdirs')
+
+    def __init__(self, mtime_ns, files=None, subdirs=None):
+        """
+        Indexed directory.
+
+        Args:
+            mtime_ns (int): Directory modified time in nanoseconds when listed. 0 to list again on next refresh.
+            files (dict): File name to tuple of dev, inode, size, mtime_ns and cycle file last changed in.
+            subdirs (set): Names of subdirectories.
+        """
+        self.mtime_ns = mtime_ns
+        self.files = files if files is not None else {}
+        self.subdirs = subdirs if subdirs is not None else set()
+
+
+class LocalIndex(object):
+    def __init__(self, db_path, full_refresh_seconds=LOCAL_INDEX_FULL_REFRESH_SECONDS, walker_workers=WALKER_WORKERS,
+                 log_level='DEBUG'):
+        """
+        Persistent index of local files, storing dev, inode, size and mtime_ns of each. Refreshing a root only lists
+        directories whose mtime changed since last refresh, as adding, removing or renaming an entry changes mtime of
+        its directory. Files modified in place do not, so every directory is listed again once every
+        full_refresh_seconds.
+        Every refresh is a new cycle, and files record the cycle they last changed in, so stages can ask for files
+        changed since the cycle they last processed.
+
+        Args:
+            db_path (str): Path of index database file.
+            full_refresh_seconds (int): Seconds after which all directories of a root are listed again.
+            walker_workers (int): Number of directories listed concurrently on refresh.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__db_path = db_path
+        self.__full_refresh_seconds = full_refresh_seconds
+        self.__log_level = log_level
+        self.__lock = Lock()
+        self.__dirs = {}
+        self.__walker = ParallelWalker(workers=walker_workers, log_level=log_level)
+        db_dir_path = path.dirname(db_path)
+        if db_dir_path:
+            makedirs(db_dir_path, exist_ok=True)
+        self.__connection = connect(db_path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(_SCHEMA)
+        self.__connection.commit()
+        self.__cycle = self._get_meta(key='cycle')
+        self._load()
+
+    def _get_meta(self, key, default=0):
+        """
+        Get integer value from meta table.
+
+        Args:
+            key (str): Key of value.
+            default (int): Value if key is not set.
+
+        Returns:
+            Integer: Value.
+        """
+        row = self.__connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _is_under_root(self, dir_path, root_path):
+        """
+        Whether directory is root or below it.
+
+        Args:
+            dir_path (str): Normalized directory path.
+            root_path (str): Normalized root path.
+
+        Returns:
+            Boolean: Whether under root or not.
+        """
+        return dir_path == root_path or dir_path.startswith(root_path.rstrip(sep) + sep)
+
+    def _load(self):
+        """
+        Load index from database into memory.
+        """
+        logger = getLogger('LocalIndex._load')
+        logger.setLevel(self.__log_level)
+
+        for dir_path, mtime_ns in self.__connection.execute('SELECT path, mtime_ns FROM dirs'):
+            self.__dirs[dir_path] = _IndexedDir(mtime_ns=mtime_ns)
+        for dir_path, indexed_dir in self.__dirs.items():
+            parent_dir = self.__dirs.get(path.dirname(dir_path))
+            if parent_dir is not None and parent_dir is not indexed_dir:
+                parent_dir.subdirs.add(path.basename(dir_path))
+        file_count = 0
+        for dir_path, name, dev, inode, size, mtime_ns, changed_cycle in self.__connection.execute(
+                'SELECT dir, name, dev, inode, size, mtime_ns, changed_cycle FROM files'):
+            indexed_dir = self.__dirs.get(dir_path)
+            if indexed_dir is not None:
+                indexed_dir.files[name] = (dev, inode, size, mtime_ns, changed_cycle)
+                file_count += 1
+        logger.debug(' Loaded local index of {} directories and {} files.'.format(len(self.__dirs), file_count))
+
+    def _lookup(self, file_path):
+        """
+        Look up file in index.
+
+        Args:
+            file_path (str): File path.
+
+        Returns:
+            Tuple: Indexed directory of file, or None if directory is not indexed, and normalized file name.
+        """
+        file_path = path.normpath(file_path)
+        return self.__dirs.get(path.dirname(file_path)), path.basename(file_path)
+
+    def _scan_dir(self, dir_path, cycle, now_ns, force=False):
+        """
+        Scan directory for refresh. Run by walker threads, so it only reads index.
+
+        Args:
+            dir_path (str): Directory path.
+            cycle (int): Cycle of refresh, recorded on changed files.
+            now_ns (int): Time refresh started, in nanoseconds since epoch.
+            force (bool): Whether to list directory even if its mtime did not change.
+
+        Returns:
+            Tuple: Tuple of directory path, new _IndexedDir or None if directory was not listed, and number of files
+                changed, or None if directory no longer exists. And list of subdirectory paths to scan.
+        """
+        logger = getLogger('LocalIndex._scan_dir')
+        logger.setLevel(self.__log_level)
+
+        try:
+            dir_mtime_ns = stat(dir_path).st_mtime_ns
+        except OSError:
+            return None, []
+        indexed_dir = self.__dirs.get(dir_path)
+        if indexed_dir is not None and not force and indexed_dir.mtime_ns == dir_mtime_ns:
+            return (dir_path, None, 0), [path.join(dir_path, name) for name in indexed_dir.subdirs]
+
+        old_files = indexed_dir.files if indexed_dir is not None else {}
+        files = {}
+        subdirs = set()
+        changed_count = 0
+        try:
+            with scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.name)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        entry_stat = entry.stat()
+                    except OSError:
+                        continue
+                    key = (entry_stat.st_dev, entry_stat.st_ino, entry_stat.st_size, entry_stat.st_mtime_ns)
+                    old_entry = old_files.get(entry.name)
+                    if old_entry is not None and old_entry[:4] == key:
+                        files[entry.name] = old_entry
+                    else:
+                        files[entry.name] = key + (cycle,)
+                        changed_count += 1
+        except OSError as e:
+            logger.warning(' Could not list local directory "{}". Exception: {}'.format(dir_path, e))
+            known_subdirs = indexed_dir.subdirs if indexed_dir is not None else ()
+            return (dir_path, None, 0), [path.join(dir_path, name) for name in known_subdirs]
+
+        racy = now_ns - dir_mtime_ns < LOCAL_INDEX_RACY_NS
+        return ((dir_path, _IndexedDir(mtime_ns=0 if racy else dir_mtime_ns, files=files, subdirs=subdirs),
+                 changed_count), [path.join(dir_path, name) for name in subdirs])
+
+    @property
+    def cycle(self):
+        """
+        Getter for current cycle. Incremented by every refresh.
+
+        Returns:
+            Integer: Cycle.
+        """
+        return self.__cycle
+
+    def close(self):
+        """
+        Close index database.
+        """
+        logger = getLogger('LocalIndex.close')
+        logger.setLevel(self.__log_level)
+
+        with self.__lock:
+            try:
+                self.__connection.close()
+            except Exception as e:
+                logger.warning(' Exception: {}'.format(e))
+
+    def exists(self, file_path):
+        """
+        Whether local path exists. Paths found in index are not checked on disk. Others are, so entries the index
+        does not track (ie: symlinked directories) are still reported.
+
+        Args:
+            file_path (str): Local path.
+
+        Returns:
+            Boolean: Whether path exists or not.
+        """
+        if path.normpath(file_path) in self.__dirs:
+            return True
+        indexed_dir, name = self._lookup(file_path=file_path)
+        if indexed_dir is not None and (name in indexed_dir.files or name in indexed_dir.subdirs):
+            return True
+        return path.exists(file_path)
+
+    def get_changed_files(self, root_path, since_cycle=0):
+        """
+        Get files of root that were added or changed after given cycle.
+
+        Args:
+            root_path (str): Local root path.
+            since_cycle (int): Cycle to get changes after. 0 for all files.
+
+        Returns:
+            List: File paths.
+        """
+        root_path = path.normpath(root_path)
+        changed_files = []
+        with self.__lock:
+            for dir_path, indexed_dir in self.__dirs.items():
+                if not self._is_under_root(dir_path=dir_path, root_path=root_path):
+                    continue
+                changed_files.extend(path.join(dir_path, name) for name, entry in indexed_dir.files.items()
+                                     if entry[4] > since_cycle)
+        return changed_files
+
+    def get_dirs(self, root_path):
+        """
+        Get indexed directories of root.
+
+        Args:
+            root_path (str): Local root path.
+
+        Returns:
+            List: Directory paths, root included.
+        """
+        root_path = path.normpath(root_path)
+        with self.__lock:
+            return [dir_path for dir_path in self.__dirs if self._is_under_root(dir_path=dir_path, root_path=root_path)]
+
+    def get_cursor(self, name):
+        """
+        Get cycle a stage last finished processing changes up to.
+
+        Args:
+            name (str): Name of cursor. ie: stage name and root path.
+
+        Returns:
+            Integer: Cycle. 0 if stage never finished.
+        """
+        with self.__lock:
+            return self._get_meta(key='cursor:' + name)
+
+    def refresh(self, root_path, full=False, dir_paths=None):
+        """
+        Refresh index of root, listing only directories whose mtime changed. Starts a new cycle.
+
+        Args:
+            root_path (str): Local root path.
+            full (bool): Whether to list every directory. Done anyway once full_refresh_seconds have passed.
+            dir_paths (list): Only refresh these directories of root and new or changed directories below them,
+                listing them whatever their mtime. ie: directories reported by a file watcher.
+
+        Returns:
+            Integer: Number of files added or changed.
+        """
+        logger = getLogger('LocalIndex.refresh')
+        logger.setLevel(self.__log_level)
+
+        root_path = path.normpath(root_path)
+        start_time = time()
+        with self.__lock:
+            full_refresh_key = 'full_refresh:' + root_path
+            if dir_paths is None and time() - self._get_meta(key=full_refresh_key) > self.__full_refresh_seconds:
+                full = True
+            start_dir_paths = [root_path] if dir_paths is None else \
+                [dir_path for dir_path in set(path.normpath(dir_path) for dir_path in dir_paths)
+                 if self._is_under_root(dir_path=dir_path, root_path=root_path)]
+            self.__cycle += 1
+            cycle = self.__cycle
+            now_ns = time_ns()
+            forced_dir_paths = set(start_dir_paths)
+            # Directories below another start directory are reached through it, and listed as they are forced.
+            start_dir_paths = [dir_path for dir_path in start_dir_paths
+                               if not any(dir_path != other_dir_path
+                                          and self._is_under_root(dir_path=dir_path, root_path=other_dir_path)
+                                          for other_dir_path in forced_dir_paths)]
+            seen_dir_paths = set()
+            changed_dirs = {}
+            changed_count = 0
+
+            def visit(dir_path):
+                return self._scan_dir(dir_path=dir_path, cycle=cycle, now_ns=now_ns,
+                                      force=full or dir_path in forced_dir_paths)
+
+            for dir_path, indexed_dir, dir_changed_count in self.__walker.walk(root_paths=start_dir_paths,
+                                                                               visit=visit):
+                seen_dir_paths.add(dir_path)
+                if indexed_dir is not None:
+                    changed_dirs[dir_path] = indexed_dir
+                    changed_count += dir_changed_count
+            listed_count = len(changed_dirs)
+
+            removed_dir_paths = [dir_path for dir_path in self.__dirs
+                                 if dir_path not in seen_dir_paths
+                                 and any(self._is_under_root(dir_path=dir_path, root_path=start_dir_path)
+                                         for start_dir_path in start_dir_paths)]
+            for dir_path in removed_dir_paths:
+                del self.__dirs[dir_path]
+            self.__dirs.update(changed_dirs)
+
+            with self.__connection:
+                self.__connection.executemany('DELETE FROM dirs WHERE path = ?',
+                                              [(dir_path,) for dir_path in removed_dir_paths])
+                self.__connection.executemany('DELETE FROM files WHERE dir = ?',
+                                              [(dir_path,) for dir_path in removed_dir_paths])
+                self.__connection.executemany('INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)',
+                                              [(dir_path, indexed_dir.mtime_ns)
+                                               for dir_path, indexed_dir in changed_dirs.items()])
+                self.__connection.executemany('DELETE FROM files WHERE dir = ?',
+                                              [(dir_path,) for dir_path in changed_dirs])
+                self.__connection.executemany(
+                    'INSERT INTO files (dir, name, dev, inode, size, mtime_ns, changed_cycle) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(dir_path, name) + entry for dir_path, indexed_dir in changed_dirs.items()
+                     for name, entry in indexed_dir.files.items()])
+                self.__connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('cycle', cycle))
+                if full:
+                    self.__connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                              (full_refresh_key, int(start_time)))
+
+        logger.debug(' Refreshed local index of "{}" in {:.2f} seconds{}: listed {} of {} directories, {} files '
+                     'changed, {} directories removed.'.format(root_path, time() - start_time,
+                                                               ' (full)' if full else '', listed_count,
+                                                               len(seen_dir_paths), changed_count,
+                                                               len(removed_dir_paths)))
+        return changed_count
+
+    def scandir(self, dir_path):
+        """
+        List directory from index, falling back to listing it on disk if it is not indexed.
+
+        Args:
+            dir_path (str): Local directory path.
+
+        Returns:
+            List: LocalIndexEntry or os.DirEntry objects of directory.
+        """
+        indexed_dir = self.__dirs.get(path.normpath(dir_path))
+        if indexed_dir is None:
+            with scandir(dir_path) as entries:
+                return list(entries)
+        entries = [LocalIndexEntry(name=name, path=path.join(dir_path, name)) for name in indexed_dir.subdirs]
+        entries.extend(LocalIndexEntry(name=name, path=path.join(dir_path, name),
+                                       stat=LocalIndexStat(entry[0], entry[1], entry[2], entry[3] / 1e9, entry[3]))
+                       for name, entry in indexed_dir.files.items())
+        return entries
+
+    def set_cursor(self, name, cycle):
+        """
+        Set cycle a stage finished processing changes up to.
+
+        Args:
+            name (str): Name of cursor. ie: stage name and root path.
+            cycle (int): Cycle.
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                      ('cursor:' + name, cycle))
+
+    def stat(self, file_path):
+        """
+        Stat local file from index, falling back to disk if it is not indexed.
+
+        Args:
+            file_path (str): Local file path.
+
+        Returns:
+            LocalIndexStat: Stat of file. os.stat_result if not indexed.
+
+        Raises:
+            OSError: If file does not exist.
+        """
+        indexed_dir, name = self._lookup(file_path=file_path)
+        entry = indexed_dir.files.get(name) if indexed_dir is not None else None
+        if entry is None:
+            return stat(file_path)
+        return LocalIndexStat(entry[0], entry[1], entry[2], entry[3] / 1e9, entry[3])
@@ -0,0 +1,1284 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# MEGA API class. Native, in-process MEGA API client. Used in place of megatools binaries.
+###
+
+from .bandwidth_lib import BandwidthAllocator
+from .remote_snapshot_lib import RemoteSnapshot
+from .storage_backend_lib import StorageBackend
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import pbkdf2_hmac
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from json import dumps, loads
+from logging import getLogger
+from os import makedirs, path, remove, replace, urandom
+from random import randint
+from struct import unpack
+from threading import Lock
+from time import sleep, time
+from urllib.parse import urlsplit
+
+try:
+    from Crypto.Cipher import AES
+except ImportError:
+    AES = None
+
+__author__ = 'szmania'
+
+MEGA_API_URL = 'https://g.api.mega.co.nz'
+MEGA_API_MAX_RETRIES = 7
+MEGA_API_BATCH_SIZE = 100  # Commands sent per API request when batching.
+MEGA_API_POOL_SIZE = 4  # Idle keep-alive connections kept per host, per account.
+MEGA_API_TIMEOUT_SECONDS = 120
+MEGA_API_TRANSFER_REQUEST_SIZE = 8 * 1024 * 1024  # Bytes per upload/download HTTP request.
+MEGA_API_EAGAIN = -3
+MEGA_API_ERRORS = {-1: 'EINTERNAL', -2: 'EARGS', -3: 'EAGAIN', -4: 'ERATELIMIT', -5: 'EFAILED', -6: 'ETOOMANY',
+                   -7: 'ERANGE', -8: 'EEXPIRED', -9: 'ENOENT', -10: 'ECIRCULAR', -11: 'EACCESS', -12: 'EEXIST',
+                   -13: 'EINCOMPLETE', -14: 'EKEY', -15: 'ESID', -16: 'EBLOCKED', -17: 'EOVERQUOTA',
+                   -18: 'ETEMPUNAVAIL'}
+# MEGA node types, and names megatools gives system nodes.
+MEGA_NODE_FILE = 0
+MEGA_NODE_DIR = 1
+MEGA_SYSTEM_NODE_NAMES = {2: 'Root', 3: 'Inbox', 4: 'Rubbish'}
+MEGA_PASSWORD_KEY_SEED = bytes.fromhex('93C467E37DB0C7A4D1BE3F810152CB56')
+REMOTE_SNAPSHOT_TTL_SECONDS = 300  # 5 minutes
+
+
+class MegaApiError(Exception):
+    def __init__(self, code):
+        """
+        Error returned by MEGA API.
+
+        Args:
+            code (int): MEGA API error code. ie: -9
+        """
+        self.code = code
+        super(MegaApiError, self).__init__('MEGA API error %d (%s)' % (code, MEGA_API_ERRORS.get(code, 'UNKNOWN')))
+
+
+def _base64_url_decode(data):
+    """
+    Decode MEGA flavoured, unpadded, url safe base64.
+
+    Args:
+        data (str): Data to decode.
+
+    Returns:
+        bytes: Decoded data.
+    """
+    return urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _base64_url_encode(data):
+    """
+    Encode data as MEGA flavoured, unpadded, url safe base64.
+
+    Args:
+        data (bytes): Data to encode.
+
+    Returns:
+        str: Encoded data.
+    """
+    return urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _xor_bytes(first, second):
+    """
+    XOR two byte strings of same length.
+
+    Args:
+        first (bytes): First byte string.
+        second (bytes): Second byte string.
+
+    Returns:
+        bytes: XOR of byte strings.
+    """
+    return (int.from_bytes(first, 'big') ^ int.from_bytes(second, 'big')).to_bytes(len(first), 'big')
+
+
+def _pad_block(data):
+    """
+    Zero pad data to AES block size.
+
+    Args:
+        data (bytes): Data to pad.
+
+    Returns:
+        bytes: Padded data.
+    """
+    return data + b'\0' * (-len(data) % 16)
+
+
+def _prepare_password_key(password):
+    """
+    Derive password key of version 1 accounts.
+
+    Args:
+        password (bytes): Account password.
+
+    Returns:
+        bytes: Password key.
+    """
+    password = _pad_block(password)
+    ciphers = [AES.new(password[i:i + 16], AES.MODE_ECB) for i in range(0, len(password), 16)]
+    password_key = MEGA_PASSWORD_KEY_SEED
+    for _ in range(0x10000):
+        for cipher in ciphers:
+            password_key = cipher.encrypt(password_key)
+    return password_key
+
+
+def _get_user_hash(email, password_key):
+    """
+    Get login hash of email for version 1 accounts.
+
+    Args:
+        email (str): Lower case account email.
+        password_key (bytes): Password key.
+
+    Returns:
+        str: User hash.
+    """
+    email = email.encode('utf-8')
+    email += b'\0' * (-len(email) % 4)
+    user_hash = bytearray(16)
+    for word_index in range(len(email) // 4):
+        offset = (word_index % 4) * 4
+        for byte_index in range(4):
+            user_hash[offset + byte_index] ^= email[word_index * 4 + byte_index]
+    user_hash = bytes(user_hash)
+    cipher = AES.new(password_key, AES.MODE_ECB)
+    for _ in range(0x4000):
+        user_hash = cipher.encrypt(user_hash)
+    return _base64_url_encode(user_hash[0:4] + user_hash[8:12])
+
+
+def _read_mpi(data):
+    """
+    Read multiple precision integer, as MEGA stores RSA keys.
+
+    Args:
+        data (bytes): Data starting with MPI.
+
+    Returns:
+        Tuple: Integer read and rest of data.
+    """
+    length = (unpack('>H', data[:2])[0] + 7) // 8
+    return int.from_bytes(data[2:2 + length], 'big'), data[2 + length:]
+
+
+def _decrypt_attributes(attributes, key):
+    """
+    Decrypt node attributes.
+
+    Args:
+        attributes (str): Encrypted attributes.
+        key (bytes): Node AES key.
+
+    Returns:
+        dict: Attributes, or None if attributes could not be decrypted.
+    """
+    data = AES.new(key, AES.MODE_CBC, iv=b'\0' * 16).decrypt(_pad_block(_base64_url_decode(attributes)))
+    if not data.startswith(b'MEGA{'):
+        return None
+    try:
+        return loads(data[4:].rstrip(b'\0').decode('utf-8'))
+    except ValueError:
+        return None
+
+
+def _encrypt_attributes(attributes, key):
+    """
+    Encrypt node attributes.
+
+    Args:
+        attributes (dict): Attributes. ie: {"n": "file.txt"}
+        key (bytes): Node AES key.
+
+    Returns:
+        str: Encrypted attributes.
+    """
+    data = _pad_block(b'MEGA' + dumps(attributes, separators=(',', ':')).encode('utf-8'))
+    return _base64_url_encode(AES.new(key, AES.MODE_CBC, iv=b'\0' * 16).encrypt(data))
+
+
+def _iter_chunks(size):
+    """
+    Iterate MEGA file chunks. Chunks grow by 128KB up to 1MB. Chunk MACs are computed over these boundaries.
+
+    Args:
+        size (int): File size in bytes.
+
+    Returns:
+        Generator: Tuples of chunk start and chunk length.
+    """
+    start = 0
+    chunk_size = 0x20000
+    while start < size:
+        length = min(chunk_size, size - start)
+        yield start, length
+        start += length
+        if chunk_size < 0x100000:
+            chunk_size += 0x20000
+
+
+def _iter_transfer_requests(size):
+    """
+    Group MEGA file chunks into transfer requests of about MEGA_API_TRANSFER_REQUEST_SIZE bytes.
+
+    Args:
+        size (int): File size in bytes.
+
+    Returns:
+        Generator: Tuples of request start, request length and list of chunk lengths.
+    """
+    request_start = 0
+    chunk_lengths = []
+    for start, length in _iter_chunks(size):
+        chunk_lengths.append(length)
+        if start + length - request_start >= MEGA_API_TRANSFER_REQUEST_SIZE:
+            yield request_start, start + length - request_start, chunk_lengths
+            request_start = start + length
+            chunk_lengths = []
+    if chunk_lengths:
+        yield request_start, size - request_start, chunk_lengths
+
+
+class FileMac(object):
+    def __init__(self, key, iv):
+        """
+        Running MAC of file contents, as MEGA computes it. Chunks must be given in order.
+
+        Args:
+            key (bytes): File AES key.
+            iv (bytes): File nonce, 8 bytes.
+        """
+        self.__key = key
+        self.__chunk_iv = iv + iv
+        self.__cipher = AES.new(key, AES.MODE_ECB)
+        self.__mac = b'\0' * 16
+
+    def update(self, chunk):
+        """
+        Add chunk to MAC.
+
+        Args:
+            chunk (bytes): Chunk of file contents, as given by _iter_chunks.
+        """
+        chunk_mac = AES.new(self.__key, AES.MODE_CBC, iv=self.__chunk_iv).encrypt(_pad_block(chunk))[-16:]
+        self.__mac = self.__cipher.encrypt(_xor_bytes(self.__mac, chunk_mac))
+
+    def get_meta_mac(self):
+        """
+        Get condensed MAC stored in node key.
+
+        Returns:
+            bytes: Meta MAC, 8 bytes.
+        """
+        return _xor_bytes(self.__mac[0:4], self.__mac[4:8]) + _xor_bytes(self.__mac[8:12], self.__mac[12:16])
+
+
+class MegaApiConnectionPool(object):
+    def __init__(self, pool_size=MEGA_API_POOL_SIZE, timeout=MEGA_API_TIMEOUT_SECONDS, log_level='DEBUG'):
+        """
+        Pool of keep-alive HTTP connections, kept per host. Connections are checked out for one request at a time,
+        so pool can be shared between threads.
+
+        Args:
+            pool_size (int): Idle connections kept per host.
+            timeout (int): Connection timeout in seconds.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__pool_size = pool_size
+        self.__timeout = timeout
+        self.__log_level = log_level
+        self.__connections = {}
+        self.__lock = Lock()
+
+    def _get_connection(self, scheme, netloc):
+        """
+        Get idle connection to host, or a new one if none are idle.
+
+        Args:
+            scheme (str): URL scheme. ie: "https"
+            netloc (str): Host and port.
+
+        Returns:
+            Tuple: Connection and whether connection was reused.
+        """
+        with self.__lock:
+            idle = self.__connections.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+        connection_class = HTTPSConnection if scheme == 'https' else HTTPConnection
+        return connection_class(netloc, timeout=self.__timeout), False
+
+    def _release_connection(self, scheme, netloc, connection):
+        """
+        Return connection to pool, or close it if pool is full.
+
+        Args:
+            scheme (str): URL scheme. ie: "https"
+            netloc (str): Host and port.
+            connection (HTTPConnection): Connection to release.
+        """
+        with self.__lock:
+            idle = self.__connections.setdefault((scheme, netloc), [])
+            if len(idle) < self.__pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        with self.__lock:
+            for idle in self.__connections.values():
+                for connection in idle:
+                    connection.close()
+            self.__connections.clear()
+
+    def request(self, method, url, body=None, headers=None):
+        """
+        Send HTTP request over a pooled connection. Requests on a reused connection the server already closed are
+        retried once on a new connection.
+
+        Args:
+            method (str): HTTP method. ie: "POST"
+            url (str): URL to request.
+            body (bytes): Request body.
+            headers (dict): Request headers.
+
+        Returns:
+            Tuple: HTTP status and response body.
+        """
+        logger = getLogger('MegaApiConnectionPool.request')
+        logger.setLevel(self.__log_level)
+
+        parts = urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        while True:
+            connection, reused = self._get_connection(scheme=parts.scheme, netloc=parts.netloc)
+            try:
+                connection.request(method, target, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (HTTPException, OSError) as e:
+                connection.close()
+                if reused:
+                    logger.debug(' Pooled connection to "{}" went stale. Reconnecting.'.format(parts.netloc))
+                    continue
+                raise e
+            if response.will_close:
+                connection.close()
+            else:
+                self._release_connection(scheme=parts.scheme, netloc=parts.netloc, connection=connection)
+            return response.status, data
+
+
+class MegaApiNode(object):
+    __slots__ = ('handle', 'parent', 'type', 'size', 'mtime', 'name', 'key')
+
+    def __init__(self, handle, parent, type, size, mtime, name, key):
+        """
+        Decrypted MEGA node. Of sibling nodes sharing a name, only the first is reachable by path, as with megatools.
+
+        Args:
+            handle (str): Node handle.
+            parent (str): Parent node handle. Blank for system nodes.
+            type (int): MEGA node type. 0 = file, 1 = directory, 2 = Root, 3 = Inbox, 4 = Rubbish.
+            size (int): File size in bytes. -1 for directories.
+            mtime (int): Node timestamp as epoch time in seconds.
+            name (str): Node name.
+            key (bytes): Decrypted node key. 32 bytes for files, 16 for directories, None for system nodes.
+        """
+        self.handle = handle
+        self.parent = parent
+        self.type = type
+        self.size = size
+        self.mtime = mtime
+        self.name = name
+        self.key = key
+
+
+class MegaApiSession(object):
+    def __init__(self, username, password, api_url=MEGA_API_URL, connection_pool=None, log_level='DEBUG'):
+        """
+        Authenticated MEGA API session of one account, with decrypted node tree. Session is logged in once and reused
+        for all requests of account.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            api_url (str): MEGA API URL. Can point to a stub server.
+            connection_pool (MegaApiConnectionPool): Keep-alive connection pool of account.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__username = username
+        self.__password = password
+        self.__api_url = api_url.rstrip('/')
+        self.__log_level = log_level
+        self.__pool = connection_pool if connection_pool else MegaApiConnectionPool(log_level=log_level)
+        self.__sequence = randint(0, 0xFFFFFFFF)
+        self.__lock = Lock()
+        self.__sid = None
+        self.__master_key = None
+        self.__user_handle = None
+        self.__nodes = {}
+        self.__children = {}
+        self.__paths = {}
+        self.__nodes_loaded = None
+
+    @property
+    def connection_pool(self):
+        """
+        Getter for keep-alive connection pool of session.
+
+        Returns:
+            MegaApiConnectionPool: Returns connection pool
+        """
+        return self.__pool
+
+    @property
+    def nodes_age(self):
+        """
+        Getter for seconds since node tree was fetched.
+
+        Returns:
+            Float: Returns node tree age in seconds, or None if node tree was never fetched.
+        """
+        return time() - self.__nodes_loaded if self.__nodes_loaded else None
+
+    def _add_node(self, node_data):
+        """
+        Decrypt node as returned by MEGA API and add it to node tree.
+
+        Args:
+            node_data (dict): Node as returned by MEGA API.
+
+        Returns:
+            MegaApiNode: Added node, or None if node could not be decrypted ie: nodes shared by other accounts.
+        """
+        node_type = node_data['t']
+        key = None
+        if node_type in (MEGA_NODE_FILE, MEGA_NODE_DIR):
+            for owner_key in node_data.get('k', '').split('/'):
+                owner, _, encrypted_key = owner_key.partition(':')
+                if owner == self.__user_handle and encrypted_key:
+                    key = _base64_url_decode(encrypted_key)
+                    break
+            if key is None or len(key) != (16 if node_type == MEGA_NODE_DIR else 32):
+                return None
+            key = AES.new(self.__master_key, AES.MODE_ECB).decrypt(key)
+            attributes = _decrypt_attributes(node_data.get('a', ''), key if node_type == MEGA_NODE_DIR
+                                             else _xor_bytes(key[:16], key[16:32]))
+            if not attributes or 'n' not in attributes:
+                return None
+            name = attributes['n']
+        else:
+            name = MEGA_SYSTEM_NODE_NAMES.get(node_type)
+            if not name:
+                return None
+
+        node = MegaApiNode(handle=node_data['h'], parent=node_data.get('p', ''), type=node_type,
+                           size=node_data.get('s', -1) if node_type == MEGA_NODE_FILE else -1,
+                           mtime=node_data.get('ts', 0), name=name, key=key)
+        self.__nodes[node.handle] = node
+        # Newest node of a name wins, ie: re-upload seen before deletion of node it replaces.
+        siblings = self.__children.setdefault(node.parent, {})
+        sibling = self.__nodes.get(siblings.get(node.name))
+        if sibling is None or sibling.mtime <= node.mtime:
+            siblings[node.name] = node.handle
+        self.__paths.pop(node.handle, None)
+        return node
+
+    def _remove_node(self, handle):
+        """
+        Remove node and all its descendants from node tree.
+
+        Args:
+            handle (str): Handle of node to remove.
+        """
+        node = self.__nodes.pop(handle, None)
+        if node is None:
+            return
+        siblings = self.__children.get(node.parent, {})
+        if siblings.get(node.name) == handle:
+            del siblings[node.name]
+        self.__paths.pop(handle, None)
+        for child_handle in list(self.__children.pop(handle, {}).values()):
+            self._remove_node(child_handle)
+
+    def api_request(self, command):
+        """
+        Send command to MEGA API. Temporary errors are retried with exponential backoff.
+
+        Args:
+            command (dict): API command. ie: {"a": "uq"}
+
+        Returns:
+            Object: Command result.
+        """
+        result = self.api_requests(commands=[command])[0]
+        if isinstance(result, int) and result < 0:
+            raise MegaApiError(result)
+        return result
+
+    def api_requests(self, commands):
+        """
+        Send batch of commands to MEGA API in one request. Commands answered with a temporary error are retried with
+        exponential backoff.
+
+        Args:
+            commands (list): API commands. ie: [{"a": "d", "n": "handle"}]
+
+        Returns:
+            List: Result of each command, in order. Failed commands have a negative int error code as result.
+        """
+        logger = getLogger('MegaApiSession.api_requests')
+        logger.setLevel(self.__log_level)
+
+        results = [MEGA_API_EAGAIN] * len(commands)
+        pending = list(range(len(commands)))
+        for attempt in range(MEGA_API_MAX_RETRIES):
+            with self.__lock:
+                self.__sequence = (self.__sequence + 1) & 0xFFFFFFFF
+                url = '%s/cs?id=%d' % (self.__api_url, self.__sequence)
+            if self.__sid:
+                url += '&sid=%s' % self.__sid
+            status, data = self.__pool.request(method='POST', url=url,
+                                               body=dumps([commands[index] for index in pending]).encode('utf-8'),
+                                               headers={'Content-Type': 'application/json'})
+            batch_results = MEGA_API_EAGAIN
+            if status == 200:
+                batch_results = loads(data)
+            if not isinstance(batch_results, list):
+                if batch_results != MEGA_API_EAGAIN:
+                    raise MegaApiError(batch_results)
+                batch_results = [MEGA_API_EAGAIN] * len(pending)
+
+            retry = []
+            for index, result in zip(pending, batch_results):
+                results[index] = result
+                if isinstance(result, int) and result == MEGA_API_EAGAIN:
+                    retry.append(index)
+            if not retry or attempt + 1 == MEGA_API_MAX_RETRIES:
+                break
+            pending = retry
+            logger.debug(' MEGA API busy. Retrying {} commands.'.format(len(pending)))
+            sleep(min(0.5 * 2 ** attempt, 30))
+        return results
+
+    def close(self):
+        """
+        Close idle connections of session.
+        """
+        self.__pool.close()
+
+    def create_dir(self, remote_path):
+        """
+        Create remote directory, and any missing parents.
+
+        Args:
+            remote_path (str): Remote directory path. ie: "/Root/dir"
+
+        Returns:
+            MegaApiNode: Directory node.
+        """
+        self.ensure_nodes()
+        node = self.get_node(remote_path=remote_path)
+        if node:
+            return node
+        parent_path, _, name = remote_path.rstrip('/').rpartition('/')
+        if not name or not parent_path:
+            raise MegaApiError(-9)
+        parent = self.create_dir(remote_path=parent_path)
+        key = urandom(16)
+        result = self.api_request({'a': 'p', 't': parent.handle, 'n': [{
+            'h': 'xxxxxxxx', 't': MEGA_NODE_DIR, 'a': _encrypt_attributes({'n': name}, key),
+            'k': _base64_url_encode(AES.new(self.__master_key, AES.MODE_ECB).encrypt(key))}]})
+        with self.__lock:
+            return self._add_node(node_data=result['f'][0])
+
+    def download_file(self, node, local_file_path, throttle=None):
+        """
+        Download and decrypt file node. File is written next to local file path and moved into place once complete
+        and its MAC verified.
+
+        Args:
+            node (MegaApiNode): File node to download.
+            local_file_path (str): Local file path to download to.
+            throttle (function): Called with number of bytes transferred after each request.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        result = self.api_request({'a': 'g', 'g': 1, 'n': node.handle})
+        if result.get('e'):
+            raise MegaApiError(result['e'])
+        key = _xor_bytes(node.key[:16], node.key[16:32])
+        iv = node.key[16:24]
+        cipher = AES.new(key, AES.MODE_CTR, nonce=iv, initial_value=0)
+        file_mac = FileMac(key=key, iv=iv)
+        temp_file_path = local_file_path + '.megatmp'
+        makedirs(path.dirname(local_file_path) or '.', exist_ok=True)
+        try:
+            with open(temp_file_path, 'wb') as local_file:
+                for start, length, chunk_lengths in _iter_transfer_requests(result['s']):
+                    status, data = self.__pool.request(method='GET', url='%s/%d-%d' % (result['g'], start,
+                                                                                      start + length - 1))
+                    if status != 200 or len(data) != length:
+                        raise MegaApiError(-5)
+                    data = cipher.decrypt(data)
+                    offset = 0
+                    for chunk_length in chunk_lengths:
+                        file_mac.update(data[offset:offset + chunk_length])
+                        offset += chunk_length
+                    local_file.write(data)
+                    if throttle:
+                        throttle(length)
+            if file_mac.get_meta_mac() != node.key[24:32]:
+                raise MegaApiError(-14)
+            replace(temp_file_path, local_file_path)
+            return True
+        finally:
+            if path.exists(temp_file_path):
+                remove(temp_file_path)
+
+    def ensure_nodes(self, max_age=None):
+        """
+        Fetch node tree if never fetched, or older than max age.
+
+        Args:
+            max_age (int): Seconds fetched node tree may be reused for. If None, node tree is only fetched once.
+        """
+        age = self.nodes_age
+        if age is None or (max_age is not None and age > max_age):
+            self.fetch_nodes()
+
+    def fetch_nodes(self):
+        """
+        Fetch and decrypt whole node tree of account.
+        """
+        logger = getLogger('MegaApiSession.fetch_nodes')
+        logger.setLevel(self.__log_level)
+
+        if not self.__sid:
+            self.login()
+        result = self.api_request({'a': 'f', 'c': 1})
+        with self.__lock:
+            self.__nodes = {}
+            self.__children = {}
+            self.__paths = {}
+            for node_data in result.get('f', []):
+                self._add_node(node_data=node_data)
+            self.__nodes_loaded = time()
+        logger.debug(' Fetched {} nodes of account "{}".'.format(len(self.__nodes), self.__username))
+
+    def get_node(self, remote_path):
+        """
+        Get node of remote path.
+
+        Args:
+            remote_path (str): Remote path. ie: "/Root/dir/file.txt"
+
+        Returns:
+            MegaApiNode: Node, or None if remote path does not exist.
+        """
+        self.ensure_nodes()
+        names = [name for name in remote_path.split('/') if name]
+        with self.__lock:
+            node = None
+            parent_handle = ''
+            for name in names:
+                handle = self.__children.get(parent_handle, {}).get(name)
+                if handle is None:
+                    return None
+                node = self.__nodes[handle]
+                parent_handle = handle
+            return node
+
+    def get_path(self, node):
+        """
+        Get remote path of node.
+
+        Args:
+            node (MegaApiNode): Node to get path of.
+
+        Returns:
+            str: Remote path. ie: "/Root/dir/file.txt"
+        """
+        remote_path = self.__paths.get(node.handle)
+        if remote_path is None:
+            parent = self.__nodes.get(node.parent)
+            remote_path = (self.get_path(parent) if parent else '') + '/' + node.name
+            self.__paths[node.handle] = remote_path
+        return remote_path
+
+    def get_quota(self):
+        """
+        Get account storage quota.
+
+        Returns:
+            Tuple: Used and total storage in bytes.
+        """
+        result = self.api_request({'a': 'uq', 'strg': 1, 'xfer': 1})
+        return result.get('cstrg', 0), result.get('mstrg', 0)
+
+    def iter_entries(self, remote_path):
+        """
+        Iterate remote path and all its descendants, as "megals -lR" would list them.
+
+        Args:
+            remote_path (str): Remote path to list.
+
+        Returns:
+            Generator: Tuples of (handle, parent, type, size, mtime, path). See parse_megals_long_line.
+        """
+        node = self.get_node(remote_path=remote_path)
+        if node is None:
+            return
+        with self.__lock:
+            entries = []
+            pending = [node]
+            while pending:
+                node = pending.pop()
+                entries.append((node.handle, node.parent, min(node.type, 2), node.size, node.mtime,
+                                self.get_path(node)))
+                pending.extend(self.__nodes[handle] for handle in self.__children.get(node.handle, {}).values())
+        for entry in entries:
+            yield entry
+
+    def login(self):
+        """
+        Log in to account, deriving password key as account version requires.
+        """
+        logger = getLogger('MegaApiSession.login')
+        logger.setLevel(self.__log_level)
+
+        email = self.__username.lower()
+        password = self.__password.encode('utf-8')
+        prelogin = self.api_request({'a': 'us0', 'user': email})
+        if isinstance(prelogin, dict) and prelogin.get('v') == 2:
+            derived_key = pbkdf2_hmac('sha512', password, _base64_url_decode(prelogin['s']), 100000, 32)
+            password_key = derived_key[:16]
+            user_hash = _base64_url_encode(derived_key[16:])
+        else:
+            password_key = _prepare_password_key(password)
+            user_hash = _get_user_hash(email, password_key)
+
+        result = self.api_request({'a': 'us', 'user': email, 'uh': user_hash})
+        master_key = AES.new(password_key, AES.MODE_ECB).decrypt(_base64_url_decode(result['k']))
+        if 'tsid' in result:
+            tsid = _base64_url_decode(result['tsid'])
+            if AES.new(master_key, AES.MODE_ECB).encrypt(tsid[:16]) != tsid[-16:]:
+                raise MegaApiError(-14)
+            sid = result['tsid']
+        else:
+            private_key = AES.new(master_key, AES.MODE_ECB).decrypt(_base64_url_decode(result['privk']))
+            prime_p, private_key = _read_mpi(private_key)
+            prime_q, private_key = _read_mpi(private_key)
+            private_exponent, private_key = _read_mpi(private_key)
+            encrypted_sid, _ = _read_mpi(_base64_url_decode(result['csid']))
+            decrypted_sid = pow(encrypted_sid, private_exponent, prime_p * prime_q)
+            sid = _base64_url_encode(decrypted_sid.to_bytes((decrypted_sid.bit_length() + 7) // 8, 'big')[:43])
+
+        self.__master_key = master_key
+        self.__sid = sid
+        self.__user_handle = self.api_request({'a': 'ug'})['u']
+        logger.debug(' Logged in to account "{}".'.format(self.__username))
+
+    def remove_node(self, node):
+        """
+        Remove remote node, and all its descendants.
+
+        Args:
+            node (MegaApiNode): Node to remove.
+        """
+        self.api_request({'a': 'd', 'n': node.handle})
+        with self.__lock:
+            self._remove_node(handle=node.handle)
+
+    def remove_nodes(self, nodes):
+        """
+        Remove many remote nodes, and all their descendants, sending one API request per batch.
+
+        Args:
+            nodes (list): Nodes to remove.
+
+        Returns:
+            List: Nodes that were removed.
+        """
+        removed_nodes = []
+        for index in range(0, len(nodes), MEGA_API_BATCH_SIZE):
+            batch = nodes[index:index + MEGA_API_BATCH_SIZE]
+            results = self.api_requests(commands=[{'a': 'd', 'n': node.handle} for node in batch])
+            with self.__lock:
+                for node, result in zip(batch, results):
+                    if not (isinstance(result, int) and result < 0):
+                        self._remove_node(handle=node.handle)
+                        removed_nodes.append(node)
+        return removed_nodes
+
+    def upload_file(self, local_file_path, parent, throttle=None):
+        """
+        Encrypt and upload local file into remote directory.
+
+        Args:
+            local_file_path (str): Local file path to upload.
+            parent (MegaApiNode): Remote directory node to upload into.
+            throttle (function): Called with number of bytes transferred after each request.
+
+        Returns:
+            MegaApiNode: Uploaded file node.
+        """
+        size = path.getsize(local_file_path)
+        upload_url = self.api_request({'a': 'u', 's': size})['p']
+        key = urandom(16)
+        iv = urandom(8)
+        cipher = AES.new(key, AES.MODE_CTR, nonce=iv, initial_value=0)
+        file_mac = FileMac(key=key, iv=iv)
+        completion_handle = b''
+        with open(local_file_path, 'rb') as local_file:
+            for start, length, chunk_lengths in _iter_transfer_requests(size) if size else [(0, 0, [])]:
+                data = local_file.read(length)
+                offset = 0
+                for chunk_length in chunk_lengths:
+                    file_mac.update(data[offset:offset + chunk_length])
+                    offset += chunk_length
+                status, completion_handle = self.__pool.request(method='POST', url='%s/%d' % (upload_url, start),
+                                                                body=cipher.encrypt(data))
+                if status != 200 or completion_handle.lstrip(b'-').isdigit():
+                    raise MegaApiError(int(completion_handle) if completion_handle.lstrip(b'-').isdigit() else -5)
+                if throttle:
+                    throttle(length)
+
+        meta_mac = file_mac.get_meta_mac()
+        file_key = _xor_bytes(key, iv + meta_mac) + iv + meta_mac
+        result = self.api_request({'a': 'p', 't': parent.handle, 'n': [{
+            'h': completion_handle.decode('ascii'), 't': MEGA_NODE_FILE,
+            'a': _encrypt_attributes({'n': path.basename(local_file_path)}, key),
+            'k': _base64_url_encode(AES.new(self.__master_key, AES.MODE_ECB).encrypt(file_key))}]})
+        with self.__lock:
+            return self._add_node(node_data=result['f'][0])
+
+
+class MegaApi_Lib(StorageBackend):
+    def __init__(self, down_speed_limit=None, up_speed_limit=None, log_level='DEBUG', api_url=MEGA_API_URL,
+                 remote_snapshot_ttl=REMOTE_SNAPSHOT_TTL_SECONDS, down_bandwidth=None, up_bandwidth=None):
+        """
+        Library for native interaction with the MEGA API. Storage backend keeping one logged in session and keep-alive
+        connection pool per account, instead of spawning a megatools process per call. Requires pycryptodome.
+
+        Args:
+            down_speed_limit (int): Max total download speed limit in KB/s. Used if no download allocator is given.
+            up_speed_limit (int): Max total upload speed limit in KB/s. Used if no upload allocator is given.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+            api_url (str): MEGA API URL. Can point to a stub server.
+            remote_snapshot_ttl (int): Seconds a fetched node tree may answer remote path lookups for.
+            down_bandwidth (BandwidthAllocator): Allocator splitting download speed limit between all transfers.
+            up_bandwidth (BandwidthAllocator): Allocator splitting upload speed limit between all transfers.
+        """
+        if AES is None:
+            raise ImportError('MEGA API backend requires pycryptodome. Install it with "pip install pycryptodome".')
+
+        super(MegaApi_Lib, self).__init__(log_level=log_level)
+        self.__down_bandwidth = down_bandwidth or BandwidthAllocator(speed_limit=down_speed_limit, log_level=log_level)
+        self.__up_bandwidth = up_bandwidth or BandwidthAllocator(speed_limit=up_speed_limit, log_level=log_level)
+        self.__log_level = log_level
+        self.__api_url = api_url
+        self.__remote_snapshot_ttl = remote_snapshot_ttl if remote_snapshot_ttl is not None else \
+            REMOTE_SNAPSHOT_TTL_SECONDS
+        self.__sessions = {}
+        self.__sessions_lock = Lock()
+
+    def _get_session(self, username, password):
+        """
+        Get logged in session of account. Session is created on first use and reused from then on.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+
+        Returns:
+            MegaApiSession: Session of account.
+        """
+        with self.__sessions_lock:
+            session = self.__sessions.get((username, password))
+            if session is None:
+                session = MegaApiSession(username=username, password=password, api_url=self.__api_url,
+                                         log_level=self.__log_level)
+                self.__sessions[(username, password)] = session
+        return session
+
+    def _get_quota(self, username, password):
+        """
+        Get account storage quota.
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+            Tuple: Used and total storage in bytes. (0, 0) if quota could not be gotten.
+        """
+        logger = getLogger('MegaApi_Lib._get_quota')
+        logger.setLevel(self.__log_level)
+
+        try:
+            session = self._get_session(username=username, password=password)
+            session.ensure_nodes()
+            return session.get_quota()
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return 0, 0
+
+    def close(self):
+        """
+        Close keep-alive connections of all account sessions. Called at teardown.
+        """
+        with self.__sessions_lock:
+            for session in self.__sessions.values():
+                session.close()
+
+    def create_remote_dir(self, username, password, remote_path, process_priority_class=None,
+                          process_set_priority_timeout=60):
+        """
+        Create remote directory, and any missing parents.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): Remote path of directory to create.
+            process_priority_class (str): Unused. Kept for StorageBackend compatibility.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('MegaApi_Lib.create_remote_dir')
+        logger.setLevel(self.__log_level)
+
+        try:
+            self._get_session(username=username, password=password).create_dir(remote_path=remote_path)
+            logger.debug(' Success, could create remote directory "{}".'.format(remote_path))
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def download_all_files_from_account(self, username, password, local_root, remote_root,
+                                        process_set_priority_timeout=60):
+        """
+        Download all remote files of remote root that do not exist locally.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            local_root (str): Local path to download files to.
+            remote_root (str): Remote path to download files from.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('MegaApi_Lib.download_all_files_from_account')
+        logger.setLevel(self.__log_level)
+
+        logger.debug(' MEGA downloading directory from account "%s" from "%s" to "%s"' % (username, remote_root,
+                                                                                          local_root))
+        result = True
+        try:
+            session = self._get_session(username=username, password=password)
+            session.ensure_nodes(max_age=self.__remote_snapshot_ttl)
+            remote_root = remote_root.rstrip('/')
+            for handle, parent, remote_type, size, mtime, remote_path in session.iter_entries(remote_path=remote_root):
+                local_path = path.join(local_root, *remote_path[len(remote_root):].split('/'))
+                if remote_type == MEGA_NODE_DIR:
+                    makedirs(local_path, exist_ok=True)
+                elif remote_type == MEGA_NODE_FILE and not path.exists(local_path):
+                    try:
+                        with self.__down_bandwidth.native_transfer() as throttle:
+                            session.download_file(node=session.get_node(remote_path=remote_path),
+                                                  local_file_path=local_path, throttle=throttle)
+                    except Exception as e:
+                        logger.warning(' Could not download "{}". Exception: {}'.format(remote_path, e))
+                        result = False
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+        logger.debug(' Finished downloading all files from account.')
+        return result
+
+    def download_file(self, username, password, localFilePath, remoteFilePath):
+        """
+        Download remote file to local file path.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            localFilePath (str): Local file path to download to.
+            remoteFilePath (str): Remote file path to download.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('MegaApi_Lib.download_file')
+        logger.setLevel(self.__log_level)
+
+        try:
+            session = self._get_session(username=username, password=password)
+            node = session.get_node(remote_path=remoteFilePath)
+            if node is None or node.type != MEGA_NODE_FILE:
+                logger.warning(' Remote file does not exist: "{}"'.format(remoteFilePath))
+                return False
+            with self.__down_bandwidth.native_transfer() as throttle:
+                session.download_file(node=node, local_file_path=localFilePath, throttle=throttle)
+            logger.debug(' Success, downloaded "{}".'.format(remoteFilePath))
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def get_account_free_space(self, username, password):
+        """
+        Get account free space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Free space of account in gigabytes. ie: "12.34 GiB"
+        """
+        used, total = self._get_quota(username=username, password=password)
+        return '%.2f GiB' % ((total - used) / 1024.0 ** 3) if total else 0
+
+    def get_account_total_space(self, username, password):
+        """
+        Get account total space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Total space of account in gigabytes. ie: "50.00 GiB"
+        """
+        used, total = self._get_quota(username=username, password=password)
+        return '%.2f GiB' % (total / 1024.0 ** 3) if total else 0
+
+    def get_account_used_space(self, username, password):
+        """
+        Get account used space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Used space of account in gigabytes. ie: "37.66 GiB"
+        """
+        used, total = self._get_quota(username=username, password=password)
+        return '%.2f GiB' % (used / 1024.0 ** 3) if total else 0
+
+    def get_remote_snapshot(self, username, password, remote_path, process_priority_class=None,
+                            process_set_priority_timeout=60, max_age=None, create_remote_root=True):
+        """
+        Get snapshot of remote tree from account node tree. Node tree is fetched again once older than max age, or
+        remote snapshot TTL if no max age is given.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote snapshot of.
+            process_priority_class (str): Unused. Kept for StorageBackend compatibility.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+            max_age (int): If given, a node tree up to this many seconds old is used instead of fetching again.
+            create_remote_root (bool): Whether to create remote path if it does not exist.
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree, or None if remote path could not be listed.
+        """
+        logger = getLogger('MegaApi_Lib.get_remote_snapshot')
+        logger.setLevel(self.__log_level)
+
+        try:
+            session = self._get_session(username=username, password=password)
+            session.ensure_nodes(max_age=max_age if max_age is not None else 0)
+            if create_remote_root and not session.get_node(remote_path=remote_path):
+                session.create_dir(remote_path=remote_path)
+            snapshot = RemoteSnapshot.from_megals_entries(entries=session.iter_entries(remote_path=remote_path),
+                                                          remote_root=remote_path, log_level=self.__log_level)
+            if len(snapshot):
+                logger.debug(' Success, could get remote snapshot with {} entries.'.format(len(snapshot)))
+                return snapshot
+            logger.warning(' Remote path does not exist: "{}"'.format(remote_path))
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+        return None
+
+    def iter_remote_file_data_recursively(self, username, password, remote_path='/', err_lines=None):
+        """
+        Iterate all remote file data of remote path from account node tree.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote files from.
+            err_lines (list): If given, errors are appended to it.
+
+        Returns:
+            Generator: Tuples of (handle, parent, type, size, mtime, path). See parse_megals_long_line.
+        """
+        try:
+            session = self._get_session(username=username, password=password)
+            session.ensure_nodes(max_age=self.__remote_snapshot_ttl)
+            for entry in session.iter_entries(remote_path=remote_path):
+                yield entry
+        except Exception as e:
+            if err_lines is not None:
+                err_lines.append(str(e))
+
+    def lookup_remote_path(self, username, password, remote_path, remote_root=None):
+        """
+        Look up remote path details from account node tree. Node tree is fetched again once older than remote
+        snapshot TTL.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): Remote path to look up.
+            remote_root (str): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            Dictionary: Keys "exists" (bool), "type" (int), "size" (int) and "mtime" (int epoch seconds). Type, size
+                and mtime are None if remote path does not exist.
+        """
+        logger = getLogger('MegaApi_Lib.lookup_remote_path')
+        logger.setLevel(self.__log_level)
+
+        node = None
+        try:
+            session = self._get_session(username=username, password=password)
+            session.ensure_nodes(max_age=self.__remote_snapshot_ttl)
+            node = session.get_node(remote_path=remote_path)
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+
+        if node is None:
+            logger.debug(' Remote path does NOT exist: "{}"'.format(remote_path))
+            return {'exists': False, 'type': None, 'size': None, 'mtime': None}
+        return {'exists': True, 'type': min(node.type, 2), 'size': node.size, 'mtime': node.mtime}
+
+    def remove_remote_path(self, username, password, remote_file_path, process_priority_class=None,
+                           process_set_priority_timeout=60):
+        """
+        Remove remote file or directory.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_file_path (str): remote file path to remove.
+            process_priority_class (str): Unused. Kept for StorageBackend compatibility.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            boolean: whether successful or not.
+        """
+        logger = getLogger('MegaApi_Lib.remove_remote_path')
+        logger.setLevel(self.__log_level)
+
+        try:
+            session = self._get_session(username=username, password=password)
+            node = session.get_node(remote_path=remote_file_path)
+            if node is None:
+                logger.debug(' Error, remote file does not exist! "{}"'.format(remote_file_path))
+                return False
+            session.remove_node(node=node)
+            logger.debug(' Success, could remove remote file: "{}"'.format(remote_file_path))
+            return True
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+    def remove_remote_paths(self, username, password, remote_file_paths, process_priority_class=None,
+                            process_set_priority_timeout=60):
+        """
+        Remove many remote files or directories, sending batches of delete commands per API request.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_file_paths (list): remote file paths to remove.
+            process_priority_class (str): Unused. Kept for StorageBackend compatibility.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            List: Remote file paths that were removed.
+        """
+        logger = getLogger('MegaApi_Lib.remove_remote_paths')
+        logger.setLevel(self.__log_level)
+
+        removed_paths = []
+        try:
+            session = self._get_session(username=username, password=password)
+            nodes = []
+            node_paths = {}
+            for remote_file_path in remote_file_paths:
+                node = session.get_node(remote_path=remote_file_path)
+                if node is None:
+                    logger.debug(' Error, remote file does not exist! "{}"'.format(remote_file_path))
+                elif node.handle not in node_paths:
+                    nodes.append(node)
+                    node_paths[node.handle] = remote_file_path
+            for node in session.remove_nodes(nodes=nodes):
+                removed_paths.append(node_paths[node.handle])
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+
+        logger.debug(' Removed %d of %d remote files.' % (len(removed_paths), len(remote_file_paths)))
+        return removed_paths
+
+    def upload_files(self, username, password, local_file_paths, remote_dir_path, process_priority_class=None,
+                     process_set_priority_timeout=60):
+        """
+        Upload local files into remote directory.
+
+        Args:
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            local_file_paths (list): Local file paths to upload.
+            remote_dir_path (str): Remote directory path to upload into.
+            process_priority_class (str): Unused. Kept for StorageBackend compatibility.
+            process_set_priority_timeout (int): Unused. Kept for StorageBackend compatibility.
+
+        Returns:
+            List: Local file paths that were uploaded.
+        """
+        logger = getLogger('MegaApi_Lib.upload_files')
+        logger.setLevel(self.__log_level)
+
+        uploaded_paths = []
+        try:
+            session = self._get_session(username=username, password=password)
+            remote_dir = session.create_dir(remote_path=remote_dir_path.rstrip('/'))
+            for local_file_path in local_file_paths:
+                try:
+                    with self.__up_bandwidth.native_transfer() as throttle:
+                        session.upload_file(local_file_path=local_file_path, parent=remote_dir, throttle=throttle)
+                    uploaded_paths.append(local_file_path)
+                except Exception as e:
+                    logger.warning(' Could not upload "{}". Exception: {}'.format(local_file_path, e))
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+
+        logger.debug(' Uploaded {} of {} files to "{}".'.format(len(uploaded_paths), len(local_file_paths),
+                                                               remote_dir_path))
+        return uploaded_paths
@@ -4,11 +4,17 @@
 # Initial Creation.
 ###
 
+from .bandwidth_lib import BandwidthAllocator
 from .lib import Lib
+from .remote_snapshot_lib import parse_megals_long_line, RemoteSnapshot
+from .storage_backend_lib import StorageBackend
+from hashlib import md5
 from logging import getLogger
-from os import linesep, path, sep
+from os import chmod, close, fdopen, linesep, makedirs, open as open_fd, O_CREAT, O_TRUNC, O_WRONLY, path, remove, sep
 from platform import system
-from re import findall, split, sub
+from re import findall, sub
+from threading import Lock
+from time import localtime, strftime
 
 __author__ = 'szmania'
 
@@ -16,26 +22,192 @@ HOME_DIRECTORY = "~"
 MEGA_MANAGER_CONFIG_DIR = path.join("{HOME_DIRECTORY}".format(HOME_DIRECTORY=HOME_DIRECTORY),".mega_manager")
 MEGATOOLS_LOG_PATH = path.join("{MEGA_MANAGER_CONFIG_DIR}".format(
     MEGA_MANAGER_CONFIG_DIR=MEGA_MANAGER_CONFIG_DIR), "logs","mega_tools.log")
-
-
-class MegaTools_Lib(object):
-    def __init__(self, down_speed_limit=None, up_speed_limit=None, log_level='DEBUG', log_file_path=MEGATOOLS_LOG_PATH):
+MEGATOOLS_CONFIG_DIR_PATH = path.join("{MEGA_MANAGER_CONFIG_DIR}".format(
+    MEGA_MANAGER_CONFIG_DIR=MEGA_MANAGER_CONFIG_DIR), "data", "megatools")
+MEGATOOLS_CACHE_TIMEOUT_SECONDS = 60
+# First megatools version whose config file supports the cached filesystem "[Cache]" section.
+MEGATOOLS_CACHE_MIN_VERSION = (1, 10, 0)
+# Paths passed to a single megarm, megamkdir or megaput invocation, capped by count and by command line length.
+MEGATOOLS_BATCH_SIZE = 100
+MEGATOOLS_MAX_COMMAND_LENGTH = 8000
+REMOTE_SNAPSHOT_TTL_SECONDS = 300  # 5 minutes
+
+
+def _iter_path_batches(paths, prefix_length):
+    """
+    Split paths into batches small enough to pass to one megatools invocation.
+
+    Args:
+        paths (list): Paths to split.
+        prefix_length (int): Length of command line before the quoted paths.
+
+    Returns:
+        Generator: Lists of paths.
+    """
+    batch = []
+    cmd_length = prefix_length
+    for file_path in paths:
+        path_length = len(file_path) + 3
+        if batch and (len(batch) >= MEGATOOLS_BATCH_SIZE or cmd_length + path_length > MEGATOOLS_MAX_COMMAND_LENGTH):
+            yield batch
+            batch = []
+            cmd_length = prefix_length
+        batch.append(file_path)
+        cmd_length += path_length
+    if batch:
+        yield batch
+
+
+class MegaTools_Lib(StorageBackend):
+    def __init__(self, down_speed_limit=None, up_speed_limit=None, log_level='DEBUG', log_file_path=MEGATOOLS_LOG_PATH,
+                 remote_snapshot_ttl=REMOTE_SNAPSHOT_TTL_SECONDS, config_dir_path=MEGATOOLS_CONFIG_DIR_PATH,
+                 cache_timeout=MEGATOOLS_CACHE_TIMEOUT_SECONDS, down_bandwidth=None, up_bandwidth=None):
         """
-        Library for interaction with MegaTools. A tool suite for MEGA.
+        Library for interaction with MegaTools. A tool suite for MEGA. Default storage backend.
 
         Args:
             log_file_path (str): Log file path for MEGATools
-            down_speed_limit (int): Max download speed limit.
-            up_speed_limit (int): Max upload speed limit.
+            down_speed_limit (int): Max total download speed limit in KB/s. Used if no download allocator is given.
+            up_speed_limit (int): Max total upload speed limit in KB/s. Used if no upload allocator is given.
             log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+            remote_snapshot_ttl (int): Seconds a cached remote listing may answer remote path lookups for.
+            config_dir_path (str): Directory to write per account megatools config files to.
+            cache_timeout (int): Seconds megatools may reuse its cached session and filesystem for.
+            down_bandwidth (BandwidthAllocator): Allocator splitting download speed limit between all transfers.
+            up_bandwidth (BandwidthAllocator): Allocator splitting upload speed limit between all transfers.
         """
+        super(MegaTools_Lib, self).__init__(log_level=log_level)
         self.__mega_tools_log = log_file_path
-        self.__downSpeedLimit = down_speed_limit
-        self.__up_speed_limit = up_speed_limit
+        self.__down_bandwidth = down_bandwidth or BandwidthAllocator(speed_limit=down_speed_limit, log_level=log_level)
+        self.__up_bandwidth = up_bandwidth or BandwidthAllocator(speed_limit=up_speed_limit, log_level=log_level)
         self.__log_level = log_level
+        self.__remote_snapshot_ttl = remote_snapshot_ttl if remote_snapshot_ttl is not None else REMOTE_SNAPSHOT_TTL_SECONDS
+        self.__remote_snapshots = {}
+        self.__remote_snapshots_lock = Lock()
+        self.__config_dir_path = path.expanduser(config_dir_path)
+        self.__cache_timeout = cache_timeout if cache_timeout is not None else MEGATOOLS_CACHE_TIMEOUT_SECONDS
+        self.__account_configs = {}
+        self.__account_configs_lock = Lock()
+        self.__megatools_version = None
 
         self.__lib = Lib(log_level=log_level)
 
+    def _cache_remote_snapshot(self, username, snapshot):
+        """
+        Cache remote snapshot for remote path lookups, dropping expired snapshots.
+
+        Args:
+            username (str): username of MEGA account snapshot belongs to.
+            snapshot (RemoteSnapshot): Snapshot to cache.
+        """
+        with self.__remote_snapshots_lock:
+            for key in [key for key, cached in self.__remote_snapshots.items() if cached.age > self.__remote_snapshot_ttl]:
+                del self.__remote_snapshots[key]
+            self.__remote_snapshots[(username, snapshot.remote_root)] = snapshot
+
+    def _get_cached_remote_snapshot(self, username, remote_path):
+        """
+        Get cached, unexpired remote snapshot covering remote path.
+
+        Args:
+            username (str): username of MEGA account.
+            remote_path (str): Remote path to be covered by snapshot.
+
+        Returns:
+            RemoteSnapshot: Cached snapshot, or None if no unexpired snapshot covers remote path.
+        """
+        with self.__remote_snapshots_lock:
+            for (cached_username, cached_root), snapshot in self.__remote_snapshots.items():
+                if cached_username == username and snapshot.age <= self.__remote_snapshot_ttl \
+                        and snapshot.contains(remote_path):
+                    return snapshot
+        return None
+
+    def _get_login_args(self, username, password):
+        """
+        Get megatools login arguments for account. A config file is written for account on first use and passed via
+        "--config" from then on, so credentials stay out of the process list and megatools can reuse its session.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+
+        Returns:
+            String: Login arguments. ie: '--config "/home/user/.mega_manager/data/megatools/<hash>.megarc"'
+        """
+        logger = getLogger('MegaTools_Lib._get_login_args')
+        logger.setLevel(self.__log_level)
+
+        with self.__account_configs_lock:
+            config_path = self.__account_configs.get((username, password))
+            if not config_path:
+                config_path = self._write_account_config(username=username, password=password)
+                if config_path:
+                    self.__account_configs[(username, password)] = config_path
+        if config_path:
+            return '--config "%s"' % config_path
+
+        logger.warning(' Could not write megatools config file for "%s". Passing credentials as arguments.' % username)
+        return '-u %s -p %s' % (username, password)
+
+    def _get_speed_limit_arg(self, speed_limit):
+        """
+        Get megatools speed limit argument.
+
+        Args:
+            speed_limit (int): Speed limit in KB/s. None for no limit.
+
+        Returns:
+            String: Speed limit argument, with leading space. Empty string if no limit.
+        """
+        return ' --limit-speed %d' % speed_limit if speed_limit else ''
+
+    def _write_account_config(self, username, password):
+        """
+        Write megatools config file with login, and cached filesystem settings if megatools version supports it.
+        File is only readable by owner.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+
+        Returns:
+            String: Config file path, or None if file could not be written.
+        """
+        logger = getLogger('MegaTools_Lib._write_account_config')
+        logger.setLevel(self.__log_level)
+
+        config_path = path.join(self.__config_dir_path, '%s.megarc' % md5(username.encode('utf-8')).hexdigest())
+        lines = ['[Login]',
+                 'Username = %s' % username.replace('\\', '\\\\'),
+                 'Password = %s' % password.replace('\\', '\\\\')]
+        version = self.get_megatools_version()
+        if version and version >= MEGATOOLS_CACHE_MIN_VERSION:
+            lines.extend(['', '[Cache]', 'Timeout = %d' % self.__cache_timeout])
+
+        try:
+            makedirs(self.__config_dir_path, exist_ok=True)
+            fd = open_fd(config_path, O_WRONLY | O_CREAT | O_TRUNC, 0o600)
+            try:
+                config_file = fdopen(fd, 'w')
+            except Exception:
+                close(fd)
+                raise
+            with config_file:
+                config_file.write('\n'.join(lines) + '\n')
+            chmod(config_path, 0o600)
+            logger.debug(' Success, wrote megatools config file "%s".' % config_path)
+            return config_path
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return None
+
+    def close(self):
+        """
+        Delete megatools config files written for accounts. Called at teardown.
+        """
+        self.delete_account_configs()
+
     def create_remote_dir(self, username, password, remote_path, process_priority_class, process_set_priority_timeout):
         """
         Create remote MEGA directory
@@ -55,7 +227,7 @@ class MegaTools_Lib(object):
 
         logger.debug(' Creating remote directory for account "{}" in MEGA: "{}"'.format(username, remote_path))
         try:
-            cmd = 'megamkdir -u {} -p {} "{}"'.format(username, password, remote_path)
+            cmd = 'megamkdir {} "{}"'.format(self._get_login_args(username, password), remote_path)
 
             process_name = 'megamkdir.exe' if system() == 'Windows' else 'megamkdir'
             result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
@@ -74,6 +246,63 @@ class MegaTools_Lib(object):
             logger.error(' Exception: {}'.format(e))
             return False
 
+    def create_remote_dirs(self, username, password, remote_paths, process_priority_class=None,
+                           process_set_priority_timeout=60):
+        """
+        Create many remote directories, passing a batch of paths to each megamkdir invocation. Directories are
+        created in given order, so parents must come before their children.
+
+        Args:
+            username (str): username of account to create directories in
+            password (str): password of account to create directories in
+            remote_paths (list): Remote paths of directories to create, parents before children.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            List: Remote paths of directories that were created.
+        """
+        logger = getLogger('MegaTools_Lib.create_remote_dirs')
+        logger.setLevel(self.__log_level)
+
+        logger.debug(' Creating {} remote directories for account "{}".'.format(len(remote_paths), username))
+        cmd_prefix = 'megamkdir %s' % self._get_login_args(username, password)
+        process_name = 'megamkdir.exe' if system() == 'Windows' else 'megamkdir'
+        created_paths = []
+        for batch in _iter_path_batches(paths=remote_paths, prefix_length=len(cmd_prefix)):
+            cmd = '%s %s' % (cmd_prefix, ' '.join('"%s"' % remote_path for remote_path in batch))
+            if self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                   process_name=process_name, process_priority_class=process_priority_class,
+                                   process_set_priority_timeout=process_set_priority_timeout):
+                created_paths.extend(batch)
+            else:
+                logger.debug(' Error, could NOT create batch of {} remote directories!'.format(len(batch)))
+
+        logger.debug(' Created {} of {} remote directories.'.format(len(created_paths), len(remote_paths)))
+        return created_paths
+
+    def delete_account_configs(self):
+        """
+        Delete all megatools config files written for accounts.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('MegaTools_Lib.delete_account_configs')
+        logger.setLevel(self.__log_level)
+
+        result = True
+        with self.__account_configs_lock:
+            for config_path in self.__account_configs.values():
+                try:
+                    if path.exists(config_path):
+                        remove(config_path)
+                except Exception as e:
+                    logger.warning(' Exception: {}'.format(e))
+                    result = False
+            self.__account_configs.clear()
+        return result
+
     def download_all_files_from_account(self, username, password, local_root, remote_root, process_set_priority_timeout):
         """
         Download all account files.
@@ -93,18 +322,14 @@ class MegaTools_Lib(object):
 
         logger.debug(' MEGA downloading directory from account "%s" from "%s" to "%s"' % (username, local_root, remote_root))
 
-        if self.__downSpeedLimit:
-            cmd = 'megacopy --download -u %s -p %s --limit-speed %d --local "%s" --remote "%s"' % (
-                username, password, self.__downSpeedLimit, local_root, remote_root)
-
-        else:
-            cmd = 'megacopy --download -u %s -p %s --local "%s" --remote "%s"' % (
-                username, password, local_root, remote_root)
-
         process_name = 'megacopy.exe' if system() == 'Windows' else 'megacopy'
-        result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
-                                     process_priority_class='NORMAL_PRIORITY_CLASS', process_name=process_name,
-                                     process_set_priority_timeout=process_set_priority_timeout)
+        with self.__down_bandwidth.process_transfer() as speed_limit:
+            cmd = 'megacopy --download %s%s --local "%s" --remote "%s"' % (
+                self._get_login_args(username, password), self._get_speed_limit_arg(speed_limit), local_root,
+                remote_root)
+            result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                         process_priority_class='NORMAL_PRIORITY_CLASS', process_name=process_name,
+                                         process_set_priority_timeout=process_set_priority_timeout)
 
         if result:
             logger.debug(' Success, downloadeded all files from account.')
@@ -113,7 +338,7 @@ class MegaTools_Lib(object):
             logger.debug(' Error, could not download all files from account!')
             return False
 
-    def download_file(self, username, password, localFilePath, remoteFilePath):
+    def download_file(self, username, password, localFilePath, remoteFilePath, process_set_priority_timeout=60):
         """
         Download a remote file from MEGA account.
 
@@ -122,21 +347,25 @@ class MegaTools_Lib(object):
             password (str): password of account to __download file from
             localFilePath (str): Location to __download file to.
             remoteFilePath (str): Location to __download file from.
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
 
         Returns:
             bool: whether successful download or not
         """
 
-        logger = getLogger('MegaManager._download_file')
+        logger = getLogger('MegaTools_Lib.download_file')
         logger.setLevel(self.__log_level)
 
-        logger.debug(' MEGA downloading file from account "%s" - "%s" to "%s"' % (username, password, localFilePath))
+        logger.debug(' MEGA downloading file from account "%s" to "%s"' % (username, localFilePath))
 
-        cmd = 'megaget -u %s -p %s --path "%s" "%s"' % (username, password, localFilePath, remoteFilePath)
         process_name = 'megaget.exe' if system() == 'Windows' else 'megaget'
-        result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
-                                     process_priority_class='NORMAL_PRIORITY_CLASS', process_name=process_name,
-                                     process_set_priority_timeout=self.__process_set_priority_timeout)
+        with self.__down_bandwidth.process_transfer() as speed_limit:
+            cmd = 'megaget %s --no-progress%s --path "%s" "%s"' % (
+                self._get_login_args(username, password), self._get_speed_limit_arg(speed_limit), localFilePath,
+                remoteFilePath)
+            result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                         process_priority_class='NORMAL_PRIORITY_CLASS', process_name=process_name,
+                                         process_set_priority_timeout=process_set_priority_timeout)
 
         if result:
             logger.debug(' Successfully downloaded file.')
@@ -163,16 +392,11 @@ class MegaTools_Lib(object):
 
         logger.debug(' Getting file date from "%s"' % line)
 
-        line_split = line.split()
-
-        if len(line_split) > 2:
-            remoteFileModifiedDate = line_split[4]
-            remoteFileModifiedTime = line_split[5]
-
-            remoteFileModifiedDate_time = '%s %s' % (remoteFileModifiedDate, remoteFileModifiedTime)
+        mega_file = MegaToolsFile.from_megals_line(line)
 
+        if mega_file:
             logger.debug(' Success, could find remote file modified date.')
-            return remoteFileModifiedDate_time
+            return mega_file.date
 
         logger.warning(' Error, could NOT find remote file modified date!')
         return None
@@ -194,13 +418,12 @@ class MegaTools_Lib(object):
         logger.setLevel(self.__log_level)
 
         logger.debug(' Getting file extension from "%s"' % line)
-        fileExt = None
-        try:
-            fileExt = path.splitext(split(r':\d{2} ', line)[1])[1]
-        except Exception as e:
-            logger.error('Exception: %s' % str(e))
-        finally:
-            return fileExt
+        mega_file = MegaToolsFile.from_megals_line(line)
+        if mega_file:
+            return mega_file.extension
+
+        logger.error(' Error, could not get file extension from line "%s"' % line)
+        return None
 
     def get_file_path_from_megals_line_data(self, line):
         """
@@ -219,13 +442,12 @@ class MegaTools_Lib(object):
         logger.setLevel(self.__log_level)
 
         logger.debug(' Getting file path from "%s"' % line)
-        remote_filePath = None
-        try:
-            remote_filePath = split(r':\d{2} ', line)[1]
-        except Exception as e:
-            logger.error('Exception: %s' % str(e))
-        finally:
-            return remote_filePath
+        mega_file = MegaToolsFile.from_megals_line(line)
+        if mega_file:
+            return mega_file.path
+
+        logger.error(' Error, could not get file path from line "%s"' % line)
+        return None
 
     def get_file_size_from_megals_line_data(self, line):
         """
@@ -245,9 +467,9 @@ class MegaTools_Lib(object):
 
         logger.debug(' Getting file size from "%s"' % line)
 
-        line_split = line.split()
-        if len(line_split) > 2:
-            remoteFileSize = line_split[3]
+        mega_file = MegaToolsFile.from_megals_line(line)
+        if mega_file:
+            remoteFileSize = str(mega_file.size) if mega_file.size >= 0 else '-'
             logger.debug(' Success, remote file size of line "%s" is "%s"' % (line, remoteFileSize))
             return remoteFileSize
         else:
@@ -270,13 +492,12 @@ class MegaTools_Lib(object):
         logger.setLevel(self.__log_level)
         logger.debug(' Getting file type from "%s"' % line)
 
-        remote_type = None
-        try:
-            remote_type = line.split()[2]
-        except Exception as e:
-            logger.error('Exception: %s' % str(e))
-        finally:
-            return remote_type
+        mega_file = MegaToolsFile.from_megals_line(line)
+        if mega_file:
+            return str(mega_file.type)
+
+        logger.error(' Error, could not get file type from line "%s"' % line)
+        return None
 
     def get_account_free_space(self, username, password):
         """
@@ -295,7 +516,7 @@ class MegaTools_Lib(object):
 
         # chdir('%s' % self.__mega_tools_dir)
 
-        cmd = 'megadf --free -h --gb -u %s -p %s' % (username, password)
+        cmd = 'megadf --free -h --gb %s' % self._get_login_args(username, password)
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
         if err:
@@ -323,7 +544,7 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.get_account_used_space')
         logger.setLevel(self.__log_level)
 
-        cmd = 'megadf --used -h --gb -u %s -p %s' % (username, password)
+        cmd = 'megadf --used -h --gb %s' % self._get_login_args(username, password)
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
         if err:
@@ -351,7 +572,7 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.get_account_total_space')
         logger.setLevel(self.__log_level)
 
-        cmd = 'megadf --total -h --gb -u %s -p %s' % (username, password)
+        cmd = 'megadf --total -h --gb %s' % self._get_login_args(username, password)
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
         if err:
@@ -364,7 +585,28 @@ class MegaTools_Lib(object):
         logger.debug(' Error, could NOT get account total space!')
         return None
 
-    def get_remote_dir_size(self, username, password, localDirPath, localRoot, remoteRoot):
+    def get_megatools_version(self):
+        """
+        Get installed megatools version. Detected once and cached.
+
+        Returns:
+            Tuple: Version as integers ie: (1, 10, 3), or None if version could not be detected.
+        """
+        logger = getLogger('MegaTools_Lib.get_megatools_version')
+        logger.setLevel(self.__log_level)
+
+        if self.__megatools_version is None:
+            out, err = self.__lib.exec_cmd_and_return_output(command='megals --version')
+            found = findall(r'(\d+)\.(\d+)\.(\d+)', '%s %s' % (out or '', err or ''))
+            if found:
+                self.__megatools_version = tuple(int(part) for part in found[0])
+                logger.debug(' Megatools version: %s' % '.'.join(found[0]))
+            else:
+                logger.warning(' Could not detect megatools version.')
+                self.__megatools_version = ()
+        return self.__megatools_version or None
+
+    def get_remote_dir_size(self, username, password, localDirPath, localRoot, remoteRoot, remote_snapshot=None):
         """
         Get remote directory sizes of equivalent local file path
 
@@ -374,6 +616,7 @@ class MegaTools_Lib(object):
             localDirPath (str): Local directory path of remote file size to get
             localRoot (str): Local root path of local account files to map with remote root.
             remoteRoot (str): Remote root path of remote accounts to map with local root.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root. If given, no listing is done.
 
         Returns:
              tuple: Remote directory size and remote directory path
@@ -385,19 +628,21 @@ class MegaTools_Lib(object):
         remotePath = self.__lib.get_remote_path_from_local_path(localPath=localDirPath, localRoot=localRoot,
                                                                 remoteRoot=remoteRoot)
 
+        if remotePath and remote_snapshot:
+            logger.debug(' Success, could get remote directory size from snapshot.')
+            return remote_snapshot.get_dir_size(remote_dir_path=remotePath)
+
         if remotePath:
 
-            cmd = 'megals -lR -u %s -p %s "%s"' % (username, password, remotePath)
+            cmd = 'megals -lR %s "%s"' % (self._get_login_args(username, password), remotePath)
             out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
             lines = out.split(linesep)
             totalRemoteDirSize = 0
             for line in lines:
-                line_split = line.split()
-                if len(line_split) > 2:
-                    remoteFileSize = line_split[3]
-                    if remoteFileSize.isdigit():
-                        totalRemoteDirSize = totalRemoteDirSize + int(remoteFileSize)
+                mega_file = MegaToolsFile.from_megals_line(line)
+                if mega_file and mega_file.size > 0:
+                    totalRemoteDirSize = totalRemoteDirSize + mega_file.size
 
             logger.debug(' Success, could get remote directory size.')
             return totalRemoteDirSize
@@ -423,7 +668,7 @@ class MegaTools_Lib(object):
 
         logger.debug(' Get remote directories.')
 
-        cmd = ['start', '/B', 'megals', '-u', '%s' % username, '-p', '%s' % password, '"%s"' % remote_path]
+        cmd = 'megals %s "%s"' % (self._get_login_args(username, password), remote_path)
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
         dirs = out.split(linesep)
@@ -452,7 +697,7 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.get_remote_file_data_recursively')
         logger.setLevel(self.__log_level)
 
-        cmd = 'megals -lR -u %s -p %s "%s"' % (username, password, remote_path)
+        cmd = 'megals -lR %s "%s"' % (self._get_login_args(username, password), remote_path)
 
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd, output_file=self.__mega_tools_log)
 
@@ -467,67 +712,6 @@ class MegaTools_Lib(object):
         logger.warning(str(err))
         return None
 
-    def get_remote_file_modified_date(self, username, password, remotePath):
-        """
-        Get remote file modified date of equivalent local file path
-
-        Args:
-            username (str): username for MEGA account
-            password (str): password for MEGA account
-            remotePath (str): Remote file path of remote file size to get
-
-        Returns:
-             Tuple: Remote file modified data and remote file path
-        """
-
-        logger = getLogger('MegaTools_Lib.get_remote_file_modified_date')
-        logger.setLevel(self.__log_level)
-
-        cmd = 'megals -ln -u %s -p %s "%s"' % (username, password, remotePath)
-        out, err = self.__lib.exec_cmd_and_return_output(cmd)
-        line_split = out.split()
-
-        if len(line_split) > 2:
-            remoteFileModifiedDate = line_split[4]
-            remoteFileModifiedTime = line_split[5]
-
-            remoteFileModifiedDate_time = '%s %s' % (remoteFileModifiedDate, remoteFileModifiedTime)
-
-            logger.debug(' Success, could find remote file modified date.')
-            return remoteFileModifiedDate_time
-
-        logger.warning(' Error, could NOT find remote file modified date!')
-        return None
-
-    def get_remote_file_size(self, username, password, remotePath='/'):
-        """
-        Get remote file size in bytes of given remote path.
-
-        Args:
-            username (str): username for MEGA account
-            password (str): password for MEGA account
-            remotePath (str): remote path of file to get size for
-
-        Returns:
-             int: remote file size
-        """
-
-        logger = getLogger('MegaTools_Lib.get_remote_file_size')
-        logger.setLevel(self.__log_level)
-
-        cmd = 'megals -ln -u %s -p %s "%s"' % (username, password, remotePath)
-        out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
-
-        line_split = out.split()
-        if len(line_split) > 2:
-            remoteFileSize = line_split[3]
-            logger.debug(' Success, remote file size for path "%s" is "%s"' % (remotePath, remoteFileSize))
-            return int(remoteFileSize)
-        else:
-            logger.error(' Error, could not get remote file size of path "%s"' % remotePath)
-            return None
-
-
     def get_remote_file_size_from_local_path(self, username, password, localFilePath, localRoot, remoteRoot):
         """
         Get remote file sizes of equivalent local file path
@@ -549,7 +733,8 @@ class MegaTools_Lib(object):
         remotePath = self.__lib.get_remote_path_from_local_path(localPath=localFilePath, localRoot=localRoot,
                                                                 remoteRoot=remoteRoot)
         if remotePath:
-            remoteFileSize = self.get_remote_file_size(username=username, password=password, remotePath=remotePath)
+            remoteFileSize = self.get_remote_file_size(username=username, password=password, remotePath=remotePath,
+                                                       remote_root=remoteRoot)
             return remoteFileSize
 
         return None
@@ -572,7 +757,7 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.get_remote_file_paths_recursively')
         logger.setLevel(self.__log_level)
 
-        cmd = 'megals -R -u %s -p %s "%s"' % (username, password, remote_path)
+        cmd = 'megals -R %s "%s"' % (self._get_login_args(username, password), remote_path)
 
         # out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
@@ -594,6 +779,56 @@ class MegaTools_Lib(object):
         logger.warning(' Error in megals output. Returning "None".')
         return None
 
+    def get_remote_snapshot(self, username, password, remote_path, process_priority_class=None,
+                            process_set_priority_timeout=60, max_age=None, create_remote_root=True):
+        """
+        Get snapshot of remote tree from a single recursive listing. Snapshot is meant to be shared by all consumers
+        of remote data for a path mapping during a sync cycle.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote snapshot of.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+            max_age (int): If given, a cached snapshot of remote path up to this many seconds old is returned instead
+                of listing again.
+            create_remote_root (bool): Whether to create remote path if it could not be listed.
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree, or None if remote listing failed.
+        """
+        logger = getLogger('MegaTools_Lib.get_remote_snapshot')
+        logger.setLevel(self.__log_level)
+
+        if max_age is not None:
+            with self.__remote_snapshots_lock:
+                cached = self.__remote_snapshots.get((username, remote_path))
+            if cached and cached.age <= max_age:
+                logger.debug(' Using cached remote snapshot of "{}".'.format(remote_path))
+                return cached
+
+        logger.debug(' Getting remote snapshot for account "{}" of "{}".'.format(username, remote_path))
+        err_lines = []
+        entries = self.iter_remote_file_data_recursively(username=username, password=password, remote_path=remote_path,
+                                                         err_lines=err_lines)
+        snapshot = RemoteSnapshot.from_megals_entries(entries=entries, remote_root=remote_path,
+                                                      log_level=self.__log_level)
+        err = linesep.join(err_lines)
+
+        if not err and len(snapshot):
+            self._cache_remote_snapshot(username=username, snapshot=snapshot)
+            logger.debug(' Success, could get remote snapshot with {} entries.'.format(len(snapshot)))
+            return snapshot
+
+        if create_remote_root:
+            self.create_remote_dir(username=username, password=password, remote_path=remote_path,
+                                   process_priority_class=process_priority_class,
+                                   process_set_priority_timeout=process_set_priority_timeout)
+        logger.warning(' Warning: {}'.format(err))
+        logger.warning(' Error in megals output. Returning "None".')
+        return None
+
     def get_remote_subdir_names_only(self, username, password, remote_path):
         """
         Get remote sub directory names only.
@@ -612,7 +847,7 @@ class MegaTools_Lib(object):
         logger.setLevel(self.__log_level)
 
         remote_root = remote_path + '/'
-        cmd = 'start /B megals -n -u %s -p %s "%s"' % (username, password, remote_root)
+        cmd = 'start /B megals -n %s "%s"' % (self._get_login_args(username, password), remote_root)
         out, err = self.__lib.exec_cmd_and_return_output(command=cmd)
 
         if not err:
@@ -671,6 +906,65 @@ class MegaTools_Lib(object):
             logger.error(' Exception: {}'.format(e))
             return False
 
+    def iter_remote_file_data_recursively(self, username, password, remote_path='/', err_lines=None):
+        """
+        Stream all remote file data of remote path, parsing "megals -lR" output line by line as megals writes it.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote files from.
+            err_lines (list): If given, megals errors are appended to it.
+
+        Returns:
+            Generator: MegaToolsFile records, one per listed remote file or directory.
+        """
+        logger = getLogger('MegaTools_Lib.iter_remote_file_data_recursively')
+        logger.setLevel(self.__log_level)
+
+        cmd = 'megals -lR %s "%s"' % (self._get_login_args(username, password), remote_path)
+        for line in self.__lib.exec_cmd_and_iter_output(command=cmd, output_file=self.__mega_tools_log,
+                                                        err_lines=err_lines):
+            mega_file = MegaToolsFile.from_megals_line(line)
+            if mega_file is not None:
+                yield mega_file
+            elif line:
+                logger.debug(' Could not parse megals line: "{}"'.format(line))
+
+    def lookup_remote_path(self, username, password, remote_path, remote_root=None):
+        """
+        Look up remote path details from a cached recursive listing. A listing is only done when no cached listing
+        younger than the remote snapshot TTL covers remote path.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): Remote path to look up.
+            remote_root (str): Remote root to list if no cached listing covers remote path. Defaults to remote path.
+
+        Returns:
+            Dictionary: Keys "exists" (bool), "type" (int), "size" (int) and "mtime" (int epoch seconds). Type, size
+                and mtime are None if remote path does not exist.
+        """
+        logger = getLogger('MegaTools_Lib.lookup_remote_path')
+        logger.setLevel(self.__log_level)
+
+        remote_path = remote_path.rstrip('/') or '/'
+        snapshot = self._get_cached_remote_snapshot(username=username, remote_path=remote_path)
+        if not snapshot:
+            logger.debug(' No cached listing covers "{}". Listing remote root.'.format(remote_path))
+            snapshot = self.get_remote_snapshot(username=username, password=password,
+                                                remote_path=remote_root if remote_root else remote_path,
+                                                create_remote_root=False)
+
+        entry = snapshot.get_entry(remote_path=remote_path) if snapshot else None
+        if entry is None:
+            logger.debug(' Remote path does NOT exist: "{}"'.format(remote_path))
+            return {'exists': False, 'type': None, 'size': None, 'mtime': None}
+
+        handle, parent, remote_type, size, mtime, entry_path = entry
+        return {'exists': True, 'type': remote_type, 'size': size, 'mtime': mtime}
+
     def remove_remote_path(self, username, password, remote_file_path, process_priority_class="NORMAL_PRIORITY_CLASS", process_set_priority_timeout=60):
         """
         Remove remote file or directory.
@@ -689,12 +983,13 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.remove_remote_path')
         logger.setLevel(self.__log_level)
 
-        logger.debug(' %s - %s: Removing remote file "%s".' % (username, password, remote_file_path))
+        logger.debug(' %s: Removing remote file "%s".' % (username, remote_file_path))
 
-        cmd = 'megarm -u %s -p %s "%s"' % (username, password, remote_file_path)
+        cmd = 'megarm %s "%s"' % (self._get_login_args(username, password), remote_file_path)
 
         process_name = 'megarm.exe' if system() == 'Windows' else 'megarm'
-        result = self.__lib.exec_cmd(command=cmd, process_name=process_name, process_priority_class=process_priority_class,
+        result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                     process_name=process_name, process_priority_class=process_priority_class,
                                      process_set_priority_timeout=process_set_priority_timeout)
 
         if result:
@@ -704,6 +999,49 @@ class MegaTools_Lib(object):
             logger.debug(' Error, could NOT remove remote file! "{}"'.format(remote_file_path))
             return False
 
+    def remove_remote_paths(self, username, password, remote_file_paths, process_priority_class=None,
+                            process_set_priority_timeout=60):
+        """
+        Remove many remote files or directories, passing a batch of paths to each megarm invocation. If a batch
+        fails, its paths are removed one at a time to find out which ones were removed.
+
+        Args:
+            username (str): username of account to remove from
+            password (str): password of account to remove from
+            remote_file_paths (list): remote file paths to remove.
+            process_priority_class (str): Priority level to set for process. ie: "NORMAL_PRIORITY_CLASS".
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            List: Remote file paths that were removed.
+        """
+        logger = getLogger('MegaTools_Lib.remove_remote_paths')
+        logger.setLevel(self.__log_level)
+
+        logger.debug(' %s: Removing %d remote files.' % (username, len(remote_file_paths)))
+
+        cmd_prefix = 'megarm %s' % self._get_login_args(username, password)
+        process_name = 'megarm.exe' if system() == 'Windows' else 'megarm'
+        removed_paths = []
+        for batch in _iter_path_batches(paths=remote_file_paths, prefix_length=len(cmd_prefix)):
+            cmd = '%s %s' % (cmd_prefix, ' '.join('"%s"' % remote_file_path for remote_file_path in batch))
+            if self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                   process_name=process_name, process_priority_class=process_priority_class,
+                                   process_set_priority_timeout=process_set_priority_timeout):
+                logger.debug(' Success, could remove batch of %d remote files.' % len(batch))
+                removed_paths.extend(batch)
+                continue
+
+            logger.debug(' Error, could NOT remove batch of %d remote files! Removing one at a time.' % len(batch))
+            for remote_file_path in batch:
+                if self.remove_remote_path(username=username, password=password, remote_file_path=remote_file_path,
+                                           process_priority_class=process_priority_class,
+                                           process_set_priority_timeout=process_set_priority_timeout):
+                    removed_paths.append(remote_file_path)
+
+        logger.debug(' Removed %d of %d remote files.' % (len(removed_paths), len(remote_file_paths)))
+        return removed_paths
+
     def upload_local_dir(self, username, password, local_dir, remote_path, process_priority_class=None,
                                           process_set_priority_timeout=60):
         """
@@ -723,20 +1061,18 @@ class MegaTools_Lib(object):
         logger = getLogger('MegaTools_Lib.upload_local_dir')
         logger.setLevel(self.__log_level)
 
-        logger.debug('%s - %s: Uploading files in directory "%s"' % (username, password, local_dir))
+        logger.debug('%s: Uploading files in directory "%s"' % (username, local_dir))
 
         if not self.is_remote_dir(username=username, password=password, remote_dir_path=remote_path):
             self.create_remote_dir(username=username, password=password, remote_path=remote_path,
                                    process_priority_class=process_priority_class,
                                    process_set_priority_timeout=process_set_priority_timeout)
 
-        if self.__up_speed_limit:
-            cmd = 'megacopy -u %s -p %s --limit-speed %d --local "%s" --remote "%s"' % (username, password,
-                                                                                        self.__up_speed_limit, local_dir, remote_path)
-        else:
-            cmd = 'megacopy -u %s -p %s --local "%s" --remote "%s"' % (username, password, local_dir, remote_path)
-
-        out, err = self.__lib.exec_cmd_and_return_output(command=cmd, output_file=self.__mega_tools_log)
+        with self.__up_bandwidth.process_transfer() as speed_limit:
+            cmd = 'megacopy %s%s --local "%s" --remote "%s"' % (self._get_login_args(username, password),
+                                                                self._get_speed_limit_arg(speed_limit), local_dir,
+                                                                remote_path)
+            out, err = self.__lib.exec_cmd_and_return_output(command=cmd, output_file=self.__mega_tools_log)
 
         if out and not err:
             logger.debug(' Success, uploaded local directory: {}'.format(local_dir))
@@ -745,72 +1081,114 @@ class MegaTools_Lib(object):
         logger.warning(' Warning: {}'.format(err))
         return False
 
-    def upload_to_account(self, username, password, local_root, remote_root, process_priority_class=None,
-                                          process_set_priority_timeout=60):
+    def upload_files(self, username, password, local_file_paths, remote_dir_path, process_priority_class=None,
+                     process_set_priority_timeout=60):
         """
-        Upload all files to account.
+        Upload local files into existing remote directory, passing a batch of files to each megaput invocation. A
+        failed batch is not retried here, as the next sync cycle plans its files again.
 
         Args:
-            username (str): username of account to __upload to
-            password (str): password of account to __upload to
-            local_root (str): Local root path of local account files to map with remote root.
-            remote_root (str): Remote root path of remote accounts to map with local root.
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            local_file_paths (list): Local file paths to upload.
+            remote_dir_path (str): Remote directory path to upload into.
             process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
             process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
 
         Returns:
-            boolean: whether successful or not.
+            List: Local file paths that were uploaded.
         """
-
-        logger = getLogger('MegaTools_Lib.upload_to_account')
+        logger = getLogger('MegaTools_Lib.upload_files')
         logger.setLevel(self.__log_level)
 
-        logger.debug(' Starting uploading for %s - %s' % (username, password))
+        logger.debug(' %s: Uploading %d files to "%s"' % (username, len(local_file_paths), remote_dir_path))
+        login_args = self._get_login_args(username, password)
+        # Batches are sized for the longest speed limit argument any share could need.
+        prefix_length = len('megaput %s --no-progress%s --path "%s"' % (
+            login_args, self._get_speed_limit_arg(self.__up_bandwidth.speed_limit), remote_dir_path))
+        process_name = 'megaput.exe' if system() == 'Windows' else 'megaput'
+        uploaded_paths = []
+        for batch in _iter_path_batches(paths=local_file_paths, prefix_length=prefix_length):
+            with self.__up_bandwidth.process_transfer() as speed_limit:
+                cmd = 'megaput %s --no-progress%s --path "%s" %s' % (
+                    login_args, self._get_speed_limit_arg(speed_limit), remote_dir_path,
+                    ' '.join('"%s"' % local_file_path for local_file_path in batch))
+                result = self.__lib.exec_cmd(command=cmd, no_window=True, output_file=self.__mega_tools_log,
+                                             process_name=process_name, process_priority_class=process_priority_class,
+                                             process_set_priority_timeout=process_set_priority_timeout)
+            if result:
+                uploaded_paths.extend(batch)
+            else:
+                logger.debug(' Error, could NOT upload batch of {} files to "{}"!'.format(len(batch), remote_dir_path))
+
+        logger.debug(' Uploaded {} of {} files to "{}".'.format(len(uploaded_paths), len(local_file_paths),
+                                                               remote_dir_path))
+        return uploaded_paths
 
-        self.upload_local_dir(username=username, password=password, local_dir=local_root, remote_path=remote_root,
-                              process_priority_class=process_priority_class,
-                              process_set_priority_timeout=process_set_priority_timeout)
 
-        localRoot_adj = sub('\\\\', '/', local_root)
+class MegaToolsFile(object):
+    __slots__ = ('handle', 'parent', 'type', 'size', 'mtime', 'path')
 
-        cmd = 'megals -ln -u %s -p %s "%s"' % (username, password, remote_root)
-        out, err = self.__lib.exec_cmd_and_return_output(command=cmd, output_file=self.__mega_tools_log)
+    def __init__(self, handle, parent, type, size, mtime, path):
+        """
+        Class for Mega Tools files and extracting data about file given mega tools file output using "megals --long".
+        Slotted, as one record is made for every line of a recursive listing.
+        For more info: https://megatools.megous.com/man/megals.html
 
-        if not err:
-            lines = out.split(linesep)
-            for line in lines:
-                if not line == '':
-                    if len(split(r':\d{2} ', line)) > 1:
-                        remote_filePath = split(r':\d{2} ', line)[1]
-                        dir_subPath = sub(remote_root, '', remote_filePath)
-                        local_dir = localRoot_adj + '/' + dir_subPath
-                        remote_dir = remote_root + '/' + dir_subPath
-                        if path.exists(local_dir):
-                            self.upload_local_dir(username, password, local_dir, remote_dir)
-
-            logger.debug('Success, could upload files to account.')
-            return True
+        Args:
+            handle (str): Handle of file. ie: "2FFSiaKZ"
+            parent (str): Handle of parent directory. Blank for MEGA account system files.
+            type (int): File type. 0 = file, 1 = directory, 2 = MEGA account system file ie: "/Root".
+            size (int): File size in bytes. -1 for directories.
+            mtime (int): File modified time as epoch time in seconds.
+            path (str): Remote file path. ie: "/Root/directory/file.txt"
+        """
+        self.handle = handle
+        self.parent = parent
+        self.type = type
+        self.size = size
+        self.mtime = mtime
+        self.path = path
 
-        logger.warning(str(err))
-        logger.debug(' Error, could NOT upload files to account!')
-        return False
+    def __iter__(self):
+        return iter((self.handle, self.parent, self.type, self.size, self.mtime, self.path))
 
+    def __repr__(self):
+        return 'MegaToolsFile(%r, %r, %r, %r, %r, %r)' % tuple(self)
 
-class MegaToolsFile(object):
-    def __init__(self, file_details, log_level='DEBUG', log_file_path=MEGATOOLS_LOG_PATH):
+    @classmethod
+    def from_megals_line(cls, line):
         """
-        Class for Mega Tools files and extracting data about file given mega tools file output using "megals --long".
-        For more info: https://megatools.megous.com/man/megals.html
+        Create file record from megals line data output, parsing line in a single pass.
 
         Args:
-            file_details(str): File details line as shown using "megals --long".
+            line (str): File details line as shown using "megals --long".
                 ie: 2FFSiaKZ    Xz2tWWB5Dmo 0          2686 2013-04-15 08:33:47 /Root/directory/file.txt
-            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
-            log_file_path (str): MEGATools log file path.
 
+        Returns:
+            MegaToolsFile: File record or None if line could not be parsed.
         """
-        self.__log_level = log_level
-        self.__mega_tools_file_log = log_file_path
+        entry = parse_megals_long_line(line)
+        if entry is None:
+            return None
+        return cls(*entry)
 
+    @property
+    def date(self):
+        """
+        Getter for file modified date as shown by megals.
 
+        Returns:
+            String: File date as string. ie: "2013-04-10 19:16:02"
+        """
+        return strftime('%Y-%m-%d %H:%M:%S', localtime(self.mtime))
 
+    @property
+    def extension(self):
+        """
+        Getter for file extension.
+
+        Returns:
+            String: File extension. ie: ".jpg"
+        """
+        return path.splitext(self.path)[1]
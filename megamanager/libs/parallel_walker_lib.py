@@ -0,0 +1,127 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Parallel walker class. Lists directory trees with several threads, for slow and network mounted file systems.
+###
+
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from os import scandir
+from queue import Queue
+
+__author__ = 'szmania'
+
+# Directories listed concurrently. Listing a directory mostly waits on the file system, so threads overlap well.
+WALKER_WORKERS = 8
+
+
+class ParallelWalker(object):
+    def __init__(self, workers=WALKER_WORKERS, log_level='DEBUG'):
+        """
+        Walks directory trees with a pool of threads, each listing one directory at a time. Results are yielded as
+        directories are listed, in no particular order. On network mounts and spinning disks time per directory is
+        mostly latency, which the threads overlap.
+
+        Args:
+            workers (int): Number of directories listed concurrently. 1 walks in the calling thread.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__workers = max(1, workers)
+        self.__log_level = log_level
+
+    def _list_dir(self, dir_path):
+        """
+        List directory, splitting entries into files and subdirectories. Symlinked directories are not followed.
+
+        Args:
+            dir_path (str): Directory path.
+
+        Returns:
+            Tuple: Tuple of directory path and list of os.DirEntry files, and list of subdirectory paths.
+        """
+        logger = getLogger('ParallelWalker._list_dir')
+        logger.setLevel(self.__log_level)
+
+        files = []
+        subdir_paths = []
+        try:
+            with scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdir_paths.append(entry.path)
+                        elif entry.is_file():
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(' Could not list local directory "{}". Exception: {}'.format(dir_path, e))
+            return None, []
+        return (dir_path, files), subdir_paths
+
+    def iter_files(self, root_path):
+        """
+        Yield every file below root.
+
+        Args:
+            root_path (str): Root directory path.
+
+        Returns:
+            Generator: os.DirEntry of each file.
+        """
+        for dir_path, files in self.walk(root_paths=[root_path]):
+            for entry in files:
+                yield entry
+
+    def walk(self, root_paths, visit=None):
+        """
+        Walk directory trees, visiting every directory once. Visitor runs in worker threads and decides which
+        subdirectories to descend into, so expensive work per directory (ie: stat calls) is done concurrently too.
+
+        Args:
+            root_paths (list): Root directory paths.
+            visit (function): Called with a directory path. Returns a result to yield, or None for nothing, and a list
+                of subdirectory paths to visit. Defaults to listing directory, yielding tuple of directory path and
+                list of os.DirEntry files.
+
+        Returns:
+            Generator: Results of visitor, as directories are visited.
+        """
+        visit = visit if visit else self._list_dir
+        if self.__workers == 1:
+            pending = list(root_paths)
+            while pending:
+                result, subdir_paths = visit(pending.pop())
+                pending.extend(subdir_paths)
+                if result is not None:
+                    yield result
+            return
+
+        results = Queue()
+
+        def visit_dir(dir_path):
+            try:
+                results.put(visit(dir_path))
+            except Exception as e:
+                results.put(e)
+
+        executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='walker')
+        try:
+            outstanding = 0
+            for root_path in root_paths:
+                executor.submit(visit_dir, root_path)
+                outstanding += 1
+            while outstanding:
+                visited = results.get()
+                outstanding -= 1
+                if isinstance(visited, Exception):
+                    raise visited
+                result, subdir_paths = visited
+                for subdir_path in subdir_paths:
+                    executor.submit(visit_dir, subdir_path)
+                    outstanding += 1
+                if result is not None:
+                    yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
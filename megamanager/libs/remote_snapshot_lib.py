@@ -0,0 +1,494 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Remote snapshot class. Used to share one parsed remote listing between all remote consumers.
+###
+
+from array import array as typed_array
+from functools import lru_cache
+from json import dumps, loads
+from logging import getLogger
+from numpy import argsort, array, frombuffer, int8, int64, memmap, uint8
+from os import makedirs, path, replace
+from re import compile as compile_regex
+from struct import pack
+from time import mktime, time
+
+__author__ = 'szmania'
+
+# ie: "udtDgR7I    Xz2tWWB5Dmo 0    4405067776 2013-04-10 19:16:02 /Root/bigfile"
+# Parent handle is blank for MEGA account system files ie: "/Root".
+MEGALS_LONG_LINE_REGEX = compile_regex(r'^(\S+)\s+(\S*)\s+([0-2])\s+(\d+|-)\s+(\d{4}-\d{2}-\d{2} \d{2}):(\d{2}):(\d{2}) (.+)$')
+MEGALS_TYPES = {'0': 0, '1': 1, '2': 2}
+MEGALS_MINUTE_SECONDS = {'%02d:%02d' % (minute, second): minute * 60 + second
+                         for minute in range(60) for second in range(61)}
+MANIFEST_MAGIC = b'MEGAMAN1'
+MANIFEST_ALIGNMENT = 8
+MANIFEST_TTL_SECONDS = 3600  # Persisted manifests older than this are not used after a restart.
+
+REMOTE_TYPE_FILE = 0
+REMOTE_TYPE_DIR = 1
+REMOTE_TYPE_SYSTEM = 2
+REMOTE_TYPE_REMOVED = -1  # Rows discarded from snapshot once deleted remotely. Skipped by all readers.
+
+
+@lru_cache(maxsize=65536)
+def _get_hour_epoch(date_hour):
+    """
+    Get epoch time of the start of given local hour. Cached, as listings share few distinct hours.
+
+    Args:
+        date_hour (str): Date and hour. ie: "2013-04-10 19"
+
+    Returns:
+        int: Epoch time in seconds.
+    """
+    return int(mktime((int(date_hour[:4]), int(date_hour[5:7]), int(date_hour[8:10]), int(date_hour[11:13]),
+                       0, 0, 0, 0, -1)))
+
+
+def parse_megals_long_line(line):
+    """
+    Parse line of "megals --long" output into typed fields, in a single pass. Lines are split on whitespace, and
+    only fall back to a regular expression for lines with a blank parent handle.
+
+    Args:
+        line (str): Line of megals output.
+            ie: udtDgR7I    Xz2tWWB5Dmo 0    4405067776 2013-04-10 19:16:02 /Root/bigfile
+
+    Returns:
+        Tuple: (handle, parent, type, size, mtime, path) or None if line could not be parsed. Size is -1 for
+            directories and mtime is local epoch time in seconds.
+    """
+    fields = line.split(None, 6)
+    if len(fields) == 7 and fields[2] in MEGALS_TYPES and len(fields[4]) == 10 and len(fields[5]) == 8:
+        handle, parent, remote_type, size, date, clock, remote_path = fields
+        remote_path = remote_path.rstrip('\r\n')
+        date_hour = date + ' ' + clock[:2]
+        minute_second = clock[3:]
+    else:
+        found = MEGALS_LONG_LINE_REGEX.match(line.rstrip('\r\n'))
+        if not found:
+            return None
+        handle, parent, remote_type, size, date_hour, minute, second, remote_path = found.groups()
+        minute_second = minute + ':' + second
+
+    seconds = MEGALS_MINUTE_SECONDS.get(minute_second)
+    if seconds is None or not (size == '-' or size.isdigit()):
+        return None
+    try:
+        mtime = _get_hour_epoch(date_hour) + seconds
+    except (ValueError, OverflowError):
+        return None
+    return handle, parent, MEGALS_TYPES[remote_type], int(size) if size != '-' else -1, mtime, remote_path
+
+
+def _align(offset):
+    """
+    Round offset up to manifest column alignment.
+
+    Args:
+        offset (int): Offset in bytes.
+
+    Returns:
+        int: Aligned offset in bytes.
+    """
+    return (offset + MANIFEST_ALIGNMENT - 1) // MANIFEST_ALIGNMENT * MANIFEST_ALIGNMENT
+
+
+class RemoteSnapshot(object):
+    def __init__(self, remote_root, handles, parents, types, sizes, mtimes, paths, log_level='DEBUG', verified=True,
+                 created=None):
+        """
+        Snapshot of remote tree of a path mapping, stored as typed columns. Built from a single recursive listing and
+        shared by all remote consumers of a sync cycle.
+
+        Args:
+            remote_root (str): Remote root path snapshot was listed from.
+            handles (list[str]): Node handles.
+            parents (list[str]): Parent node handles.
+            types (numpy.ndarray): Node types. 0 = file, 1 = directory, 2 = MEGA account system file.
+            sizes (numpy.ndarray): Node sizes in bytes. -1 for directories.
+            mtimes (numpy.ndarray): Node modified times as epoch seconds.
+            paths (list[str]): Node remote paths.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+            verified (bool): Whether snapshot comes from a live listing, rather than from a persisted manifest.
+            created (float): Epoch time snapshot data was listed at. Defaults to now.
+        """
+        self.__remote_root = remote_root
+        self.__handles = handles
+        self.__parents = parents
+        self.__types = types
+        self.__sizes = sizes
+        self.__mtimes = mtimes
+        self.__paths = paths
+        self.__log_level = log_level
+        self.__verified = verified
+        self.__created = created if created is not None else time()
+        self.__path_index = None
+
+    def __len__(self):
+        return len(self.__paths)
+
+    @classmethod
+    def from_manifest(cls, manifest_path, log_level='DEBUG'):
+        """
+        Load snapshot from persisted manifest file. Manifest is memory-mapped and its columns copied out, so no text
+        parsing is needed.
+
+        Args:
+            manifest_path (str): Manifest file path.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+
+        Returns:
+            RemoteSnapshot: Unverified snapshot of remote tree, or None if manifest does not exist or is invalid.
+        """
+        logger = getLogger('RemoteSnapshot.from_manifest')
+        logger.setLevel(log_level)
+
+        if not path.isfile(manifest_path):
+            logger.debug(' Manifest does NOT exist: "{}"'.format(manifest_path))
+            return None
+
+        try:
+            data = memmap(manifest_path, dtype=uint8, mode='r')
+            if bytes(data[:len(MANIFEST_MAGIC)]) != MANIFEST_MAGIC:
+                logger.warning(' Invalid manifest file: "{}"'.format(manifest_path))
+                return None
+            header_start = len(MANIFEST_MAGIC) + 4
+            header_len = int(data[len(MANIFEST_MAGIC):header_start].view('<u4')[0])
+            header = loads(bytes(data[header_start:header_start + header_len]).decode('utf-8'))
+            count = header['count']
+            offset = _align(header_start + header_len)
+
+            columns = []
+            for dtype, itemsize in (('S%d' % header['handle_width'], header['handle_width']),
+                                    ('S%d' % header['parent_width'], header['parent_width']),
+                                    ('<i1', 1), ('<i8', 8), ('<i8', 8)):
+                columns.append(array(data[offset:offset + count * itemsize].view(dtype)))
+                offset = _align(offset + count * itemsize)
+            paths_blob = bytes(data[offset:offset + header['paths_size']])
+            del data
+
+            handles, parents, types, sizes, mtimes = columns
+            paths = paths_blob.decode('utf-8').split('\n') if count else []
+            snapshot = cls(remote_root=header['remote_root'], handles=[handle.decode() for handle in handles.tolist()],
+                           parents=[parent.decode() for parent in parents.tolist()], types=types.astype(int8),
+                           sizes=sizes.astype(int64), mtimes=mtimes.astype(int64), paths=paths, log_level=log_level,
+                           verified=False, created=header['created'])
+            logger.debug(' Success, loaded manifest with {} entries: "{}"'.format(count, manifest_path))
+            return snapshot
+
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return None
+
+    @classmethod
+    def from_megals_entries(cls, entries, remote_root, log_level='DEBUG'):
+        """
+        Build snapshot from parsed megals entries. Entries are consumed one at a time into compact typed buffers, so a
+        streamed listing is never held in memory as text.
+
+        Args:
+            entries (iterable[tuple]): Parsed entries of (handle, parent, type, size, mtime, path).
+            remote_root (str): Remote root path listed.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree.
+        """
+        logger = getLogger('RemoteSnapshot.from_megals_entries')
+        logger.setLevel(log_level)
+
+        handles = []
+        parents = []
+        types = typed_array('b')
+        sizes = typed_array('q')
+        mtimes = typed_array('q')
+        paths = []
+        for handle, parent, remote_type, size, mtime, remote_path in entries:
+            handles.append(handle)
+            parents.append(parent)
+            types.append(remote_type)
+            sizes.append(size)
+            mtimes.append(mtime)
+            paths.append(remote_path)
+
+        logger.debug(' Parsed {} remote entries for "{}".'.format(len(paths), remote_root))
+        return cls(remote_root=remote_root, handles=handles, parents=parents,
+                   types=frombuffer(types, dtype=int8).copy(), sizes=frombuffer(sizes, dtype=int64).copy(),
+                   mtimes=frombuffer(mtimes, dtype=int64).copy(), paths=paths, log_level=log_level)
+
+    @classmethod
+    def from_megals_lines(cls, lines, remote_root, log_level='DEBUG'):
+        """
+        Build snapshot from "megals -lR" output lines.
+
+        Args:
+            lines (iterable[str]): Lines of megals output.
+            remote_root (str): Remote root path listed.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree.
+        """
+        entries = (entry for entry in map(parse_megals_long_line, lines) if entry is not None)
+        return cls.from_megals_entries(entries=entries, remote_root=remote_root, log_level=log_level)
+
+    @property
+    def age(self):
+        """
+        Getter for seconds since snapshot was created.
+
+        Returns:
+            Float: Snapshot age in seconds.
+        """
+        return time() - self.__created
+
+    @property
+    def verified(self):
+        """
+        Getter for whether snapshot comes from a live listing. Snapshots loaded from a manifest are not verified
+        until refreshed, and should not be used to delete local data.
+
+        Returns:
+            Boolean: Whether snapshot is verified or not.
+        """
+        return self.__verified
+
+    @property
+    def remote_root(self):
+        """
+        Getter for remote root path of snapshot.
+
+        Returns:
+            String: Remote root path.
+        """
+        return self.__remote_root
+
+    def _get_path_index(self):
+        """
+        Get mapping of remote path to row. Built on first use.
+
+        Returns:
+            Dictionary: Remote path to row index.
+        """
+        if self.__path_index is None:
+            types = self.__types
+            self.__path_index = {remote_path: idx for idx, remote_path in enumerate(self.__paths)
+                                 if types[idx] != REMOTE_TYPE_REMOVED}
+        return self.__path_index
+
+    def _get_handle_entries(self):
+        """
+        Get snapshot rows keyed by node handle.
+
+        Returns:
+            Dictionary: Node handle to (parent, type, size, mtime, path).
+        """
+        return {handle: (parent, remote_type, size, mtime, remote_path)
+                for handle, parent, remote_type, size, mtime, remote_path in self.iter_entries()}
+
+    def diff(self, other):
+        """
+        Compare snapshot to a newer snapshot of the same remote root, by node handle.
+
+        Args:
+            other (RemoteSnapshot): Newer snapshot.
+
+        Returns:
+            Tuple: Lists of added, removed and changed node handles.
+        """
+        old_entries = self._get_handle_entries()
+        new_entries = other._get_handle_entries()
+        added = [handle for handle in new_entries if handle not in old_entries]
+        removed = [handle for handle in old_entries if handle not in new_entries]
+        changed = [handle for handle, entry in new_entries.items()
+                   if handle in old_entries and old_entries[handle] != entry]
+        return added, removed, changed
+
+    def discard_paths(self, remote_paths):
+        """
+        Discard remote paths from snapshot, ie: once deleted remotely, so later consumers of the sync cycle do not act on
+        them. Rows are marked removed rather than dropped, so concurrent readers keep consistent columns.
+
+        Args:
+            remote_paths (iterable[str]): Remote paths.
+
+        Returns:
+            Integer: Number of remote paths discarded.
+        """
+        path_index = self._get_path_index()
+        discarded_count = 0
+        for remote_path in remote_paths:
+            idx = path_index.pop(remote_path, None)
+            if idx is not None:
+                self.__types[idx] = REMOTE_TYPE_REMOVED
+                discarded_count += 1
+        return discarded_count
+
+    def exists(self, remote_path):
+        """
+        Determines if remote path exists in snapshot.
+
+        Args:
+            remote_path (str): Remote path.
+
+        Returns:
+            Bool: Whether remote path exists or not.
+        """
+        return remote_path in self._get_path_index()
+
+    def contains(self, remote_path):
+        """
+        Determines if remote path is the remote root of snapshot or lies under it.
+
+        Args:
+            remote_path (str): Remote path.
+
+        Returns:
+            Bool: Whether remote path is covered by snapshot or not.
+        """
+        remote_root = self.__remote_root.rstrip('/')
+        return remote_path == remote_root or remote_path.startswith(remote_root + '/')
+
+    def get_entry(self, remote_path):
+        """
+        Get snapshot row of remote path.
+
+        Args:
+            remote_path (str): Remote path.
+
+        Returns:
+            Tuple: (handle, parent, type, size, mtime, path) or None if remote path is not in snapshot.
+        """
+        idx = self._get_path_index().get(remote_path)
+        if idx is None:
+            return None
+        return (self.__handles[idx], self.__parents[idx], int(self.__types[idx]), int(self.__sizes[idx]),
+                int(self.__mtimes[idx]), self.__paths[idx])
+
+    def get_children(self, remote_dir_path):
+        """
+        Get remote paths immediately under given remote directory.
+
+        Args:
+            remote_dir_path (str): Remote directory path.
+
+        Returns:
+            List: Remote paths of children.
+        """
+        prefix = remote_dir_path.rstrip('/') + '/'
+        types = self.__types
+        return [remote_path for idx, remote_path in enumerate(self.__paths)
+                if remote_path.startswith(prefix) and '/' not in remote_path[len(prefix):] and
+                types[idx] != REMOTE_TYPE_REMOVED]
+
+    def get_dir_size(self, remote_dir_path):
+        """
+        Get total size of files under given remote directory.
+
+        Args:
+            remote_dir_path (str): Remote directory path.
+
+        Returns:
+            int: Total size in bytes.
+        """
+        prefix = remote_dir_path.rstrip('/') + '/'
+        sizes = self.__sizes
+        types = self.__types
+        return int(sum(int(sizes[idx]) for idx, remote_path in enumerate(self.__paths)
+                       if types[idx] == REMOTE_TYPE_FILE and remote_path.startswith(prefix)))
+
+    def get_paths(self):
+        """
+        Get all remote paths in snapshot.
+
+        Returns:
+            List: Remote paths.
+        """
+        types = self.__types
+        return [remote_path for idx, remote_path in enumerate(self.__paths) if types[idx] != REMOTE_TYPE_REMOVED]
+
+    def get_total_size(self):
+        """
+        Get total size of all files in snapshot.
+
+        Returns:
+            int: Total size in bytes.
+        """
+        return int(self.__sizes[self.__types == REMOTE_TYPE_FILE].sum())
+
+    def iter_entries(self):
+        """
+        Iterate over all snapshot rows, except discarded ones.
+
+        Returns:
+            Generator: Tuples of (handle, parent, type, size, mtime, path).
+        """
+        types = self.__types.tolist()
+        sizes = self.__sizes.tolist()
+        mtimes = self.__mtimes.tolist()
+        for idx, remote_path in enumerate(self.__paths):
+            if types[idx] == REMOTE_TYPE_REMOVED:
+                continue
+            yield self.__handles[idx], self.__parents[idx], types[idx], sizes[idx], mtimes[idx], remote_path
+
+    def iter_files(self):
+        """
+        Iterate over file rows of snapshot.
+
+        Returns:
+            Generator: Tuples of (path, size, mtime) for files only.
+        """
+        for handle, parent, remote_type, size, mtime, remote_path in self.iter_entries():
+            if remote_type == REMOTE_TYPE_FILE:
+                yield remote_path, size, mtime
+
+    def to_manifest(self, manifest_path):
+        """
+        Persist snapshot to manifest file, with rows sorted by node handle. Discarded rows are left out. File is
+        written to a temporary path and then moved over the previous manifest.
+
+        Args:
+            manifest_path (str): Manifest file path.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('RemoteSnapshot.to_manifest')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Writing manifest with {} entries: "{}"'.format(len(self), manifest_path))
+
+        try:
+            order = argsort(array(self.__handles, dtype=object), kind='stable') if len(self) else []
+            order = [idx for idx in order if self.__types[idx] != REMOTE_TYPE_REMOVED]
+            count = len(order)
+            handles = array([self.__handles[idx].encode() for idx in order] or [b''])
+            parents = array([self.__parents[idx].encode() for idx in order] or [b''])
+            paths_blob = '\n'.join(self.__paths[idx] for idx in order).encode('utf-8')
+            header = dumps({'remote_root': self.__remote_root, 'count': count,
+                            'handle_width': max(handles.dtype.itemsize, 1),
+                            'parent_width': max(parents.dtype.itemsize, 1),
+                            'paths_size': len(paths_blob), 'created': self.__created}).encode('utf-8')
+
+            manifest_dir = path.dirname(manifest_path)
+            if manifest_dir and not path.exists(manifest_dir):
+                makedirs(manifest_dir)
+            temp_manifest_path = manifest_path + '.tmp'
+            with open(temp_manifest_path, 'wb') as manifest_file:
+                offset = manifest_file.write(MANIFEST_MAGIC + pack('<I', len(header)) + header)
+                for column in (handles[:count], parents[:count], self.__types[order].astype('<i1'),
+                               self.__sizes[order].astype('<i8'), self.__mtimes[order].astype('<i8')):
+                    offset += manifest_file.write(b'\0' * (_align(offset) - offset))
+                    offset += manifest_file.write(column.tobytes())
+                manifest_file.write(b'\0' * (_align(offset) - offset))
+                manifest_file.write(paths_blob)
+            replace(temp_manifest_path, manifest_path)
+            logger.debug(' Success, wrote manifest: "{}"'.format(manifest_path))
+            return True
+
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
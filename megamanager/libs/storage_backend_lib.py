@@ -0,0 +1,570 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Storage backend class. Interface every remote storage backend of MEGA Manager implements.
+###
+
+from .remote_snapshot_lib import REMOTE_TYPE_FILE
+from .transfer_queue_lib import TRANSFER_UPLOAD
+from .upload_planner_lib import MEGA_TEMP_FILE_MARKER, UploadPlanner
+from logging import getLogger
+from os import path, stat
+from posixpath import dirname
+from time import localtime, strftime, time
+
+__author__ = 'szmania'
+
+
+class StorageBackend(object):
+    def __init__(self, log_level='DEBUG'):
+        """
+        Interface of remote storage backends. MegaManager only talks to remote storage through these methods, so
+        backends are interchangeable per profile.
+
+        Args:
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__log_level = log_level
+
+    def close(self):
+        """
+        Release resources held by backend ie: sessions, connections or credential files. Called at teardown.
+        """
+        pass
+
+    def create_remote_dir(self, username, password, remote_path, process_priority_class=None,
+                          process_set_priority_timeout=60):
+        """
+        Create remote directory.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): Remote path of directory to create.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        raise NotImplementedError
+
+    def create_remote_dirs(self, username, password, remote_paths, process_priority_class=None,
+                           process_set_priority_timeout=60):
+        """
+        Create many remote directories, in given order. Backends that can create several directories per request
+        override this.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_paths (list): Remote paths of directories to create, parents before children.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            List: Remote paths of directories that were created.
+        """
+        created_paths = []
+        for remote_path in remote_paths:
+            if self.create_remote_dir(username=username, password=password, remote_path=remote_path,
+                                      process_priority_class=process_priority_class,
+                                      process_set_priority_timeout=process_set_priority_timeout):
+                created_paths.append(remote_path)
+        return created_paths
+
+    def download_all_files_from_account(self, username, password, local_root, remote_root,
+                                        process_set_priority_timeout=60):
+        """
+        Download all remote files of remote root that do not exist locally.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            local_root (str): Local path to download files to.
+            remote_root (str): Remote path to download files from.
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        raise NotImplementedError
+
+    def download_file(self, username, password, localFilePath, remoteFilePath):
+        """
+        Download remote file to local file path.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            localFilePath (str): Local file path to download to.
+            remoteFilePath (str): Remote file path to download.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        raise NotImplementedError
+
+    def get_account_free_space(self, username, password):
+        """
+        Get account free space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Free space of account in gigabytes.
+        """
+        raise NotImplementedError
+
+    def get_account_total_space(self, username, password):
+        """
+        Get account total space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Total space of account in gigabytes.
+        """
+        raise NotImplementedError
+
+    def get_account_used_space(self, username, password):
+        """
+        Get account used space in gigabytes
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+
+        Returns:
+             String: Used space of account in gigabytes.
+        """
+        raise NotImplementedError
+
+    def get_remote_file_modified_date(self, username, password, remotePath, remote_root=None):
+        """
+        Get remote file modified date.
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+            remotePath (str): Remote file path of remote file modified date to get
+            remote_root (str): Remote root to list if no cached listing covers remote path.
+
+        Returns:
+             String: Remote file modified date. ie: "2013-04-10 19:16:02"
+        """
+        logger = getLogger('StorageBackend.get_remote_file_modified_date')
+        logger.setLevel(self.__log_level)
+
+        remote_details = self.lookup_remote_path(username=username, password=password, remote_path=remotePath,
+                                                 remote_root=remote_root)
+        if remote_details['exists']:
+            logger.debug(' Success, could find remote file modified date.')
+            return strftime('%Y-%m-%d %H:%M:%S', localtime(remote_details['mtime']))
+
+        logger.warning(' Error, could NOT find remote file modified date!')
+        return None
+
+    def get_remote_file_size(self, username, password, remotePath='/', remote_root=None):
+        """
+        Get remote file size in bytes of given remote path.
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+            remotePath (str): remote path of file to get size for
+            remote_root (str): Remote root to list if no cached listing covers remote path.
+
+        Returns:
+             int: remote file size. 0 for directories.
+        """
+        logger = getLogger('StorageBackend.get_remote_file_size')
+        logger.setLevel(self.__log_level)
+
+        remote_details = self.lookup_remote_path(username=username, password=password, remote_path=remotePath,
+                                                 remote_root=remote_root)
+        if remote_details['exists']:
+            remoteFileSize = max(remote_details['size'], 0)
+            logger.debug(' Success, remote file size for path "%s" is "%s"' % (remotePath, remoteFileSize))
+            return remoteFileSize
+
+        logger.error(' Error, could not get remote file size of path "%s"' % remotePath)
+        return None
+
+    def get_remote_snapshot(self, username, password, remote_path, process_priority_class=None,
+                            process_set_priority_timeout=60, max_age=None, create_remote_root=True):
+        """
+        Get snapshot of remote tree of remote path.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote snapshot of.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+            max_age (int): If given, a cached snapshot of remote path up to this many seconds old may be returned.
+            create_remote_root (bool): Whether to create remote path if it could not be listed.
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote tree, or None if remote path could not be listed.
+        """
+        raise NotImplementedError
+
+    def iter_remote_file_data_recursively(self, username, password, remote_path='/', err_lines=None):
+        """
+        Iterate all remote file data of remote path.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): root path to get remote files from.
+            err_lines (list): If given, errors are appended to it.
+
+        Returns:
+            Generator: Records unpacking to (handle, parent, type, size, mtime, path). See parse_megals_long_line.
+        """
+        raise NotImplementedError
+
+    def lookup_remote_path(self, username, password, remote_path, remote_root=None):
+        """
+        Look up remote path details.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_path (str): Remote path to look up.
+            remote_root (str): Remote root to list if remote path has to be listed. Defaults to remote path.
+
+        Returns:
+            Dictionary: Keys "exists" (bool), "type" (int), "size" (int) and "mtime" (int epoch seconds). Type, size
+                and mtime are None if remote path does not exist.
+        """
+        raise NotImplementedError
+
+    def remove_remote_path(self, username, password, remote_file_path, process_priority_class=None,
+                           process_set_priority_timeout=60):
+        """
+        Remove remote file or directory.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_file_path (str): remote file path to remove.
+            process_priority_class (str): Priority level to set for process. ie: "NORMAL_PRIORITY_CLASS".
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            boolean: whether successful or not.
+        """
+        raise NotImplementedError
+
+    def remove_remote_paths(self, username, password, remote_file_paths, process_priority_class=None,
+                            process_set_priority_timeout=60):
+        """
+        Remove many remote files or directories. Backends that can remove several paths per request override this.
+
+        Args:
+            username (str): username of MEGA account.
+            password (str): password of MEGA account.
+            remote_file_paths (list): remote file paths to remove.
+            process_priority_class (str): Priority level to set for process. ie: "NORMAL_PRIORITY_CLASS".
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            List: Remote file paths that were removed.
+        """
+        removed_paths = []
+        for remote_file_path in remote_file_paths:
+            if self.remove_remote_path(username=username, password=password, remote_file_path=remote_file_path,
+                                       process_priority_class=process_priority_class,
+                                       process_set_priority_timeout=process_set_priority_timeout):
+                removed_paths.append(remote_file_path)
+        return removed_paths
+
+    def _upload_queued_files(self, username, password, remote_root, remote_snapshot, transfer_queue,
+                             process_priority_class=None, process_set_priority_timeout=60):
+        """
+        Upload queued files of remote root in priority order, one batch of claimed transfers at a time. Queued files
+        that no longer exist locally, or that are already in remote snapshot with the same size, are marked done
+        without uploading.
+
+        Args:
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            remote_root (str): Remote root path whose queued uploads to upload.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root.
+            transfer_queue (TransferQueue): Queue uploads are claimed from.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            Tuple: Number of files uploaded and number of files that failed.
+        """
+        logger = getLogger('StorageBackend._upload_queued_files')
+        logger.setLevel(self.__log_level)
+
+        uploaded_count = 0
+        failed_count = 0
+        while True:
+            items = transfer_queue.claim(direction=TRANSFER_UPLOAD, username=username, remote_root=remote_root)
+            if not items:
+                break
+            done_items = []
+            uploads = {}
+            for item in items:
+                try:
+                    local_size = stat(item.local_path).st_size
+                except OSError:
+                    logger.debug(' Queued local file no longer exists. Skipping "{}".'.format(item.local_path))
+                    done_items.append(item)
+                    continue
+                remote_entry = remote_snapshot.get_entry(remote_path=item.remote_path)
+                if remote_entry is not None and remote_entry[3] == local_size:
+                    done_items.append(item)
+                    continue
+                uploads.setdefault(dirname(item.remote_path), []).append(item)
+
+            failed_items = []
+            for remote_dir_path, dir_items in uploads.items():
+                uploaded_paths = set(self.upload_files(username=username, password=password,
+                                                       local_file_paths=[item.local_path for item in dir_items],
+                                                       remote_dir_path=remote_dir_path,
+                                                       process_priority_class=process_priority_class,
+                                                       process_set_priority_timeout=process_set_priority_timeout))
+                for item in dir_items:
+                    if item.local_path in uploaded_paths:
+                        done_items.append(item)
+                        uploaded_count += 1
+                    else:
+                        failed_items.append(item)
+            transfer_queue.complete(items=done_items)
+            transfer_queue.fail(items=failed_items)
+            failed_count += len(failed_items)
+        return uploaded_count, failed_count
+
+    def upload_changed_files(self, username, password, local_root, remote_root, local_file_paths, remote_snapshot,
+                             transfer_queue=None, priority_weight=1.0, local_index=None, process_priority_class=None,
+                             process_set_priority_timeout=60):
+        """
+        Upload given local files of local root that are missing or outdated remotely, ie: files a file watcher reported
+        changed. Unlike upload_to_account, local root is not walked. Files uploaded since remote snapshot was taken
+        are looked up in transfer queue, so they are replaced rather than uploaded again as new.
+
+        Args:
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            local_root (str): Local root path of local account files to map with remote root.
+            remote_root (str): Remote root path of remote accounts to map with local root.
+            local_file_paths (list): Local file paths below local root to upload.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root.
+            transfer_queue (TransferQueue): Durable queue to upload through. Files are uploaded directly if None.
+            priority_weight (float): Priority weight of profile in transfer queue. Higher is served first.
+            local_index (LocalIndex): Index to stat local files from. Stated on disk if None.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            boolean: whether successful or not.
+        """
+        logger = getLogger('StorageBackend.upload_changed_files')
+        logger.setLevel(self.__log_level)
+
+        stat_local_file = local_index.stat if local_index else stat
+        local_root = path.normpath(local_root)
+        remote_root = remote_root.rstrip('/')
+        snapshot_time = time() - remote_snapshot.age
+        items = []
+        outdated_remote_paths = []
+        new_items = []
+        remote_dirs = set()
+        for local_file_path in local_file_paths:
+            local_sub_path = path.relpath(local_file_path, local_root)
+            if local_sub_path.startswith(path.pardir) or MEGA_TEMP_FILE_MARKER in path.basename(local_file_path):
+                continue
+            try:
+                local_stat = stat_local_file(local_file_path)
+            except OSError:
+                continue
+            remote_file_path = remote_root + '/' + local_sub_path.replace(path.sep, '/')
+            item = (local_file_path, remote_file_path, local_stat.st_size, local_stat.st_mtime, False)
+            remote_entry = remote_snapshot.get_entry(remote_path=remote_file_path)
+            if remote_entry is None:
+                new_items.append(item)
+                continue
+            if remote_entry[2] != REMOTE_TYPE_FILE or remote_entry[3] == local_stat.st_size \
+                    or int(local_stat.st_mtime) <= remote_entry[4]:
+                continue
+            outdated_remote_paths.append(remote_file_path)
+            items.append(item)
+
+        if new_items and transfer_queue:
+            uploaded_since_snapshot = transfer_queue.get_completed_since(
+                direction=TRANSFER_UPLOAD, username=username, paths=[item[:2] for item in new_items],
+                since=snapshot_time)
+            for item in new_items:
+                if item[:2] in uploaded_since_snapshot:
+                    outdated_remote_paths.append(item[1])
+        items.extend(new_items)
+        for item in new_items:
+            remote_dir_path = dirname(item[1])
+            while remote_dir_path.startswith(remote_root + '/') and remote_snapshot.get_entry(
+                    remote_path=remote_dir_path) is None and remote_dir_path not in remote_dirs:
+                remote_dirs.add(remote_dir_path)
+                remote_dir_path = dirname(remote_dir_path)
+        if not items:
+            return True
+
+        logger.debug(' Uploading {} changed files, {} outdated remotely.'.format(len(items),
+                                                                                 len(outdated_remote_paths)))
+        if remote_dirs:
+            # Directories made since remote snapshot was taken already exist, so failures here are expected.
+            self.create_remote_dirs(username=username, password=password,
+                                    remote_paths=sorted(remote_dirs, key=lambda dir_path: dir_path.count('/')),
+                                    process_priority_class=process_priority_class,
+                                    process_set_priority_timeout=process_set_priority_timeout)
+        if outdated_remote_paths:
+            removed_paths = self.remove_remote_paths(username=username, password=password,
+                                                     remote_file_paths=outdated_remote_paths,
+                                                     process_priority_class=process_priority_class,
+                                                     process_set_priority_timeout=process_set_priority_timeout)
+            remote_snapshot.discard_paths(removed_paths)
+
+        if transfer_queue:
+            transfer_queue.enqueue(direction=TRANSFER_UPLOAD, username=username, remote_root=remote_root,
+                                   items=items, weight=priority_weight)
+            uploaded_count, failed_count = self._upload_queued_files(
+                username=username, password=password, remote_root=remote_root, remote_snapshot=remote_snapshot,
+                transfer_queue=transfer_queue, process_priority_class=process_priority_class,
+                process_set_priority_timeout=process_set_priority_timeout)
+            return not failed_count
+
+        uploads = {}
+        for local_file_path, remote_file_path, size, mtime, replace in items:
+            uploads.setdefault(dirname(remote_file_path), []).append(local_file_path)
+        result = True
+        for remote_dir_path, dir_local_file_paths in uploads.items():
+            uploaded_paths = self.upload_files(username=username, password=password,
+                                               local_file_paths=dir_local_file_paths, remote_dir_path=remote_dir_path,
+                                               process_priority_class=process_priority_class,
+                                               process_set_priority_timeout=process_set_priority_timeout)
+            if len(uploaded_paths) < len(dir_local_file_paths):
+                result = False
+        return result
+
+    def upload_files(self, username, password, local_file_paths, remote_dir_path, process_priority_class=None,
+                     process_set_priority_timeout=60):
+        """
+        Upload local files into existing remote directory.
+
+        Args:
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            local_file_paths (list): Local file paths to upload.
+            remote_dir_path (str): Remote directory path to upload into.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+
+        Returns:
+            List: Local file paths that were uploaded.
+        """
+        raise NotImplementedError
+
+    def upload_to_account(self, username, password, local_root, remote_root, process_priority_class=None,
+                          process_set_priority_timeout=60, remote_snapshot=None, transfer_queue=None,
+                          priority_weight=1.0, local_index=None):
+        """
+        Upload all local files of local root that are missing or outdated remotely. Local root is diffed against
+        remote snapshot once, missing remote directories are created up front, and files are uploaded with one
+        upload_files call per remote directory. With a transfer queue, planned files are queued first and uploaded
+        in priority order together with files left queued by an interrupted run.
+
+        Args:
+            username (str): username of account to upload to
+            password (str): password of account to upload to
+            local_root (str): Local root path of local account files to map with remote root.
+            remote_root (str): Remote root path of remote accounts to map with local root.
+            process_priority_class (str): Priority level to set process to. ie: "NORMAL_PRIORITY_CLASS"
+            process_set_priority_timeout (int): Timeout in seconds to wait for process to start after setting priority.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root. Remote root is listed if not given.
+            transfer_queue (TransferQueue): Durable queue to upload through. Files are uploaded directly if None.
+            priority_weight (float): Priority weight of profile in transfer queue. Higher is served first.
+            local_index (LocalIndex): Index to list local root from. Listed on disk if None.
+
+        Returns:
+            boolean: whether successful or not.
+        """
+        logger = getLogger('StorageBackend.upload_to_account')
+        logger.setLevel(self.__log_level)
+
+        logger.debug(' Starting uploading for %s' % username)
+        remote_root = remote_root.rstrip('/')  # Same form as upload_changed_files, so transfer queue keys match.
+        if not remote_snapshot:
+            remote_snapshot = self.get_remote_snapshot(username=username, password=password, remote_path=remote_root,
+                                                       process_priority_class=process_priority_class,
+                                                       process_set_priority_timeout=process_set_priority_timeout)
+        if not remote_snapshot:
+            logger.warning(' Error, could not get remote snapshot of "{}". Not uploading.'.format(remote_root))
+            return False
+
+        plan = UploadPlanner(log_level=self.__log_level).plan(local_root=local_root, remote_root=remote_root,
+                                                              remote_snapshot=remote_snapshot, local_index=local_index)
+        if not len(plan) and not plan.remote_dirs and not transfer_queue:
+            logger.debug(' Nothing to upload. {} files up to date.'.format(plan.unchanged_count))
+            return True
+
+        result = True
+        if plan.remote_dirs:
+            created_paths = self.create_remote_dirs(username=username, password=password,
+                                                    remote_paths=plan.remote_dirs,
+                                                    process_priority_class=process_priority_class,
+                                                    process_set_priority_timeout=process_set_priority_timeout)
+            if len(created_paths) < len(plan.remote_dirs):
+                logger.warning(' Could only create {} of {} remote directories.'.format(len(created_paths),
+                                                                                       len(plan.remote_dirs)))
+                result = False
+        if plan.outdated_remote_paths:
+            # Only owner of outdated remote file removal. Removed paths are discarded from snapshot, so later stages of
+            # the sync cycle do not act on them.
+            removed_paths = self.remove_remote_paths(username=username, password=password,
+                                                     remote_file_paths=plan.outdated_remote_paths,
+                                                     process_priority_class=process_priority_class,
+                                                     process_set_priority_timeout=process_set_priority_timeout)
+            remote_snapshot.discard_paths(removed_paths)
+
+        if transfer_queue:
+            stat_local_file = local_index.stat if local_index else stat
+            items = []
+            for remote_dir_path, local_file_paths in plan.uploads.items():
+                for local_file_path in local_file_paths:
+                    try:
+                        local_stat = stat_local_file(local_file_path)
+                    except OSError:
+                        continue
+                    items.append((local_file_path, remote_dir_path + '/' + path.basename(local_file_path),
+                                  local_stat.st_size, local_stat.st_mtime, False))
+            transfer_queue.enqueue(direction=TRANSFER_UPLOAD, username=username, remote_root=remote_root,
+                                   items=items, weight=priority_weight)
+            uploaded_count, failed_count = self._upload_queued_files(
+                username=username, password=password, remote_root=remote_root, remote_snapshot=remote_snapshot,
+                transfer_queue=transfer_queue, process_priority_class=process_priority_class,
+                process_set_priority_timeout=process_set_priority_timeout)
+            logger.debug(' Uploaded {} queued files to account, {} failed.'.format(uploaded_count, failed_count))
+            return result and not failed_count
+
+        uploaded_count = 0
+        for remote_dir_path, local_file_paths in plan.uploads.items():
+            uploaded_paths = self.upload_files(username=username, password=password,
+                                               local_file_paths=local_file_paths, remote_dir_path=remote_dir_path,
+                                               process_priority_class=process_priority_class,
+                                               process_set_priority_timeout=process_set_priority_timeout)
+            uploaded_count += len(uploaded_paths)
+            if len(uploaded_paths) < len(local_file_paths):
+                result = False
+
+        logger.debug(' Uploaded {} of {} files to account.'.format(uploaded_count, len(plan)))
+        return result
@@ -0,0 +1,306 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Transfer queue class. Durable, prioritized queue of downloads and uploads that survives restarts.
+###
+
+from logging import getLogger
+from math import log2
+from os import makedirs, path
+from sqlite3 import connect
+from threading import Lock
+from time import time
+
+__author__ = 'szmania'
+
+TRANSFER_DOWNLOAD = 'download'
+TRANSFER_UPLOAD = 'upload'
+TRANSFER_STATE_PENDING = 'pending'
+TRANSFER_STATE_ACTIVE = 'active'
+TRANSFER_STATE_DONE = 'done'
+TRANSFER_STATE_FAILED = 'failed'
+TRANSFER_CLAIM_BATCH_SIZE = 64  # Transfers claimed at a time, so priorities of newly queued files apply soon.
+TRANSFER_MAX_ATTEMPTS = 5  # Failed transfers are retried until this many attempts, then marked failed.
+TRANSFER_RETRY_DELAY_SECONDS = 60  # Delay before first retry of a failed transfer, doubled on each further attempt.
+TRANSFER_DONE_RETENTION_SECONDS = 7 * 24 * 60 * 60  # Done transfers are kept this long for inspection.
+TRANSFER_FAILED_RETENTION_SECONDS = 24 * 60 * 60  # Failed transfers are kept this long, then queued afresh if planned.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY,
+    direction TEXT NOT NULL,
+    username TEXT NOT NULL,
+    remote_root TEXT NOT NULL,
+    local_path TEXT NOT NULL,
+    remote_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    replace_existing INTEGER NOT NULL DEFAULT 0,
+    priority REAL NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    UNIQUE (direction, username, local_path, remote_path)
+);
+CREATE INDEX IF NOT EXISTS transfers_claim ON transfers (direction, username, state, priority);
+"""
+
+
+class TransferItem(object):
+    __slots__ = ('id', 'local_path', 'remote_path', 'size', 'mtime', 'replace_existing')
+
+    def __init__(self, id, local_path, remote_path, size, mtime, replace_existing=False):
+        """
+        Transfer claimed from queue.
+
+        Args:
+            id (int): Queue id of transfer.
+            local_path (str): Local file path.
+            remote_path (str): Remote file path.
+            size (int): File size in bytes.
+            mtime (int): File modified time in seconds since epoch.
+            replace_existing (bool): Whether an outdated file at the destination is replaced.
+        """
+        self.id = id
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.mtime = mtime
+        self.replace_existing = replace_existing
+
+    def __repr__(self):
+        return 'TransferItem(%r, %r, %r, %r, %r, %r)' % (self.id, self.local_path, self.remote_path, self.size,
+                                                         self.mtime, self.replace_existing)
+
+
+def get_transfer_priority(size, mtime, weight=1.0, now=None):
+    """
+    Priority of a transfer. Lower runs first. Small files and recently modified files come first, and profile weight
+    divides the result, so profiles with a higher weight are served ahead of others.
+
+    Args:
+        size (int): File size in bytes.
+        mtime (int): File modified time in seconds since epoch.
+        weight (float): Priority weight of profile. Higher is served first.
+        now (float): Current time in seconds since epoch. Defaults to now.
+
+    Returns:
+        Float: Priority.
+    """
+    now = time() if now is None else now
+    age_hours = max(0.0, now - mtime) / 3600
+    return (log2(max(0, size) + 1) + log2(age_hours + 1)) / max(weight, 0.01)
+
+
+class TransferQueue(object):
+    def __init__(self, db_path, log_level='DEBUG'):
+        """
+        Durable queue of file transfers, kept in an SQLite database. Every transfer is tracked as pending, active,
+        done or failed, so transfers left pending or active when the process stops are picked up again on the next
+        run without listing anything.
+
+        Args:
+            db_path (str): Path of queue database file.
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__db_path = db_path
+        self.__log_level = log_level
+        self.__lock = Lock()
+        db_dir_path = path.dirname(db_path)
+        if db_dir_path:
+            makedirs(db_dir_path, exist_ok=True)
+        self.__connection = connect(db_path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.executescript(_SCHEMA)
+        self.__connection.commit()
+
+    def claim(self, direction, username, remote_root=None, limit=TRANSFER_CLAIM_BATCH_SIZE):
+        """
+        Claim pending transfers of account in priority order, marking them active.
+
+        Args:
+            direction (str): TRANSFER_DOWNLOAD or TRANSFER_UPLOAD.
+            username (str): username of account.
+            remote_root (str): Only claim transfers queued for this remote root. All remote roots if None.
+            limit (int): Maximum number of transfers to claim.
+
+        Returns:
+            List: Claimed TransferItems.
+        """
+        logger = getLogger('TransferQueue.claim')
+        logger.setLevel(self.__log_level)
+
+        query = 'SELECT id, local_path, remote_path, size, mtime, replace_existing FROM transfers ' \
+                'WHERE direction = ? AND username = ? AND state = ? AND not_before <= ?'
+        params = [direction, username, TRANSFER_STATE_PENDING, time()]
+        if remote_root is not None:
+            query += ' AND remote_root = ?'
+            params.append(remote_root)
+        query += ' ORDER BY priority LIMIT ?'
+        params.append(limit)
+
+        with self.__lock, self.__connection:
+            rows = self.__connection.execute(query, params).fetchall()
+            self.__connection.executemany('UPDATE transfers SET state = ?, updated = ? WHERE id = ?',
+                                          [(TRANSFER_STATE_ACTIVE, time(), row[0]) for row in rows])
+        logger.debug(' Claimed {} {} transfers of account "{}".'.format(len(rows), direction, username))
+        return [TransferItem(id=row[0], local_path=row[1], remote_path=row[2], size=row[3], mtime=row[4],
+                             replace_existing=bool(row[5])) for row in rows]
+
+    def close(self):
+        """
+        Close queue database.
+        """
+        logger = getLogger('TransferQueue.close')
+        logger.setLevel(self.__log_level)
+
+        with self.__lock:
+            try:
+                self.__connection.close()
+            except Exception as e:
+                logger.warning(' Exception: {}'.format(e))
+
+    def complete(self, items):
+        """
+        Mark transfers done.
+
+        Args:
+            items (list): TransferItems that completed.
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany('UPDATE transfers SET state = ?, updated = ? WHERE id = ?',
+                                          [(TRANSFER_STATE_DONE, time(), item.id) for item in items])
+
+    def enqueue(self, direction, username, remote_root, items, weight=1.0):
+        """
+        Queue transfers in one transaction. Transfers already queued get their details and priority updated. Done
+        transfers are made pending again. Failed transfers stay failed, and retry attempts are kept, unless size or
+        modified time of file changed, so files failing for good are not retried every sync cycle.
+
+        Args:
+            direction (str): TRANSFER_DOWNLOAD or TRANSFER_UPLOAD.
+            username (str): username of account.
+            remote_root (str): Remote root of path mapping transfers belong to.
+            items (list): Tuples of local path, remote path, size, modified time and whether an outdated file at the
+                destination is replaced.
+            weight (float): Priority weight of profile. Higher is served first.
+
+        Returns:
+            Integer: Number of transfers queued.
+        """
+        logger = getLogger('TransferQueue.enqueue')
+        logger.setLevel(self.__log_level)
+
+        now = time()
+        rows = [(direction, username, remote_root, local_path, remote_path, size, int(mtime), int(bool(replace)),
+                 get_transfer_priority(size=size, mtime=mtime, weight=weight, now=now), TRANSFER_STATE_PENDING, now)
+                for local_path, remote_path, size, mtime, replace in items]
+        changed = '(size != excluded.size OR mtime != excluded.mtime)'
+        kept_failed = '(state = \'{failed}\' AND NOT {changed})'.format(failed=TRANSFER_STATE_FAILED, changed=changed)
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                'INSERT INTO transfers (direction, username, remote_root, local_path, remote_path, size, mtime, '
+                'replace_existing, priority, state, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (direction, username, local_path, remote_path) DO UPDATE SET '
+                'state = CASE WHEN state = \'{active}\' OR {kept_failed} THEN state ELSE excluded.state END, '
+                'attempts = CASE WHEN {changed} THEN 0 ELSE attempts END, '
+                'not_before = CASE WHEN {changed} THEN 0 ELSE not_before END, '
+                'updated = CASE WHEN {kept_failed} THEN updated ELSE excluded.updated END, '
+                'remote_root = excluded.remote_root, size = excluded.size, mtime = excluded.mtime, '
+                'replace_existing = excluded.replace_existing, priority = excluded.priority'.format(
+                    active=TRANSFER_STATE_ACTIVE, kept_failed=kept_failed, changed=changed), rows)
+        logger.debug(' Queued {} {} transfers of account "{}".'.format(len(rows), direction, username))
+        return len(rows)
+
+    def fail(self, items):
+        """
+        Mark transfers failed. They are retried later with growing delay, until TRANSFER_MAX_ATTEMPTS is reached.
+
+        Args:
+            items (list): TransferItems that failed.
+        """
+        now = time()
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                'UPDATE transfers SET attempts = attempts + 1, '
+                'state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END, '
+                'not_before = ? + ? * (1 << MIN(attempts, 10)), updated = ? WHERE id = ?',
+                [(TRANSFER_MAX_ATTEMPTS, TRANSFER_STATE_FAILED, TRANSFER_STATE_PENDING, now,
+                  TRANSFER_RETRY_DELAY_SECONDS, now, item.id) for item in items])
+
+    def get_completed_since(self, direction, username, paths, since):
+        """
+        Get transfers that completed after given time. ie: files uploaded after a remote snapshot was taken, so
+        missing from it.
+
+        Args:
+            direction (str): TRANSFER_DOWNLOAD or TRANSFER_UPLOAD.
+            username (str): username of account.
+            paths (list): Tuples of local path and remote path of transfers.
+            since (float): Time in seconds since epoch.
+
+        Returns:
+            Set: Tuples of local path and remote path of transfers that completed after since.
+        """
+        completed = set()
+        with self.__lock:
+            for local_path, remote_path in paths:
+                row = self.__connection.execute(
+                    'SELECT 1 FROM transfers WHERE direction = ? AND username = ? AND local_path = ? AND '
+                    'remote_path = ? AND state = ? AND updated >= ?',
+                    (direction, username, local_path, remote_path, TRANSFER_STATE_DONE, since)).fetchone()
+                if row:
+                    completed.add((local_path, remote_path))
+        return completed
+
+    def get_pending_count(self, direction=None, username=None):
+        """
+        Get number of pending and active transfers.
+
+        Args:
+            direction (str): Only count transfers of this direction. All if None.
+            username (str): Only count transfers of this account. All if None.
+
+        Returns:
+            Integer: Number of transfers.
+        """
+        query = 'SELECT COUNT(*) FROM transfers WHERE state IN (?, ?)'
+        params = [TRANSFER_STATE_PENDING, TRANSFER_STATE_ACTIVE]
+        if direction is not None:
+            query += ' AND direction = ?'
+            params.append(direction)
+        if username is not None:
+            query += ' AND username = ?'
+            params.append(username)
+        with self.__lock:
+            return self.__connection.execute(query, params).fetchone()[0]
+
+    def recover(self):
+        """
+        Make transfers left active by a previous run pending again, and purge done and failed transfers past
+        retention. Purged failed transfers are queued afresh, with no attempts, if planned again. To be called once at
+        startup, before any transfer is claimed.
+
+        Returns:
+            Integer: Number of transfers recovered.
+        """
+        logger = getLogger('TransferQueue.recover')
+        logger.setLevel(self.__log_level)
+
+        now = time()
+        with self.__lock, self.__connection:
+            recovered_count = self.__connection.execute(
+                'UPDATE transfers SET state = ?, updated = ? WHERE state = ?',
+                (TRANSFER_STATE_PENDING, now, TRANSFER_STATE_ACTIVE)).rowcount
+            self.__connection.execute('DELETE FROM transfers WHERE (state = ? AND updated < ?) OR '
+                                      '(state = ? AND updated < ?)',
+                                      (TRANSFER_STATE_DONE, now - TRANSFER_DONE_RETENTION_SECONDS,
+                                       TRANSFER_STATE_FAILED, now - TRANSFER_FAILED_RETENTION_SECONDS))
+        pending_count = self.get_pending_count()
+        if pending_count:
+            logger.info(' Resuming {} queued transfers ({} were interrupted).'.format(pending_count,
+                                                                                     recovered_count))
+        return recovered_count
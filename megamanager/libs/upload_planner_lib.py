@@ -0,0 +1,178 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Upload planner class. Diffs local tree against remote snapshot to decide what to upload.
+###
+
+from .remote_snapshot_lib import REMOTE_TYPE_FILE
+from logging import getLogger
+from os import scandir
+
+__author__ = 'szmania'
+
+# Partial downloads megatools leaves next to their target file.
+MEGA_TEMP_FILE_MARKER = '.megatmp.'
+
+
+class UploadPlan(object):
+    def __init__(self, remote_dirs, uploads, outdated_remote_paths, upload_size=0, unchanged_count=0):
+        """
+        Files and directories to upload for a path mapping.
+
+        Args:
+            remote_dirs (list): Remote directories to create, parents before children.
+            uploads (dict): Remote directory path to list of local file paths to upload into it.
+            outdated_remote_paths (list): Remote files to remove before their newer local counterparts are uploaded.
+            upload_size (int): Total size in bytes of local files to upload.
+            unchanged_count (int): Number of local files already up to date remotely.
+        """
+        self.__remote_dirs = remote_dirs
+        self.__uploads = uploads
+        self.__outdated_remote_paths = outdated_remote_paths
+        self.__upload_size = upload_size
+        self.__unchanged_count = unchanged_count
+
+    def __len__(self):
+        return sum(len(local_file_paths) for local_file_paths in self.__uploads.values())
+
+    @property
+    def outdated_remote_paths(self):
+        """
+        Getter for remote files to remove before upload.
+
+        Returns:
+            List: Remote file paths.
+        """
+        return self.__outdated_remote_paths
+
+    @property
+    def remote_dirs(self):
+        """
+        Getter for remote directories to create, parents before children.
+
+        Returns:
+            List: Remote directory paths.
+        """
+        return self.__remote_dirs
+
+    @property
+    def unchanged_count(self):
+        """
+        Getter for number of local files already up to date remotely.
+
+        Returns:
+            Integer: Number of files.
+        """
+        return self.__unchanged_count
+
+    @property
+    def upload_size(self):
+        """
+        Getter for total size of local files to upload.
+
+        Returns:
+            Integer: Size in bytes.
+        """
+        return self.__upload_size
+
+    @property
+    def uploads(self):
+        """
+        Getter for local files to upload, grouped by remote directory.
+
+        Returns:
+            Dictionary: Remote directory path to list of local file paths.
+        """
+        return self.__uploads
+
+
+class UploadPlanner(object):
+    def __init__(self, log_level='DEBUG'):
+        """
+        Plans uploads of a path mapping by walking local tree once and looking every entry up in remote snapshot, so
+        nothing is listed or compared remotely per directory.
+
+        Args:
+            log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+        """
+        self.__log_level = log_level
+
+    def plan(self, local_root, remote_root, remote_snapshot, local_index=None):
+        """
+        Plan uploads of local root into remote root. Local files missing remotely are uploaded. Local files whose size
+        differs from their remote counterpart and that are newer are uploaded after their remote counterpart is
+        removed.
+
+        Args:
+            local_root (str): Local root path to upload from.
+            remote_root (str): Remote root path to upload to.
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root.
+            local_index (LocalIndex): Index to list local directories from. Listed on disk if None.
+
+        Returns:
+            UploadPlan: Upload plan.
+        """
+        logger = getLogger('UploadPlanner.plan')
+        logger.setLevel(self.__log_level)
+
+        remote_dirs = []
+        uploads = {}
+        outdated_remote_paths = []
+        upload_size = 0
+        unchanged_count = 0
+
+        remote_root = remote_root.rstrip('/')
+        # Remote directories known to be missing need no lookups for their children.
+        pending = [(local_root, remote_root, remote_snapshot.get_entry(remote_path=remote_root) is None)]
+        while pending:
+            local_dir_path, remote_dir_path, remote_dir_missing = pending.pop()
+            if remote_dir_missing:
+                remote_dirs.append(remote_dir_path)
+            try:
+                entries = local_index.scandir(local_dir_path) if local_index else list(scandir(local_dir_path))
+            except OSError as e:
+                logger.warning(' Could not list local directory "{}". Exception: {}'.format(local_dir_path, e))
+                continue
+
+            dir_uploads = []
+            for entry in entries:
+                remote_path = remote_dir_path + '/' + entry.name
+                remote_entry = None if remote_dir_missing else remote_snapshot.get_entry(remote_path=remote_path)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if remote_entry is not None and remote_entry[2] == REMOTE_TYPE_FILE:
+                            logger.warning(' Remote path is a file, local path a directory. Skipping "{}"'.format(
+                                entry.path))
+                            continue
+                        pending.append((entry.path, remote_path, remote_entry is None))
+                        continue
+                    if not entry.is_file() or MEGA_TEMP_FILE_MARKER in entry.name:
+                        continue
+                    stat = entry.stat()
+                except OSError as e:
+                    logger.warning(' Could not stat local path "{}". Exception: {}'.format(entry.path, e))
+                    continue
+
+                if remote_entry is not None:
+                    handle, parent, remote_type, remote_size, remote_mtime, _ = remote_entry
+                    if remote_type != REMOTE_TYPE_FILE:
+                        logger.warning(' Remote path is a directory, local path a file. Skipping "{}"'.format(
+                            entry.path))
+                        continue
+                    if remote_size == stat.st_size or int(stat.st_mtime) <= remote_mtime:
+                        unchanged_count += 1
+                        continue
+                    outdated_remote_paths.append(remote_path)
+                dir_uploads.append(entry.path)
+                upload_size += stat.st_size
+
+            if dir_uploads:
+                uploads[remote_dir_path] = dir_uploads
+
+        remote_dirs.sort(key=lambda remote_dir_path: remote_dir_path.count('/'))
+        logger.debug(' Upload plan for "{}": {} files ({} bytes), {} outdated, {} directories to create, {} unchanged.'
+                     .format(local_root, sum(len(paths) for paths in uploads.values()), upload_size,
+                             len(outdated_remote_paths), len(remote_dirs), unchanged_count))
+        return UploadPlan(remote_dirs=remote_dirs, uploads=uploads, outdated_remote_paths=outdated_remote_paths,
+                          upload_size=upload_size, unchanged_count=unchanged_count)
@@ -8,15 +8,30 @@ import tempfile
 import shutil
 import sys
 from ast import literal_eval
-from datetime import datetime
 from configparser import ConfigParser
+from hashlib import md5
 from importlib import reload  # Import reload from importlib in Python 3
 from logging import DEBUG, getLogger, Formatter, StreamHandler, handlers
+from libs.bandwidth_lib import BandwidthAllocator
+from libs.compress_images_lib import JPEG_MIN_QUALITY_PERCENTAGE
 from libs.lib import Lib
-from libs.compress_images_lib import CompressImages_Lib
+from libs.download_engine_lib import ACCOUNT_DOWNLOAD_WORKERS, DownloadEngine, DownloadTask, DOWNLOAD_WORKERS
 from libs.ffmpeg_lib import FFMPEG_Lib
-from libs.mega_tools_lib import MegaTools_Lib
-from os import path, remove, sep, walk
+from libs.file_hasher_lib import FileHasher, HASH_ALGORITHM, HASH_BUFFER_SIZE, HASH_WORKERS
+from libs.file_watcher_lib import FileWatcher, WATCH_DEBOUNCE_SECONDS, WATCH_POLL_INTERVAL_SECONDS
+from libs.hash_cache_lib import HashCache
+from libs.image_compression_engine_lib import ImageCompressionEngine, IMAGE_COMPRESSION_BATCH_SIZE, \
+    IMAGE_COMPRESSION_WORKERS
+from libs.ledger_lib import DigestLedger, Ledger
+from libs.local_directory_backend_lib import LocalDirectoryBackend
+from libs.local_index_lib import LocalIndex, LOCAL_INDEX_FULL_REFRESH_SECONDS
+from libs.mega_api_lib import MegaApi_Lib, MEGA_API_URL
+from libs.mega_tools_lib import MegaTools_Lib, MEGATOOLS_CACHE_TIMEOUT_SECONDS, MEGATOOLS_CONFIG_DIR_PATH, \
+    REMOTE_SNAPSHOT_TTL_SECONDS
+from libs.parallel_walker_lib import ParallelWalker, WALKER_WORKERS
+from libs.remote_snapshot_lib import MANIFEST_TTL_SECONDS, RemoteSnapshot
+from libs.transfer_queue_lib import TRANSFER_DOWNLOAD, TransferQueue
+from os import access, makedirs, path, R_OK, remove, sep, stat, X_OK
 from path_mapping import PathMapping
 from platform import system
 from random import shuffle
@@ -24,7 +39,7 @@ from re import findall, IGNORECASE, match, search, sub
 from string import Formatter as string_formatter
 from syncprofile import SyncProfile
 from sys import stdout
-from threading import Thread
+from threading import Lock, Thread
 from time import sleep, time
 
 
@@ -73,6 +88,10 @@ class MegaManager(object):
         self.__compressed_images_file_path = None
         self.__compressed_videos_file_path = None
         self.__compression_image_extensions = []
+        self.__compression_jpeg_quality_percentage = 60
+        self.__compression_jpeg_min_quality_percentage = JPEG_MIN_QUALITY_PERCENTAGE
+        self.__compression_image_target_bytes_per_megapixel = 0
+        self.__compression_image_target_saving_percentage = 0
         self.__compression_video_extensions = []
         self.__image_temp_file_extensions = []
         self.__compression_ffmpeg_video_max_width = None
@@ -83,8 +102,39 @@ class MegaManager(object):
         self.__process_set_priority_timeout = None
         self.__megatools_process_priority_class = None
         self.__megatools_log_path = None
+        self.__remote_snapshot_ttl_seconds = REMOTE_SNAPSHOT_TTL_SECONDS
+        self.__remote_manifest_ttl_seconds = MANIFEST_TTL_SECONDS
+        self.__remote_snapshot_lock = Lock()
+        self.__megatools_config_dir_path = MEGATOOLS_CONFIG_DIR_PATH
+        self.__megatools_cache_timeout_seconds = MEGATOOLS_CACHE_TIMEOUT_SECONDS
         self.__mega_download_speed = None
         self.__mega_upload_speed = None
+        self.__mega_download_workers = DOWNLOAD_WORKERS
+        self.__mega_account_download_workers = ACCOUNT_DOWNLOAD_WORKERS
+        self.__download_engine = None
+        self.__transfer_queue_path = None
+        self.__transfer_queue = None
+        self.__local_index_path = None
+        self.__local_index_full_refresh_seconds = LOCAL_INDEX_FULL_REFRESH_SECONDS
+        self.__local_index = None
+        self.__local_walker_workers = WALKER_WORKERS
+        self.__watch_local_changes = False
+        self.__watch_debounce_seconds = WATCH_DEBOUNCE_SECONDS
+        self.__watch_poll_interval_seconds = WATCH_POLL_INTERVAL_SECONDS
+        self.__file_watcher = None
+        self.__hash_cache_path = None
+        self.__hash_cache = None
+        self.__hash_algorithm = HASH_ALGORITHM
+        self.__hash_buffer_size = HASH_BUFFER_SIZE
+        self.__hash_workers = HASH_WORKERS
+        self.__file_hasher = None
+        self.__image_compression_workers = IMAGE_COMPRESSION_WORKERS
+        self.__image_compression_batch_size = IMAGE_COMPRESSION_BATCH_SIZE
+        self.__image_compression_engine = None
+        self.__download_bandwidth = None
+        self.__upload_bandwidth = None
+        self.__mega_api_url = MEGA_API_URL
+        self.__storage_backends = {}
         self.__ffmpeg_process_priority_class = None
         self.__ffmpeg_log_path = None
         self.__ffmpeg_threads = None
@@ -105,46 +155,44 @@ class MegaManager(object):
             if value:
                 setattr(self, '_MegaManager__%s' % key, value)
 
-    def _compress_image_file(self, file_path):
+    def _compress_image_file_teardown(self, result):
         """
-        Compress given image file path.
+        Teardown for compress image file. Records result of image compression engine in ledgers and hash cache.
 
         Args:
-            file_path: Path to image file to compress.
+            result (ImageCompressionResult): Result of image file compression.
 
         Returns:
             Boolean: Whether compression operation was successful or not.
         """
-        logger = getLogger('MegaManager._compress_image_file')
+        logger = getLogger('MegaManager._compress_image_file_teardown')
         logger.setLevel(self.__log_level)
-        logger.debug(' Compressing image file: "{}"'.format(file_path))
-        compressed = self.__compress_images_lib.compress_image_file(file_path=file_path,
-                                                                    jpeg_compression_quality_percentage=
-                                                                    self.__compression_jpeg_quality_percentage,
-                                                                    delete_backup=True,
-                                                                    delete_corrupt_images=True)
-        if compressed:
-            logger.debug(' Image file compressed successfully "%s"!' % file_path)
-            file_md5_hash = self.__lib.get_file_md5_hash(file_path)
-            self.__compressed_image_files.add(file_md5_hash)
-            self.__lib.dump_set_into_numpy_file(item_set=self.__compressed_image_files,
-                                                file_path=self.__compressed_images_file_path)
-            return True
 
-        else:
-            logger.debug(' Error, image file could not be compressed "%s"!' % file_path)
-            file_md5_hash = self.__lib.get_file_md5_hash(file_path)
-            self.__unable_to_compress_image_files.add(file_md5_hash)
-            self.__lib.dump_set_into_numpy_file(item_set=self.__unable_to_compress_image_files,
-                                                file_path=self.__unable_to_compress_images_file_path)
+        if result.error:
+            logger.warning(' Error, image file could not be compressed "{}". Exception: {}'.format(result.file_path,
+                                                                                                  result.error))
             return False
+        if result.digest and self.__hash_cache:
+            self.__hash_cache.put(file_path=result.file_path, digest=result.digest, file_stat=result.file_stat)
+        if result.compressed:
+            logger.debug(' Image file compressed successfully "{}"! Saved {} bytes.'.format(result.file_path,
+                                                                                           result.bytes_saved))
+            if result.digest:
+                self.__compressed_image_files.add(result.digest)
+            return True
+
+        logger.debug(' Error, image file could not be compressed "%s"!' % result.file_path)
+        if result.digest:
+            self.__unable_to_compress_image_files.add(result.digest)
+        return False
 
-    def _compress_image_files(self, file_list):
+    def _compress_image_files(self, file_list, index_cursor=None):
         """
         Find image files to compress.
 
         Args:
             file_list (list[str]): List of all files to compress.
+            index_cursor (tuple): Local index cursor name and cycle to set once all files are processed.
 
         Returns:
             Boolean: Returns whether operation was successful or not.
@@ -154,6 +202,7 @@ class MegaManager(object):
         logger.debug(' Compressing image files.')
 
         try:
+            image_file_paths = []
             for local_file_path in file_list:
                 local_file_ext = local_file_path.split('.')[-1]
                 if local_file_ext.lower() in self.__compression_image_extensions:
@@ -163,14 +212,27 @@ class MegaManager(object):
                         logger.warning(' File "{}" is temporary file. Deleting.'.format(local_file_path))
                         self.__lib.delete_local_file(local_file_path)
                         continue
-
-                    file_md5_hash = self.__lib.get_file_md5_hash(local_file_path)
-                    if (file_md5_hash not in self.__compressed_image_files) \
-                            and (file_md5_hash not in self.__unable_to_compress_image_files):
-                        self._compress_image_file(file_path=local_file_path)
+                    image_file_paths.append(local_file_path)
+
+            def get_uncompressed_file_paths():
+                for local_file_path, file_hash in self.__file_hasher.hash_files(file_paths=image_file_paths,
+                                                                                hash_function=self._get_file_hash):
+                    if (file_hash not in self.__compressed_image_files) \
+                            and (file_hash not in self.__unable_to_compress_image_files):
+                        yield local_file_path
                     else:
                         logger.debug(' Image file already compressed or previously unable to compress: "{}"'.format(local_file_path))
 
+            bytes_saved = 0
+            for result in self.__image_compression_engine.compress_files(file_paths=get_uncompressed_file_paths()):
+                if self._compress_image_file_teardown(result=result):
+                    bytes_saved += result.bytes_saved
+            logger.info(' Image compression saved {:.1f} MB.'.format(bytes_saved / 1000000))
+
+            self.__compressed_image_files.flush()
+            self.__unable_to_compress_image_files.flush()
+            if index_cursor:
+                self.__local_index.set_cursor(*index_cursor)
             logger.debug(' Success, finished compressing image files.')
             return True
 
@@ -268,9 +330,9 @@ class MegaManager(object):
                     logger.debug(f' Original file size ({orig_file_size}) is smaller or equal to the new file size ({new_file_size}). Not going to replace the old file: "{orig_file_path}"')
             logger.debug(' Video file compressed successfully "%s" into "%s"!' % (
                 orig_file_path, final_file_path))
-            file_md5_hash = self.__lib.get_file_md5_hash(final_file_path)
-            self.__compressed_video_files.add(file_md5_hash)
-            self.__lib.dump_set_into_numpy_file(item_set=self.__compressed_video_files, file_path=self.__compressed_videos_file_path)
+            file_hash = self._get_file_hash(file_path=final_file_path)
+            if file_hash:
+                self.__compressed_video_files.add(file_hash)
         else:
             logger.debug(' Error, video file could not be compressed "%s"!' % temp_file_path)
             logger.debug(' Error, video file could not be compressed "%s"!' % temp_file_path)
@@ -278,21 +340,23 @@ class MegaManager(object):
                 logger.debug(' Deleting temporary NEW file "%s"!' % new_file_path)
                 self.__lib.delete_local_file(file_path=new_file_path)
             if path.exists(temp_file_path):
-                file_md5_hash = self.__lib.get_file_md5_hash(temp_file_path)
-                self.__unable_to_compress_video_files.add(file_md5_hash)
-                self.__lib.dump_set_into_numpy_file(item_set=self.__unable_to_compress_video_files,
-                                                file_path=self.__unable_to_compress_videos_file_path)
+                # Temporary file is a copy of original file, whose hash is cached already.
+                file_hash = self._get_file_hash(file_path=orig_file_path) if path.exists(orig_file_path) \
+                    else self._get_file_hash(file_path=temp_file_path, cache=False)
+                if file_hash:
+                    self.__unable_to_compress_video_files.add(file_hash)
                 logger.debug(' Deleting temporary file "%s"!' % temp_file_path)
                 self.__lib.delete_local_file(file_path=temp_file_path)
 
         logger.debug(' Successfully completed video file compression teardown.')
 
-    def _compress_video_files(self, file_list):
+    def _compress_video_files(self, file_list, index_cursor=None):
         """
         Find video files to compress.
 
         Args:
             file_list (list[str]): List of all files to compress.
+            index_cursor (tuple): Local index cursor name and cycle to set once all files are processed.
 
         Returns:
             Boolean: Whether operation is successful or not.
@@ -301,6 +365,7 @@ class MegaManager(object):
         logger.setLevel(self.__log_level)
         logger.debug(' Finding video files to compress.')
         try:
+            video_file_paths = []
             for local_file_path in file_list:
                 local_file_ext = local_file_path.split('.')[-1]
                 if local_file_ext.lower() in self.__compression_video_extensions:
@@ -310,18 +375,43 @@ class MegaManager(object):
                         logger.warning(' File "{}" is a temporary file. Deleting.'.format(local_file_path))
                         self.__lib.delete_local_file(local_file_path)
                         continue
-                    file_md5_hash = self.__lib.get_file_md5_hash(local_file_path)
-                    if (file_md5_hash not in self.__compressed_video_files) \
-                        and (file_md5_hash not in self.__unable_to_compress_video_files):
-                        self._compress_video_file(orig_file_path=local_file_path)
-                    else:
-                        logger.debug(' Video file already compressed or previously unable to compress: "{}"'.format(local_file_path))
+                    video_file_paths.append(local_file_path)
+
+            for local_file_path, file_hash in self.__file_hasher.hash_files(file_paths=video_file_paths,
+                                                                            hash_function=self._get_file_hash):
+                if (file_hash not in self.__compressed_video_files) \
+                    and (file_hash not in self.__unable_to_compress_video_files):
+                    self._compress_video_file(orig_file_path=local_file_path)
+                else:
+                    logger.debug(' Video file already compressed or previously unable to compress: "{}"'.format(local_file_path))
+            self.__compressed_video_files.flush()
+            self.__unable_to_compress_video_files.flush()
+            if index_cursor:
+                self.__local_index.set_cursor(*index_cursor)
             logger.debug(' Success, finished compressing video files.')
             return True
         except Exception as e:
             logger.warning(' Exception: {}'.format(e))
             return False
 
+    def _create_threads_compress_changed_files(self, root_path, images=False, videos=False):
+        """
+        Create threads to compress local files of root that changed since they were last compressed.
+
+        Args:
+            root_path (str): Local root path.
+            images (bool): Whether to compress image files.
+            videos (bool): Whether to compress video files.
+        """
+        if images:
+            file_list, index_cursor = self._get_changed_local_files(root_path=root_path, stage='compress_images')
+            shuffle(file_list)
+            self._create_thread_compress_image_files(file_list=file_list, index_cursor=index_cursor)
+        if videos:
+            file_list, index_cursor = self._get_changed_local_files(root_path=root_path, stage='compress_videos')
+            shuffle(file_list)
+            self._create_thread_compress_video_files(file_list=file_list, index_cursor=index_cursor)
+
     def _create_thread_get_profile_data(self, profile):
         """
         Create thread to create profiles data file.
@@ -425,12 +515,13 @@ class MegaManager(object):
             logger.error(' Exception: {}'.format(e))
             return False
 
-    def _create_thread_compress_image_files(self, file_list):
+    def _create_thread_compress_image_files(self, file_list, index_cursor=None):
         """
         Create thread to compress image files.
 
         Args:
             file_list (list[str]): List of files to compress.
+            index_cursor (tuple): Local index cursor name and cycle to set once all files are processed.
 
         Returns:
             Boolean: Whether successful or not.
@@ -442,7 +533,8 @@ class MegaManager(object):
         logger.debug(' Creating thread to compress local image files')
 
         try:
-            t_compress = Thread(target=self._compress_image_files, args=(file_list,), name='thread_compress_images')
+            t_compress = Thread(target=self._compress_image_files, args=(file_list, index_cursor),
+                                name='thread_compress_images')
             self.__threads.append(t_compress)
             t_compress.start()
             return True
@@ -450,12 +542,13 @@ class MegaManager(object):
             logger.error(' Exception: {}'.format(e))
             return False
 
-    def _create_thread_compress_video_files(self, file_list):
+    def _create_thread_compress_video_files(self, file_list, index_cursor=None):
         """
         Create thread to compress video files.
 
         Args:
             file_list (list[str]): List of files to compress.
+            index_cursor (tuple): Local index cursor name and cycle to set once all files are processed.
 
         Returns:
             Boolean: Whether successful or not.
@@ -466,7 +559,8 @@ class MegaManager(object):
 
         logger.debug(' Creating thread to compress local video files.')
         try:
-            t_compress = Thread(target=self._compress_video_files, args=(file_list,), name='thread_compress_videos')
+            t_compress = Thread(target=self._compress_video_files, args=(file_list, index_cursor),
+                                name='thread_compress_videos')
             self.__threads.append(t_compress)
             t_compress.start()
             return True
@@ -499,6 +593,48 @@ class MegaManager(object):
             logger.error(' Exception: {}'.format(e))
             return False
 
+    def _download_queued_files(self, username, password, storage_backend):
+        """
+        Download queued files of account in priority order through download engine, one batch of claimed transfers
+        at a time. Includes files left queued by an interrupted run.
+
+        Args:
+            username (str): username of account to download from
+            password (str): password of account to download from
+            storage_backend (StorageBackend): Backend of account.
+
+        Returns:
+            Boolean: Whether all queued files were downloaded or not.
+        """
+        logger = getLogger('MegaManager._download_queued_files')
+        logger.setLevel(self.__log_level)
+
+        downloaded_count = 0
+        failed_count = 0
+        try:
+            while True:
+                items = self.__transfer_queue.claim(direction=TRANSFER_DOWNLOAD, username=username)
+                if not items:
+                    break
+                tasks = [DownloadTask(remote_path=item.remote_path, local_path=item.local_path, size=item.size,
+                                      replace_local=item.replace_existing, mtime=item.mtime) for item in items]
+                failed_task_ids = set(id(task) for task in self.__download_engine.download(
+                    backend=storage_backend, username=username, password=password, tasks=tasks))
+                failed_items = [item for item, task in zip(items, tasks) if id(task) in failed_task_ids]
+                self.__transfer_queue.complete(items=[item for item, task in zip(items, tasks)
+                                                      if id(task) not in failed_task_ids])
+                self.__transfer_queue.fail(items=failed_items)
+                downloaded_count += len(items) - len(failed_items)
+                failed_count += len(failed_items)
+        except Exception as e:
+            logger.warning(' Exception: {}'.format(e))
+            return False
+
+        if failed_count:
+            logger.warning(' Could not download {} queued files of account "{}".'.format(failed_count, username))
+        logger.debug(' Downloaded {} queued files of account "{}".'.format(downloaded_count, username))
+        return not failed_count
+
     def _export_config_file_data(self, config_parser):
         """
         Export config file data.
@@ -561,14 +697,51 @@ class MegaManager(object):
         logger = getLogger('MegaManager._get_all_files')
         logger.setLevel(self.__log_level)
         logger.debug(' Getting all files in root path: {root_path}'.format(root_path=root_path))
-        all_files = []
-        for root, dirs, files in walk(root_path):
-            for file in files:
-                full_path = path.join(root, file)
-                all_files.append(full_path)
+        walker = ParallelWalker(workers=self.__local_walker_workers, log_level=self.__log_level)
+        all_files = [entry.path for entry in walker.iter_files(root_path=root_path)]
         logger.debug(' Retrieved all files in root path: "{root_path}". Total number of files: {files}'.format(root_path=root_path, files=len(all_files)))
         return all_files
 
+    def _get_changed_local_files(self, root_path, stage):
+        """
+        Get local files of root added or changed since stage last finished processing root. All files if there is no
+        local index.
+
+        Args:
+            root_path (str): Local root path.
+            stage (str): Name of stage consuming changes. ie: "compress_images"
+
+        Returns:
+            Tuple: List of file paths, and local index cursor name and cycle for stage to set once done, or None.
+        """
+        logger = getLogger('MegaManager._get_changed_local_files')
+        logger.setLevel(self.__log_level)
+
+        if not self.__local_index:
+            return self._get_all_files(root_path=root_path), None
+        cursor_name = '{}:{}'.format(stage, root_path)
+        since_cycle = self.__local_index.get_cursor(name=cursor_name)
+        changed_files = self.__local_index.get_changed_files(root_path=root_path, since_cycle=since_cycle)
+        logger.debug(' {} files of "{}" changed since stage "{}" last processed it.'.format(len(changed_files),
+                                                                                           root_path, stage))
+        return changed_files, (cursor_name, self.__local_index.cycle)
+
+    def _get_file_hash(self, file_path, cache=True):
+        """
+        Get hash of local file, with "HASH_ALGORITHM". Hashes are looked up in hash cache, so only new and changed files
+        are read.
+
+        Args:
+            file_path (str): File path.
+            cache (bool): Whether to use hash cache, ie: not for temporary files.
+
+        Returns:
+            String: Hash of file, or False on failure.
+        """
+        if cache and self.__hash_cache:
+            return self.__hash_cache.get_file_hash(file_path=file_path, hash_function=self.__file_hasher.hash_file)
+        return self.__file_hasher.hash_file(file_path=file_path)
+
     def _get_profile_data(self, profile):
         """
         Create self.__mega_accounts_output_path file. File that has all fetched data of accounts and local and remote spaces of each account.
@@ -624,12 +797,13 @@ class MegaManager(object):
         remotePath = self.__lib.get_remote_path_from_local_path(localPath=localFilePath, localRoot=localRoot,
                                                                 remoteRoot=remoteRoot)
         if remotePath:
-            return self.__mega_tools_lib.get_remote_file_modified_date(username=username, password=password,
-                                                                       remotePath=remotePath)
+            return self._get_storage_backend(username=username).get_remote_file_modified_date(username=username, password=password,
+                                                                                              remotePath=remotePath, remote_root=remoteRoot)
         logger.warning(' Remote file path could not be gotten.')
         return None
 
-    def _get_remote_files_that_dont_exist_locally(self, username, password, local_root, remote_root):
+    def _get_remote_files_that_dont_exist_locally(self, username, password, local_root, remote_root,
+                                                  remote_snapshot=None):
         """
         Get remote files that don't exist locally.
 
@@ -638,6 +812,7 @@ class MegaManager(object):
             password (str): Password of account to upload to
             local_root (str): Local path to download file to
             remote_root (str): Remote path of file to download
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root. Remote root is listed if not given.
 
         Returns:
             list of remote files that don't exist locally
@@ -646,33 +821,95 @@ class MegaManager(object):
         logger = getLogger('MegaManager._get_remote_files_that_dont_exist_locally')
         logger.setLevel(self.__log_level)
 
-        logger.debug(' Getting remote files that do not exist locally on %s - %s.' % (username, password))
+        logger.debug(' Getting remote files that do not exist locally on %s.' % username)
 
-        remote_files = self.__mega_tools_lib.get_remote_file_paths_recursively(username=username, password=password,
-                                                                               remote_path=remote_root,
-                                                                               process_priority_class=self.__megatools_process_priority_class,
-                                                                               process_set_priority_timeout=self.__process_set_priority_timeout)
+        if not remote_snapshot:
+            remote_snapshot = self._get_remote_snapshot(username=username, password=password, remote_root=remote_root)
         dont_exist_locally = []
         try:
-            if remote_files:
-                for remote_file_path in remote_files:
-                    file_sub_path = sub(remote_root, '', remote_file_path)
-                    local_file_path = path.join(local_root, path.abspath(file_sub_path))
+            if remote_snapshot:
+                remote_root = remote_root.rstrip('/')
+                missing_dir_prefix = None
+                # Sorting by path components keeps every subtree contiguous, right after its root.
+                for remote_file_path in sorted(remote_snapshot.get_paths(), key=lambda p: p.split('/')):
+                    if '?' in remote_file_path or not remote_file_path.startswith(remote_root + '/'):
+                        continue
+                    if missing_dir_prefix and remote_file_path.startswith(missing_dir_prefix):
+                        # Ancestor is already missing locally. Removing it removes this path too.
+                        continue
+                    file_sub_path = remote_file_path[len(remote_root) + 1:]
+                    local_file_path = path.join(local_root, *file_sub_path.split('/'))
 
-                    if not path.exists(local_file_path):
-                        found = False
-                        for not_exist_local_file_path in dont_exist_locally:
-                            if local_file_path in not_exist_local_file_path:
-                                found = True
-                                break
-                        if not found:
-                            dont_exist_locally.append(remote_file_path)
+                    if not (self.__local_index.exists(local_file_path) if self.__local_index
+                            else path.exists(local_file_path)):
+                        dont_exist_locally.append(remote_file_path)
+                        missing_dir_prefix = remote_file_path + '/'
 
         except Exception as e:
             logger.warning(' Exception: {}'.format(e))
         finally:
             return dont_exist_locally
 
+    def _get_remote_manifest_path(self, profile, path_mapping):
+        """
+        Get file path of persisted remote manifest for path mapping of profile.
+
+        Args:
+            profile (SyncProfile): Profile of path mapping.
+            path_mapping (PathMapping): Path mapping to get manifest path for.
+
+        Returns:
+            String: Remote manifest file path.
+        """
+        manifest_key = md5('{}|{}'.format(profile.account.username, path_mapping.remote_path).encode('utf-8')).hexdigest()
+        return path.join(self.__mega_manager_config_dir_data_path, 'remote_manifests', '{}.manifest'.format(manifest_key))
+
+    def _get_remote_snapshot(self, username, password, remote_root):
+        """
+        Get snapshot of remote tree with a single recursive listing.
+
+        Args:
+            username (str): username for MEGA account
+            password (str): password for MEGA account
+            remote_root (str): Remote root path to get snapshot of.
+
+        Returns:
+            RemoteSnapshot: Snapshot of remote root, or None if remote root could not be listed.
+        """
+        return self._get_storage_backend(username=username).get_remote_snapshot(username=username, password=password, remote_path=remote_root,
+                                                                                process_priority_class=self.__megatools_process_priority_class,
+                                                                                process_set_priority_timeout=self.__process_set_priority_timeout)
+
+    def _get_verified_remote_snapshot(self, profile, path_mapping):
+        """
+        Get remote snapshot of path mapping that comes from a live listing. Snapshots loaded from a persisted manifest
+        may predate changes made by other clients while MEGA Manager was not running, so stages that delete or replace
+        files list the remote root first. Listed once, by whichever stage asks first.
+
+        Args:
+            profile (SyncProfile): Profile of path mapping.
+            path_mapping (PathMapping): Path mapping to get remote snapshot of.
+
+        Returns:
+            RemoteSnapshot: Verified remote snapshot, or None if remote root could not be listed.
+        """
+        with self.__remote_snapshot_lock:
+            if path_mapping.remote_snapshot and path_mapping.remote_snapshot.verified:
+                return path_mapping.remote_snapshot
+            return self._refresh_remote_snapshot(profile=profile, path_mapping=path_mapping)
+
+    def _get_storage_backend(self, username):
+        """
+        Get storage backend of profile with given username.
+
+        Args:
+            username (str): username of MEGA account.
+
+        Returns:
+            StorageBackend: Storage backend of profile. Megatools if profile has none set.
+        """
+        return self.__storage_backends.get(username, self.__mega_tools_lib)
+
     def _import_config_file_data(self, ignore_config_actions):
         """
         Load config file data.
@@ -721,6 +958,9 @@ class MegaManager(object):
                     profile_name = config_parser[section]['profile_name']
                     username = config_parser[section]['username']
                     password = config_parser[section]['password']
+                    backend = config_parser[section].get('backend', 'megatools').strip('"').lower()
+                    backend_path = config_parser[section].get('backend_path', '').strip('"')
+                    priority_weight = config_parser[section].get('priority_weight', '').strip('"')
                     path_mappings = []
 
                     for entry in config_parser[section]:
@@ -733,7 +973,9 @@ class MegaManager(object):
                             path_mapping_entry = PathMapping(local_path=local_path, remote_path=remote_path, log_level=self.__log_level)
                             path_mappings.append(path_mapping_entry)
                     sync_profile_obj = SyncProfile(profile_name=profile_name, username=username, password=password,
-                                                   path_mappings=path_mappings)
+                                                   path_mappings=path_mappings, log_level=self.__log_level,
+                                                   backend=backend, backend_path=backend_path,
+                                                   priority_weight=priority_weight)
                     self.__sync_profiles.append(sync_profile_obj)
         except Exception as e:
             print(' Exception: {}'.format(e))
@@ -784,15 +1026,143 @@ class MegaManager(object):
 
         print(' Successfully loaded MEGA Manager config file properties data.')
 
-    def _remove_outdated_files(self, username, password, local_root, remote_root):
+    def _is_video_compression_running(self):
+        """
+        Determines if a video compression thread is still running.
+
+        Returns:
+            Boolean: Whether a video compression thread is alive or not.
+        """
+        return any(thread.is_alive() and thread.name.startswith('thread_compress_videos')
+                   for thread in list(self.__threads))
+
+    def _migrate_compression_ledgers(self):
+        """
+        Migrate compression ledgers to hash algorithm set by "HASH_ALGORITHM" config key, if they hold hashes of
+        another algorithm. Local files of all profiles are hashed with both algorithms in a single read, and each
+        ledger hash is replaced by new hash of its file. Hashes of files no longer found locally are dropped, so
+        migration is not done while any path mapping is missing, unreadable or empty, ie: an unmounted network share.
+        If migration fails or is not done, ledger algorithm is kept, so files are not compressed again, and migration
+        is tried again on next start.
+
+        Returns:
+            Boolean: Whether ledgers were migrated or not.
+        """
+        logger = getLogger('MegaManager._migrate_compression_ledgers')
+        logger.setLevel(self.__log_level)
+
+        algorithm_path = path.join(self.__mega_manager_config_dir_data_path, 'ledger_hash_algorithm')
+        ledger_algorithm = 'md5'
+        try:
+            if path.isfile(algorithm_path):
+                with open(algorithm_path, 'r') as f:
+                    ledger_algorithm = f.read().strip() or 'md5'
+            if ledger_algorithm == self.__file_hasher.algorithm:
+                return True
+
+            ledgers = [(self.__compressed_image_files, self.__compressed_images_file_path),
+                       (self.__unable_to_compress_image_files, self.__unable_to_compress_images_file_path),
+                       (self.__compressed_video_files, self.__compressed_videos_file_path),
+                       (self.__unable_to_compress_video_files, self.__unable_to_compress_videos_file_path)]
+            if any(ledger for ledger, ledger_path in ledgers):
+                logger.info(' Migrating compression ledgers from "{}" to "{}" hashes.'.format(
+                    ledger_algorithm, self.__file_hasher.algorithm))
+                extensions = set(self.__compression_image_extensions) | set(self.__compression_video_extensions)
+                file_paths = []
+                for profile in self.__sync_profiles:
+                    for pathMapping in profile.path_mappings:
+                        if not path.isdir(pathMapping.local_path) or \
+                                not access(pathMapping.local_path, R_OK | X_OK):
+                            raise IOError('Path mapping is missing or unreadable: "{}"'.format(
+                                pathMapping.local_path))
+                        mapping_file_paths = self._get_all_files(root_path=pathMapping.local_path)
+                        if not mapping_file_paths:
+                            raise IOError('Path mapping has no files, it may not be mounted: "{}"'.format(
+                                pathMapping.local_path))
+                        file_paths.extend(file_path for file_path in mapping_file_paths
+                                          if not extensions or file_path.split('.')[-1].lower() in extensions)
+
+                def hash_file(file_path):
+                    try:
+                        file_stat = stat(file_path)
+                    except OSError:
+                        return False
+                    digests = self.__file_hasher.hash_file(file_path=file_path,
+                                                           algorithms=(ledger_algorithm, self.__file_hasher.algorithm))
+                    if digests and self.__hash_cache:
+                        self.__hash_cache.put(file_path=file_path, digest=digests[1], file_stat=file_stat)
+                    return digests
+
+                new_hashes = {}
+                for file_path, digests in self.__file_hasher.hash_files(file_paths=file_paths, hash_function=hash_file):
+                    if digests:
+                        new_hashes[digests[0]] = digests[1]
+                old_hashes = list(new_hashes)
+                for ledger, ledger_path in ledgers:
+                    migrated = {new_hashes[file_hash] for file_hash, contained in
+                                zip(old_hashes, ledger.contains_many(items=old_hashes)) if contained}
+                    logger.info(' Migrated {} of {} hashes of ledger "{}".'.format(len(migrated), len(ledger),
+                                                                                   ledger_path))
+                    if not ledger.replace(items=migrated):
+                        raise IOError('Could not write ledger "{}".'.format(ledger_path))
+
+            with open(algorithm_path, 'w') as f:
+                f.write(self.__file_hasher.algorithm)
+            return True
+        except Exception as e:
+            logger.error(' Could not migrate compression ledgers. Keeping "{}" hashes. Exception: {}'.format(
+                ledger_algorithm, e))
+            self.__hash_algorithm = ledger_algorithm
+            self._setup_file_hasher()
+            if self.__hash_cache:
+                self.__hash_cache.close()
+                self._setup_hash_cache()
+            return False
+
+    def _refresh_remote_snapshot(self, profile, path_mapping):
         """
-        Remove old versions of files.
+        List remote root of path mapping into a new, verified remote snapshot. Persisted manifest is only rewritten when
+        listing changed since previous snapshot.
+
+        Args:
+            profile (SyncProfile): Profile of path mapping.
+            path_mapping (PathMapping): Path mapping to refresh remote snapshot of.
+
+        Returns:
+            RemoteSnapshot: New remote snapshot, or None if remote root could not be listed.
+        """
+        logger = getLogger('MegaManager._refresh_remote_snapshot')
+        logger.setLevel(self.__log_level)
+
+        manifest_path = self._get_remote_manifest_path(profile=profile, path_mapping=path_mapping)
+        previous_snapshot = path_mapping.remote_snapshot
+        snapshot = self._get_remote_snapshot(username=profile.account.username, password=profile.account.password,
+                                             remote_root=path_mapping.remote_path)
+        if not snapshot:
+            return None
+
+        if previous_snapshot:
+            added, removed, changed = previous_snapshot.diff(snapshot)
+            logger.debug(' Remote changes for "{}": {} added, {} removed, {} changed.'.format(
+                path_mapping.remote_path, len(added), len(removed), len(changed)))
+            if added or removed or changed or not path.exists(manifest_path):
+                snapshot.to_manifest(manifest_path=manifest_path)
+        else:
+            snapshot.to_manifest(manifest_path=manifest_path)
+        path_mapping.remote_snapshot = snapshot
+        return snapshot
+
+    def _remove_outdated_files(self, username, password, local_root, remote_root, remote_snapshot=None):
+        """
+        Remove local files older than their remote counterpart, and temporary MEGA files. Remote files older than
+        their local counterpart are only removed by upload, which replaces them.
 
         Args:
             username (str): username for MEGA account
             password (str): password for MEGA account
             local_root (str): Local path to download file to
             remote_root (str): Remote path of file to download
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root. Remote root is listed if not given.
 
         Returns:
             Boolean: Whether operation was successful or not.
@@ -802,61 +1172,63 @@ class MegaManager(object):
         logger.debug(' Removing outdated files for username "{}"'.format(username))
 
         try:
-            lines = self.__mega_tools_lib.get_remote_file_data_recursively(username=username, password=password,
-                                                                           remote_path=remote_root, remove_blank_lines=True)
-            if lines:
-                for line in lines:
-                    logger.debug(' Processing line "%s"' % line)
-                    remote_file_type = self.__mega_tools_lib.get_file_type_from_megals_line_data(line=line)
-
-                    if remote_file_type == '0':
-                        remote_file_path = self.__mega_tools_lib.get_file_path_from_megals_line_data(line=line)
-                        remote_file_size = self.__mega_tools_lib.get_file_size_from_megals_line_data(line=line)
-                        remote_file_modified_date = self.__mega_tools_lib.get_file_date_from_megals_line_data(line=line)
-                        remote_file_modified_date_dt = datetime.strptime(remote_file_modified_date, '%Y-%m-%d %H:%M:%S')
-                        remote_root = path.abspath(remote_root)
-                        local_root = local_root
-                        conv_remote_file_path = path.abspath(remote_file_path)
-                        local_file_path = conv_remote_file_path.replace(remote_root, local_root)
-
-                        if path.exists(local_file_path):
-                            logger.debug(' Local file exists. Determining if local file outdated compared to remote counterpart: "%s"' % local_file_path)
-                            local_file_size = path.getsize(local_file_path)
-
-                            if search(r'^.*\.megatmp\..*$', local_file_path):
-                                logger.warning(' File "{}" is temporary file. Deleting.'.format(local_file_path))
-                                self.__lib.delete_local_file(local_file_path)
-                                continue
-
-                            local_file_modified_date = self.__lib.convert_epoch_to_mega_time(path.getmtime(local_file_path))
-                            local_file_modified_date_dt = datetime.strptime(local_file_modified_date, '%Y-%m-%d %H:%M:%S')
-
-                            if local_file_size != int(remote_file_size):
-                                if local_file_modified_date_dt > remote_file_modified_date_dt:
-                                    # local file is newer.
-                                    logger.debug(' Local file is newer. Deleting remote file "%s"' % remote_file_path)
-
-                                    self.__mega_tools_lib.remove_remote_path(username=username, password=password,
-                                                                             remote_file_path=remote_file_path,
-                                                                             process_priority_class=self.__megatools_process_priority_class,
-                                                                             process_set_priority_timeout=self.__process_set_priority_timeout)
-                                    logger.debug(' Success, removed local incomplete file "{}"'.format(local_file_path))
-
-                                else:
-                                    # remote file is newer
-                                    logger.debug(' Remote file is newer. Deleting local file "%s"' % local_file_path)
-
-                                    for retry in range(100):
-                                        try:
-                                            remove(local_file_path)
-                                            logger.debug(' Success, removed local incomplete file "{}"'.format(local_file_path))
-                                            break
-                                        except Exception as e:
-                                            logger.exception(' Remove failed for remote file, "{}" retrying...'.format(e))
-                        else:
-                            logger.debug(' Local file does NOT exist: "%s"' % local_file_path)
+            if not remote_snapshot:
+                remote_snapshot = self._get_remote_snapshot(username=username, password=password,
+                                                            remote_root=remote_root)
+            if remote_snapshot:
+                remote_root = path.abspath(remote_root)
+                for remote_file_path, remote_file_size, remote_file_mtime in remote_snapshot.iter_files():
+                    logger.debug(' Processing remote file "%s"' % remote_file_path)
+                    conv_remote_file_path = path.abspath(remote_file_path)
+                    local_file_path = conv_remote_file_path.replace(remote_root, local_root)
+
+                    local_file_stat = self._stat_local_file(file_path=local_file_path)
+                    if local_file_stat:
+                        logger.debug(' Local file exists. Determining if local file outdated compared to remote counterpart: "%s"' % local_file_path)
+                        local_file_size = local_file_stat.st_size
+
+                        if search(r'^.*\.megatmp\..*$', local_file_path):
+                            logger.warning(' File "{}" is temporary file. Deleting.'.format(local_file_path))
+                            self.__lib.delete_local_file(local_file_path)
+                            continue
+
+                        local_file_mtime = int(local_file_stat.st_mtime)
+
+                        if local_file_size != remote_file_size:
+                            if local_file_mtime > remote_file_mtime:
+                                # local file is newer. Outdated remote file is replaced by upload.
+                                logger.debug(' Local file is newer. Remote file is replaced on upload "%s"'
+                                             % remote_file_path)
+
+                            elif not remote_snapshot.verified:
+                                logger.debug(' Remote file may be newer, but remote snapshot is not verified yet. '
+                                             'Keeping local file "%s"' % local_file_path)
+
+                            else:
+                                # remote file is newer
+                                # Local index may not have seen an in-place edit yet, so file is checked on disk
+                                # before deleting it.
+                                try:
+                                    disk_file_stat = stat(local_file_path)
+                                except OSError:
+                                    continue
+                                if disk_file_stat.st_size == remote_file_size or \
+                                        int(disk_file_stat.st_mtime) > remote_file_mtime:
+                                    logger.debug(' Local file changed since it was indexed. Keeping local file "%s"'
+                                                 % local_file_path)
+                                    continue
+
+                                logger.debug(' Remote file is newer. Deleting local file "%s"' % local_file_path)
+
+                                for retry in range(100):
+                                    try:
+                                        remove(local_file_path)
+                                        logger.debug(' Success, removed local incomplete file "{}"'.format(local_file_path))
+                                        break
+                                    except Exception as e:
+                                        logger.exception(' Remove failed for remote file, "{}" retrying...'.format(e))
                     else:
-                        logger.debug(' Remote location is not a file: "{}"'.format(line))
+                        logger.debug(' Local file does NOT exist: "%s"' % local_file_path)
             else:
                 logger.debug(' No file list retrieved from MEGA for account "{}"'.format(username))
 
@@ -886,11 +1258,14 @@ class MegaManager(object):
                 local_path = pathMapping.local_path
                 remote_path = pathMapping.remote_path
                 self._remove_outdated_files(username=username, password=password, local_root=local_path,
-                                            remote_root=remote_path)
+                                            remote_root=remote_path,
+                                            remote_snapshot=self._get_verified_remote_snapshot(
+                                                profile=profile, path_mapping=pathMapping))
         except Exception as e:
             logger.error('Exception: {}'.format(e))
 
-    def _remove_remote_files_that_dont_exist_locally(self, username, password, local_root, remote_root):
+    def _remove_remote_files_that_dont_exist_locally(self, username, password, local_root, remote_root,
+                                                     remote_snapshot=None):
         """
         Remove remote files that don't exist locally.
 
@@ -899,6 +1274,8 @@ class MegaManager(object):
             password (str): Password of account to upload to
             local_root (str): Local path to download file to
             remote_root (str): Remote path of file to download
+            remote_snapshot (RemoteSnapshot): Snapshot of remote root. Remote root is listed if not given. Removed
+                paths are discarded from it.
 
         Returns:
             Boolean: Whether operation is successful or not.
@@ -907,17 +1284,21 @@ class MegaManager(object):
         logger.setLevel(self.__log_level)
         logger.debug(' Removing remote files that do not exist locally for account: "{}"'.format(username))
         dont_exist_locally = self._get_remote_files_that_dont_exist_locally(username=username, password=password,
-                                                                            local_root=local_root, remote_root=remote_root)
+                                                                            local_root=local_root, remote_root=remote_root,
+                                                                            remote_snapshot=remote_snapshot)
         try:
-            for file_path in dont_exist_locally:
-                file_md5_hash = self.__lib.get_file_md5_hash(file_path)
-                self.__removed_remote_files.add(file_md5_hash)
-                self.__mega_tools_lib.remove_remote_path(username=username, password=password,
-                                                         remote_file_path=file_path,
-                                                         process_priority_class=self.__megatools_process_priority_class,
-                                                         process_set_priority_timeout=self.__process_set_priority_timeout)
-                self.__lib.dump_set_into_numpy_file(item_set=self.__removed_remote_files,
-                                                    file_path=self.__removed_remote_files_path)
+            if dont_exist_locally:
+                removed_paths = self._get_storage_backend(username=username).remove_remote_paths(
+                    username=username, password=password, remote_file_paths=dont_exist_locally,
+                    process_priority_class=self.__megatools_process_priority_class,
+                    process_set_priority_timeout=self.__process_set_priority_timeout)
+                logger.debug(' Removed {} of {} remote files that do not exist locally.'.format(
+                    len(removed_paths), len(dont_exist_locally)))
+                if removed_paths:
+                    if remote_snapshot:
+                        remote_snapshot.discard_paths(removed_paths)
+                    self.__removed_remote_files.update(items=removed_paths)
+                    self.__removed_remote_files.flush()
             return True
 
         except Exception as e:
@@ -943,24 +1324,179 @@ class MegaManager(object):
             self.__lib = Lib(log_level=self.__log_level)
             self._setup_logger(log_file_path=self.__mega_manager_log_path)
 
-            self.__compress_images_lib = CompressImages_Lib(log_level=self.__log_level)
             self.__ffmpeg_lib = FFMPEG_Lib(log_file_path=self.__ffmpeg_log_path, log_level=self.__log_level)
-            self.__mega_tools_lib = MegaTools_Lib(log_file_path=self.__megatools_log_path, down_speed_limit=self.__mega_download_speed, up_speed_limit=self.__mega_upload_speed, log_level=self.__log_level)
-
-            self.__removed_remote_files = self.__lib.load_numpy_file_as_set(file_path=self.__removed_remote_files_path)
-            self.__compressed_video_files = self.__lib.load_numpy_file_as_set(file_path=self.__compressed_videos_file_path)
-            self.__unable_to_compress_video_files = self.__lib.load_numpy_file_as_set(
-                file_path=self.__unable_to_compress_videos_file_path)
-            self.__compressed_image_files = self.__lib.load_numpy_file_as_set(file_path=self.__compressed_images_file_path)
-            self.__unable_to_compress_image_files = self.__lib.load_numpy_file_as_set(
-                file_path=self.__unable_to_compress_images_file_path)
+            # Downloads run through download engine workers. Uploads of a cycle run one batch at a time.
+            self.__download_bandwidth = BandwidthAllocator(speed_limit=self.__mega_download_speed,
+                                                           concurrency=self.__mega_download_workers,
+                                                           log_level=self.__log_level)
+            self.__upload_bandwidth = BandwidthAllocator(speed_limit=self.__mega_upload_speed, concurrency=1,
+                                                         log_level=self.__log_level)
+            self.__mega_tools_lib = MegaTools_Lib(log_file_path=self.__megatools_log_path, down_speed_limit=self.__mega_download_speed, up_speed_limit=self.__mega_upload_speed, log_level=self.__log_level,
+                                                  remote_snapshot_ttl=self.__remote_snapshot_ttl_seconds,
+                                                  config_dir_path=self.__megatools_config_dir_path,
+                                                  cache_timeout=self.__megatools_cache_timeout_seconds,
+                                                  down_bandwidth=self.__download_bandwidth,
+                                                  up_bandwidth=self.__upload_bandwidth)
+            self._setup_storage_backends()
+            self.__download_engine = DownloadEngine(max_workers=self.__mega_download_workers,
+                                                    max_account_workers=self.__mega_account_download_workers,
+                                                    log_level=self.__log_level)
+            self._setup_transfer_queue()
+            self._setup_local_index()
+            self._setup_file_hasher()
+            self._setup_hash_cache()
+
+            self.__removed_remote_files = Ledger(file_path=self.__removed_remote_files_path, log_level=self.__log_level)
+            self.__compressed_video_files = DigestLedger(file_path=self.__compressed_videos_file_path,
+                                                         log_level=self.__log_level)
+            self.__unable_to_compress_video_files = DigestLedger(file_path=self.__unable_to_compress_videos_file_path,
+                                                                 log_level=self.__log_level)
+            self.__compressed_image_files = DigestLedger(file_path=self.__compressed_images_file_path,
+                                                         log_level=self.__log_level)
+            self.__unable_to_compress_image_files = DigestLedger(file_path=self.__unable_to_compress_images_file_path,
+                                                                 log_level=self.__log_level)
             self.__compression_video_extensions = [ext.lower() for ext in self.__compression_video_extensions]
             self.__compression_image_extensions = [ext.lower() for ext in self.__compression_image_extensions]
+            self._migrate_compression_ledgers()
+            self.__image_compression_engine = ImageCompressionEngine(
+                workers=self.__image_compression_workers,
+                jpeg_quality_percentage=self.__compression_jpeg_quality_percentage,
+                hash_algorithm=self.__file_hasher.algorithm, batch_size=self.__image_compression_batch_size,
+                target_bytes_per_megapixel=self.__compression_image_target_bytes_per_megapixel,
+                target_saving_percentage=self.__compression_image_target_saving_percentage,
+                min_jpeg_quality_percentage=self.__compression_jpeg_min_quality_percentage,
+                log_level=self.__log_level)
 
         except Exception as e:
             print(' Exception: ' + str(e))
             self._teardown()
 
+    def _setup_storage_backends(self):
+        """
+        Setup storage backend of each profile, as set by its "backend" config key:
+            "megatools" (default): megatools binaries.
+            "mega_api": native MEGA API, shared by all such profiles.
+            "local": local directory given by "backend_path" standing in for the remote. For benchmarking.
+        """
+        logger = getLogger('MegaManager._setup_storage_backends')
+        logger.setLevel(self.__log_level)
+
+        mega_api_lib = None
+        for profile in self.__sync_profiles:
+            storage_backend = self.__mega_tools_lib
+            if profile.backend == 'mega_api':
+                try:
+                    if not mega_api_lib:
+                        mega_api_lib = MegaApi_Lib(down_speed_limit=self.__mega_download_speed,
+                                                   up_speed_limit=self.__mega_upload_speed, log_level=self.__log_level,
+                                                   api_url=self.__mega_api_url,
+                                                   remote_snapshot_ttl=self.__remote_snapshot_ttl_seconds,
+                                                   down_bandwidth=self.__download_bandwidth,
+                                                   up_bandwidth=self.__upload_bandwidth)
+                    storage_backend = mega_api_lib
+                except ImportError as e:
+                    logger.error(' {} Using megatools backend instead.'.format(e))
+            elif profile.backend == 'local':
+                if profile.backend_path:
+                    storage_backend = LocalDirectoryBackend(root_dir_path=profile.backend_path,
+                                                            log_level=self.__log_level)
+                else:
+                    logger.error(' Profile "{}" has no "backend_path" set. Using megatools backend instead.'.format(
+                        profile.profile_name))
+            elif profile.backend != 'megatools':
+                logger.error(' Unknown backend "{}" for profile "{}". Using megatools backend instead.'.format(
+                    profile.backend, profile.profile_name))
+            self.__storage_backends[profile.account.username] = storage_backend
+
+    def _setup_transfer_queue(self):
+        """
+        Open durable transfer queue, set by "TRANSFER_QUEUE_PATH" config key, and recover transfers interrupted by
+        previous run. Transfers are not queued if it can not be opened.
+        """
+        logger = getLogger('MegaManager._setup_transfer_queue')
+        logger.setLevel(self.__log_level)
+
+        if not self.__transfer_queue_path:
+            self.__transfer_queue_path = path.join(self.__mega_manager_config_dir_data_path, 'transfer_queue.sqlite')
+        try:
+            self.__transfer_queue = TransferQueue(db_path=self.__transfer_queue_path, log_level=self.__log_level)
+            self.__transfer_queue.recover()
+        except Exception as e:
+            logger.error(' Could not open transfer queue "{}". Transferring without queue. Exception: {}'.format(
+                self.__transfer_queue_path, e))
+            self.__transfer_queue = None
+
+    def _setup_file_watcher(self):
+        """
+        Start watching local path of every path mapping for changes.
+        """
+        logger = getLogger('MegaManager._setup_file_watcher')
+        logger.setLevel(self.__log_level)
+
+        self.__file_watcher = FileWatcher(debounce_seconds=self.__watch_debounce_seconds,
+                                          poll_interval_seconds=self.__watch_poll_interval_seconds,
+                                          log_level=self.__log_level)
+        for profile in self.__sync_profiles:
+            for pathMapping in profile.path_mappings:
+                self.__file_watcher.watch(root_path=pathMapping.local_path,
+                                          dir_paths=self.__local_index.get_dirs(root_path=pathMapping.local_path))
+        logger.info(' Watching local paths for changes{}.'.format(
+            ' by polling' if self.__file_watcher.polling else ''))
+
+    def _setup_file_hasher(self):
+        """
+        Setup file hasher, as set by "HASH_ALGORITHM", "HASH_BUFFER_SIZE" and "HASH_WORKERS" config keys. Unsupported
+        algorithms fall back to md5.
+        """
+        logger = getLogger('MegaManager._setup_file_hasher')
+        logger.setLevel(self.__log_level)
+
+        try:
+            self.__file_hasher = FileHasher(algorithm=self.__hash_algorithm, buffer_size=self.__hash_buffer_size,
+                                            workers=self.__hash_workers, log_level=self.__log_level)
+        except ValueError as e:
+            logger.error(' {}. Using "{}" instead.'.format(e, HASH_ALGORITHM))
+            self.__file_hasher = FileHasher(algorithm=HASH_ALGORITHM, buffer_size=self.__hash_buffer_size,
+                                            workers=self.__hash_workers, log_level=self.__log_level)
+
+    def _setup_hash_cache(self):
+        """
+        Open persistent file hash cache, set by "HASH_CACHE_PATH" config key. Files are hashed every time they are
+        checked if it can not be opened.
+        """
+        logger = getLogger('MegaManager._setup_hash_cache')
+        logger.setLevel(self.__log_level)
+
+        if not self.__hash_cache_path:
+            self.__hash_cache_path = path.join(self.__mega_manager_config_dir_data_path, 'hash_cache.sqlite')
+        try:
+            self.__hash_cache = HashCache(db_path=self.__hash_cache_path, algorithm=self.__file_hasher.algorithm,
+                                          log_level=self.__log_level)
+        except Exception as e:
+            logger.error(' Could not open hash cache "{}". Hashing files every time instead. Exception: {}'.format(
+                self.__hash_cache_path, e))
+            self.__hash_cache = None
+
+    def _setup_local_index(self):
+        """
+        Open persistent local file index, set by "LOCAL_INDEX_PATH" config key. Local files are listed and stated on
+        disk if it can not be opened.
+        """
+        logger = getLogger('MegaManager._setup_local_index')
+        logger.setLevel(self.__log_level)
+
+        if not self.__local_index_path:
+            self.__local_index_path = path.join(self.__mega_manager_config_dir_data_path, 'local_index.sqlite')
+        try:
+            self.__local_index = LocalIndex(db_path=self.__local_index_path,
+                                            full_refresh_seconds=self.__local_index_full_refresh_seconds,
+                                            walker_workers=self.__local_walker_workers,
+                                            log_level=self.__log_level)
+        except Exception as e:
+            logger.error(' Could not open local index "{}". Listing local files on disk instead. Exception: {}'.format(
+                self.__local_index_path, e))
+            self.__local_index = None
+
     def _setup_logger(self, log_file_path):
         """
         Logger setup.
@@ -988,6 +1524,62 @@ class MegaManager(object):
         logger.setLevel(self.__log_level)
         logger.info(' Logging to %s' % self.__mega_manager_log_path)
 
+    def _stat_local_file(self, file_path):
+        """
+        Stat local file, from local index if there is one.
+
+        Args:
+            file_path (str): Local file path.
+
+        Returns:
+            os.stat_result: Stat of file, or None if it does not exist.
+        """
+        try:
+            return self.__local_index.stat(file_path) if self.__local_index else stat(file_path)
+        except OSError:
+            return None
+
+    def _run_event_cycle(self, changed_dir_paths):
+        """
+        Process local changes reported by file watcher between full sync cycles. Local index is refreshed for changed
+        directories only, then changed files are compressed and uploaded. Remote changes wait for next full cycle.
+
+        Args:
+            changed_dir_paths (set): Local directory paths whose entries changed.
+        """
+        logger = getLogger('MegaManager._run_event_cycle')
+        logger.setLevel(self.__log_level)
+
+        for profile in self.__sync_profiles:
+            for pathMapping in profile.path_mappings:
+                local_root = pathMapping.local_path
+                dir_paths = [dir_path for dir_path in changed_dir_paths
+                             if dir_path == local_root or dir_path.startswith(local_root.rstrip(sep) + sep)]
+                if not dir_paths:
+                    continue
+                try:
+                    if not self.__local_index.refresh(root_path=local_root, dir_paths=dir_paths):
+                        continue
+                    if self.__compress_all or self.__compress_images:
+                        # Compressed inline, so compressed rather than original images are uploaded.
+                        file_list, index_cursor = self._get_changed_local_files(root_path=local_root,
+                                                                                stage='compress_images')
+                        if file_list:
+                            self._compress_image_files(file_list=file_list, index_cursor=index_cursor)
+                            self.__local_index.refresh(root_path=local_root, dir_paths=dir_paths)
+                    if self.__compress_all or (self.__compress_videos and not self.__compress_images):
+                        # Video cursor only moves once a compression thread finishes, so a new thread would compress
+                        # the same videos again, sharing their temporary files.
+                        if self._is_video_compression_running():
+                            logger.debug(' Video compression still running. Changed videos are compressed once it '
+                                         'finishes.')
+                        else:
+                            self._create_threads_compress_changed_files(root_path=local_root, videos=True)
+                    if self.__sync:
+                        self._upload_changed_local_files(profile=profile, path_mapping=pathMapping)
+                except Exception as e:
+                    logger.warning(' Exception: {}'.format(e))
+
     def _teardown(self):
         """
         Tearing down of MEGA Manager.
@@ -998,22 +1590,32 @@ class MegaManager(object):
 
         logger.info(' Tearing down megaManager!')
         try:
-            if self.__sync:
-                self.__lib.dump_set_into_numpy_file(item_set=self.__removed_remote_files,
-                                                    file_path=self.__removed_remote_files_path, )
-            if self.__compress_images:
-                self.__lib.dump_set_into_numpy_file(item_set=self.__compressed_image_files,
-                                                    file_path=self.__compressed_images_file_path, )
-                self.__lib.dump_set_into_numpy_file(item_set=self.__unable_to_compress_image_files,
-                                                    file_path=self.__unable_to_compress_images_file_path)
-            if self.__compress_videos:
-                self.__lib.dump_set_into_numpy_file(item_set=self.__compressed_video_files,
-                                                    file_path=self.__compressed_videos_file_path, )
-                self.__lib.dump_set_into_numpy_file(item_set=self.__unable_to_compress_video_files,
-                                                    file_path=self.__unable_to_compress_videos_file_path)
+            for ledger in [self.__removed_remote_files, self.__compressed_image_files,
+                           self.__unable_to_compress_image_files, self.__compressed_video_files,
+                           self.__unable_to_compress_video_files]:
+                if isinstance(ledger, Ledger):
+                    ledger.close()
 
             # self._remove_temp_files()
 
+            if self.__download_engine:
+                self.__download_engine.close()
+            if self.__transfer_queue:
+                self.__transfer_queue.close()
+            if self.__file_watcher:
+                self.__file_watcher.close()
+            if self.__local_index:
+                self.__local_index.close()
+            if self.__hash_cache:
+                self.__hash_cache.close()
+            if self.__image_compression_engine:
+                self.__image_compression_engine.close()
+            for storage_backend in set(self.__storage_backends.values()) | {self.__mega_tools_lib}:
+                storage_backend.close()
+
+            megaget_process_name = 'megaget.exe' if system() == 'Windows' else 'megaget'
+            self.__lib.kill_running_processes_with_name(megaget_process_name)
+
             megacopy_process_name = 'megacopy.exe' if system() == 'Windows' else 'megacopy'
             self.__lib.kill_running_processes_with_name(megacopy_process_name)
             megals_process_name = 'megals.exe' if system() == 'Windows' else 'megals'
@@ -1046,12 +1648,52 @@ class MegaManager(object):
         logger = getLogger('MegaManager._thread_download_profile_files')
         logger.setLevel(self.__log_level)
 
+        username = profile.account.username
+        password = profile.account.password
+        storage_backend = self._get_storage_backend(username=username)
+        result = True
         for pathMapping in profile.path_mappings:
-            self.__mega_tools_lib.download_all_files_from_account(username=profile.account.username,
-                                                                password=profile.account.password,
-                                                                local_root=pathMapping.local_path,
+            remote_snapshot = pathMapping.remote_snapshot
+            if not remote_snapshot:
+                remote_snapshot = self._get_remote_snapshot(username=username, password=password,
+                                                            remote_root=pathMapping.remote_path)
+            if not remote_snapshot:
+                logger.warning(' No remote snapshot of "{}". Downloading whole remote root instead.'.format(
+                    pathMapping.remote_path))
+                result = storage_backend.download_all_files_from_account(username=username, password=password,
+                                                                         local_root=pathMapping.local_path,
+                                                                         remote_root=pathMapping.remote_path,
+                                                                         process_set_priority_timeout=self.__process_set_priority_timeout) and result
+                continue
+
+            try:
+                local_dirs, tasks = self.__download_engine.plan(local_root=pathMapping.local_path,
                                                                 remote_root=pathMapping.remote_path,
-                                                                process_set_priority_timeout=self.__process_set_priority_timeout)
+                                                                remote_snapshot=remote_snapshot,
+                                                                local_index=self.__local_index)
+                for local_dir in local_dirs:
+                    makedirs(local_dir, exist_ok=True)
+                if self.__transfer_queue:
+                    self.__transfer_queue.enqueue(direction=TRANSFER_DOWNLOAD, username=username,
+                                                  remote_root=pathMapping.remote_path,
+                                                  items=[(task.local_path, task.remote_path, task.size, task.mtime,
+                                                          task.replace_local) for task in tasks],
+                                                  weight=profile.priority_weight)
+                    continue
+                failed_tasks = self.__download_engine.download(backend=storage_backend, username=username,
+                                                               password=password, tasks=tasks)
+                if failed_tasks:
+                    logger.warning(' Could not download {} files of "{}".'.format(len(failed_tasks),
+                                                                                pathMapping.remote_path))
+                    result = False
+            except Exception as e:
+                logger.warning(' Exception: {}'.format(e))
+                result = False
+
+        if self.__transfer_queue:
+            result = self._download_queued_files(username=username, password=password,
+                                                 storage_backend=storage_backend) and result
+        return result
 
     def _thread_output_profile_data(self, profile):
         """
@@ -1100,9 +1742,12 @@ class MegaManager(object):
             remote_root = path_mapping.remote_path
             username = profile.account.username
             password = profile.account.password
-            self._remove_outdated_files(username=username, password=password, local_root=local_root, remote_root=remote_root)
+            remote_snapshot = self._get_verified_remote_snapshot(profile=profile, path_mapping=path_mapping)
+            self._remove_outdated_files(username=username, password=password, local_root=local_root, remote_root=remote_root,
+                                        remote_snapshot=remote_snapshot)
             self._remove_remote_files_that_dont_exist_locally(username=username, password=password, local_root=local_root,
-                                                              remote_root=remote_root)
+                                                              remote_root=remote_root,
+                                                              remote_snapshot=remote_snapshot)
     def _thread_upload_profile_files(self, profile):
         """
         Upload to all MEGA profile accounts.
@@ -1119,11 +1764,18 @@ class MegaManager(object):
 
         try:
             for pathMapping in profile.path_mappings:
-                self.__mega_tools_lib.upload_to_account(username=profile.account.username, password=profile.account.password,
-                                                        local_root=pathMapping.local_path,
-                                                        remote_root=pathMapping.remote_path,
-                                                        process_priority_class=self.__megatools_process_priority_class,
-                                                        process_set_priority_timeout=self.__process_set_priority_timeout)
+                index_cycle = self.__local_index.cycle if self.__local_index else None
+                uploaded = self._get_storage_backend(username=profile.account.username).upload_to_account(username=profile.account.username, password=profile.account.password,
+                                                                                               local_root=pathMapping.local_path,
+                                                                                               remote_root=pathMapping.remote_path,
+                                                                                               process_priority_class=self.__megatools_process_priority_class,
+                                                                                               process_set_priority_timeout=self.__process_set_priority_timeout,
+                                                                                               remote_snapshot=self._get_verified_remote_snapshot(profile=profile, path_mapping=pathMapping),
+                                                                                               transfer_queue=self.__transfer_queue,
+                                                                                               priority_weight=profile.priority_weight,
+                                                                                               local_index=self.__local_index)
+                if uploaded and index_cycle is not None:
+                    self.__local_index.set_cursor(name='upload:{}'.format(pathMapping.local_path), cycle=index_cycle)
         except Exception as e:
             logger.warning(' Exception: {}'.format(e))
 
@@ -1142,9 +1794,10 @@ class MegaManager(object):
         logger.setLevel(self.__log_level)
         username = account.username
         password = account.password
-        account.total_space = self.__mega_tools_lib.get_account_total_space(username=username, password=password)
-        account.free_space = self.__mega_tools_lib.get_account_free_space(username=username, password=password)
-        account.used_space = self.__mega_tools_lib.get_account_used_space(username=username, password=password)
+        storage_backend = self._get_storage_backend(username=username)
+        account.total_space = storage_backend.get_account_total_space(username=username, password=password)
+        account.free_space = storage_backend.get_account_free_space(username=username, password=password)
+        account.used_space = storage_backend.get_account_used_space(username=username, password=password)
         return account
 
     def _update_profile_remote_details(self, profile):
@@ -1166,20 +1819,118 @@ class MegaManager(object):
         totalRemoteSize = 0
 
         for pathMapping in profile.path_mappings:
-            remotePath = pathMapping.remotepath
-            remotePaths = self.__mega_tools_lib.get_remote_file_paths_recursively(username=username, password=password,
-                                                                                  remote_path=remotePath,
-                                                                                  process_priority_class=self.__megatools_process_priority_class,
-                                                                                  process_set_priority_timeout=self.__process_set_priority_timeout)
+            remotePath = pathMapping.remote_path
+            remote_snapshot = self._get_storage_backend(username=username).get_remote_snapshot(username=username, password=password,
+                                                                                               remote_path=remotePath,
+                                                                                               process_priority_class=self.__megatools_process_priority_class,
+                                                                                               process_set_priority_timeout=self.__process_set_priority_timeout,
+                                                                                               max_age=self.__remote_snapshot_ttl_seconds)
 
-            pathMappingRemoteSize = 0
-            for path in remotePaths:
-                pathMappingRemoteSize += self.__mega_tools_lib.get_remote_file_size(username=username, password=password, remotePath=path)
+            pathMappingRemoteSize = remote_snapshot.get_total_size() if remote_snapshot else 0
 
             pathMapping.remote_path_used_space = pathMappingRemoteSize
             totalRemoteSize += pathMappingRemoteSize
         return profile
 
+    def _update_profile_remote_snapshots(self, profile):
+        """
+        Refresh remote snapshots of all path mappings of profile. Done once per sync cycle so that all remote
+        consumers share the same listing.
+        On the first cycle after a restart the persisted remote manifest is used as is, if present and younger than
+        "REMOTE_MANIFEST_TTL_SECONDS". It is not verified, so stages that delete or replace files list the remote root
+        first, see _get_verified_remote_snapshot. On later cycles the remote root is listed, and the manifest is only
+        rewritten when the listing changed.
+
+        Args:
+            profile (SyncProfile): profile object to refresh remote snapshots for.
+
+        Returns:
+            SyncProfile: profile object with remote snapshots updated
+        """
+        logger = getLogger('MegaManager._update_profile_remote_snapshots')
+        logger.setLevel(self.__log_level)
+        logger.debug(' Updating remote snapshots for profile "{}".'.format(profile.profile_name))
+
+        for pathMapping in profile.path_mappings:
+            if pathMapping.remote_snapshot is None:
+                manifest_path = self._get_remote_manifest_path(profile=profile, path_mapping=pathMapping)
+                manifest_snapshot = RemoteSnapshot.from_manifest(manifest_path=manifest_path, log_level=self.__log_level)
+                if manifest_snapshot and manifest_snapshot.age <= self.__remote_manifest_ttl_seconds:
+                    logger.debug(' Using persisted remote manifest for "{}" ({:.0f} seconds old).'.format(
+                        pathMapping.remote_path, manifest_snapshot.age))
+                    pathMapping.remote_snapshot = manifest_snapshot
+                    continue
+                if manifest_snapshot:
+                    logger.debug(' Persisted remote manifest for "{}" is too old ({:.0f} seconds). Listing remote '
+                                 'root.'.format(pathMapping.remote_path, manifest_snapshot.age))
+                    # Only kept to diff against the listing.
+                    pathMapping.remote_snapshot = manifest_snapshot
+            with self.__remote_snapshot_lock:
+                if not self._refresh_remote_snapshot(profile=profile, path_mapping=pathMapping) and \
+                        pathMapping.remote_snapshot and not pathMapping.remote_snapshot.verified:
+                    pathMapping.remote_snapshot = None
+        return profile
+
+    def _upload_changed_local_files(self, profile, path_mapping):
+        """
+        Upload local files of path mapping that changed since they were last uploaded.
+
+        Args:
+            profile (SyncProfile): Profile of path mapping.
+            path_mapping (PathMapping): Path mapping to upload.
+
+        Returns:
+            Boolean: Whether successful or not.
+        """
+        logger = getLogger('MegaManager._upload_changed_local_files')
+        logger.setLevel(self.__log_level)
+
+        if not path_mapping.remote_snapshot:
+            logger.debug(' No remote snapshot of "{}" yet. Uploading on next full cycle.'.format(
+                path_mapping.remote_path))
+            return False
+        cursor_name = 'upload:{}'.format(path_mapping.local_path)
+        index_cycle = self.__local_index.cycle
+        changed_files = self.__local_index.get_changed_files(root_path=path_mapping.local_path,
+                                                             since_cycle=self.__local_index.get_cursor(name=cursor_name))
+        if not changed_files:
+            return True
+        logger.debug(' Uploading {} changed files of "{}".'.format(len(changed_files), path_mapping.local_path))
+        username = profile.account.username
+        uploaded = self._get_storage_backend(username=username).upload_changed_files(
+            username=username, password=profile.account.password, local_root=path_mapping.local_path,
+            remote_root=path_mapping.remote_path, local_file_paths=changed_files,
+            remote_snapshot=self._get_verified_remote_snapshot(profile=profile, path_mapping=path_mapping),
+            transfer_queue=self.__transfer_queue, priority_weight=profile.priority_weight, local_index=self.__local_index,
+            process_priority_class=self.__megatools_process_priority_class,
+            process_set_priority_timeout=self.__process_set_priority_timeout)
+        if uploaded:
+            self.__local_index.set_cursor(name=cursor_name, cycle=index_cycle)
+        return uploaded
+
+    def _wait_for_next_cycle(self):
+        """
+        Wait before next full sync cycle. With "WATCH_LOCAL_CHANGES" set, local changes are picked up by file watcher
+        meanwhile, and compressed and uploaded within seconds.
+        """
+        logger = getLogger('MegaManager._wait_for_next_cycle')
+        logger.setLevel(self.__log_level)
+
+        if not self.__watch_local_changes or not self.__local_index:
+            logger.debug(' Sleeping {} seconds before next run.'.format(self.__sleep_time_between_runs_seconds))
+            sleep(self.__sleep_time_between_runs_seconds)
+            return
+
+        if not self.__file_watcher:
+            self._setup_file_watcher()
+        logger.debug(' Watching for local changes {} seconds before next run.'.format(
+            self.__sleep_time_between_runs_seconds))
+        deadline = time() + self.__sleep_time_between_runs_seconds
+        while time() < deadline:
+            changed_dir_paths = self.__file_watcher.wait_for_changes(timeout=deadline - time())
+            if changed_dir_paths:
+                self._run_event_cycle(changed_dir_paths=changed_dir_paths)
+
     def _wait_for_threads_to_finish(self, threads=None, timeout=None, max_video_compression_threads=None):
         """
         Wait for threads to finish.
@@ -1256,19 +2007,17 @@ class MegaManager(object):
                             logger.warning(f' Waiting for path mapping to exist. Attempt {attempt}: {pathMapping.local_path}')
                             sleep(PATH_MAPPING_TIMEOUT_SECONDS)
                         logger.warning(f' Path mapping exists: {pathMapping.local_path}')
+                        if self.__local_index:
+                            self.__local_index.refresh(root_path=pathMapping.local_path)
                         if self.__compress_all:
-                            file_list = self._get_all_files(root_path=pathMapping.local_path)
-                            shuffle(file_list)
-                            self._create_thread_compress_image_files(file_list=file_list)
-                            self._create_thread_compress_video_files(file_list=file_list)
+                            self._create_threads_compress_changed_files(root_path=pathMapping.local_path,
+                                                                        images=True, videos=True)
                         elif self.__compress_images:
-                            file_list = self._get_all_files(root_path=pathMapping.local_path)
-                            shuffle(file_list)
-                            self._create_thread_compress_image_files(file_list=file_list)
+                            self._create_threads_compress_changed_files(root_path=pathMapping.local_path,
+                                                                        images=True)
                         elif self.__compress_videos:
-                            file_list = self._get_all_files(root_path=pathMapping.local_path)
-                            shuffle(file_list)
-                            self._create_thread_compress_video_files(file_list=file_list)
+                            self._create_threads_compress_changed_files(root_path=pathMapping.local_path,
+                                                                        videos=True)
                         self._wait_for_threads_to_finish(threads=self.__threads,
                                                      max_video_compression_threads=self.__max_video_compression_threads)
                 compression_threads = list(self.__threads)
@@ -1277,6 +2026,7 @@ class MegaManager(object):
                         self._create_thread_output_profile_data(profile=profile)
 
                     if self.__sync:
+                        self._update_profile_remote_snapshots(profile=profile)
                         if self.__local_is_truth:
                             self._thread_remove_remote_files_that_dont_exist_locally(profile=profile)
                         else:
@@ -1288,8 +2038,7 @@ class MegaManager(object):
                     self._wait_for_threads_to_finish(threads=profile_threads)
 
                 self._wait_for_threads_to_finish()
-                logger.debug(' Sleeping {} seconds before next run.'.format(self.__sleep_time_between_runs_seconds))
-                sleep(self.__sleep_time_between_runs_seconds)
+                self._wait_for_next_cycle()
 
         except Exception as e:
             logger.exception(' Exception: ' + str(e))
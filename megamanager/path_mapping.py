@@ -28,6 +28,7 @@ class PathMapping(Account):
         self.__local_path_free_space = None
         self.__local_path_used_space = None
         self.__remote_path_used_space = None
+        self.__remote_snapshot = None
 
     @property
     def local_path(self):
@@ -151,3 +152,27 @@ class PathMapping(Account):
         logger.setLevel(self.__log_level)
         self.__remote_path_used_space = value
 
+    @property
+    def remote_snapshot(self):
+        """
+        Getter for remote snapshot of remote path. Refreshed once per sync cycle.
+
+        Returns:
+            RemoteSnapshot: Returns remote snapshot
+        """
+        logger = getLogger('SyncProfile.remote_snapshot')
+        logger.setLevel(self.__log_level)
+        return self.__remote_snapshot
+
+    @remote_snapshot.setter
+    def remote_snapshot(self, value):
+        """
+        Setter for remote snapshot of remote path.
+
+        Args:
+            value (RemoteSnapshot): value to set remote snapshot to.
+        """
+        logger = getLogger('SyncProfile.remote_snapshot')
+        logger.setLevel(self.__log_level)
+        self.__remote_snapshot = value
+
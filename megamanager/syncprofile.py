@@ -13,7 +13,8 @@ __author__ = 'szmania'
 
 
 class SyncProfile(object):
-    def __init__(self, username, password, path_mappings, profile_name=None, log_level='DEBUG'):
+    def __init__(self, username, password, path_mappings, profile_name=None, log_level='DEBUG', backend=None,
+                 backend_path=None, priority_weight=None):
         """
         Library for ffmpeg converter and encoder interaction.
 
@@ -23,6 +24,9 @@ class SyncProfile(object):
             path_mappings (list): dictionary of local and remote path mappings.
             profile_name (str): Unique profile name
             log_level (str): Logging level setting ie: "DEBUG" or "WARN"
+            backend (str): Storage backend of profile. ie: "megatools", "mega_api" or "local"
+            backend_path (str): Local directory standing in for remote, for "local" storage backend.
+            priority_weight (float): Weight of profile transfers in transfer queue. Higher is served first.
         """
 
 
@@ -31,6 +35,9 @@ class SyncProfile(object):
         self.__log_level = log_level
         self.__local_used_space = None
         self.__account = Account(username=username, password=password, log_level=log_level)
+        self.__backend = backend if backend else 'megatools'
+        self.__backend_path = backend_path if backend_path else None
+        self.__priority_weight = float(priority_weight) if priority_weight else 1.0
 
     @property
     def account(self):
@@ -56,6 +63,78 @@ class SyncProfile(object):
         logger.setLevel(self.__log_level)
         self.__account = value
 
+    @property
+    def backend(self):
+        """
+        Getter for MEGA profile storage backend.
+
+        Returns:
+            String: Returns MEGA profile storage backend. ie: "megatools", "mega_api" or "local"
+        """
+        logger = getLogger('SyncProfile.backend')
+        logger.setLevel(self.__log_level)
+        return self.__backend
+
+    @backend.setter
+    def backend(self, value):
+        """
+        Setter for MEGA profile storage backend.
+
+        Args:
+            value (str): value to set profile storage backend to.
+        """
+        logger = getLogger('SyncProfile.backend')
+        logger.setLevel(self.__log_level)
+        self.__backend = value
+
+    @property
+    def backend_path(self):
+        """
+        Getter for MEGA profile local storage backend directory.
+
+        Returns:
+            String: Returns local directory standing in for remote
+        """
+        logger = getLogger('SyncProfile.backend_path')
+        logger.setLevel(self.__log_level)
+        return self.__backend_path
+
+    @backend_path.setter
+    def backend_path(self, value):
+        """
+        Setter for MEGA profile local storage backend directory.
+
+        Args:
+            value (str): value to set local storage backend directory to.
+        """
+        logger = getLogger('SyncProfile.backend_path')
+        logger.setLevel(self.__log_level)
+        self.__backend_path = value
+
+    @property
+    def priority_weight(self):
+        """
+        Getter for MEGA profile transfer priority weight.
+
+        Returns:
+            Float: Returns weight of profile transfers in transfer queue. Higher is served first.
+        """
+        logger = getLogger('SyncProfile.priority_weight')
+        logger.setLevel(self.__log_level)
+        return self.__priority_weight
+
+    @priority_weight.setter
+    def priority_weight(self, value):
+        """
+        Setter for MEGA profile transfer priority weight.
+
+        Args:
+            value (float): value to set transfer priority weight to.
+        """
+        logger = getLogger('SyncProfile.priority_weight')
+        logger.setLevel(self.__log_level)
+        self.__priority_weight = value
+
     @property
     def local_used_space(self):
         """
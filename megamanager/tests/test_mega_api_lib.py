@@ -0,0 +1,111 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Round trip test of MegaApi_Lib against the in-memory MEGA API stub server.
+#
+# Usage, from megamanager directory:
+#     python -m unittest discover -s tests
+###
+
+import os
+import sys
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.mega_api_lib import MEGA_API_TRANSFER_REQUEST_SIZE, MegaApi_Lib  # noqa: E402
+from tools.mega_api_stub_server import MegaApiStubServer  # noqa: E402
+
+__author__ = 'szmania'
+
+USERNAME = 'User@Example.com'
+PASSWORD = 'secret'
+REMOTE_DIR = '/Root/backup/pictures'
+
+
+class MegaApiLibRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MegaApiStubServer(username=USERNAME, password=PASSWORD).start()
+        self.mega_api_lib = MegaApi_Lib(log_level='ERROR', api_url=self.server.api_url)
+        self.temp_dir = mkdtemp()
+        self.local_files = {}
+        # Empty, small and multi request files, to cover every transfer request layout.
+        for name, size in (('empty.txt', 0), ('small.jpg', 1000),
+                           ('large.mp4', MEGA_API_TRANSFER_REQUEST_SIZE + 12345)):
+            local_file_path = os.path.join(self.temp_dir, 'upload', name)
+            os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+            with open(local_file_path, 'wb') as local_file:
+                local_file.write(os.urandom(size))
+            self.local_files[name] = local_file_path
+
+    def tearDown(self):
+        self.mega_api_lib.close()
+        self.server.stop()
+        rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        self.assertTrue(self.mega_api_lib.create_remote_dir(username=USERNAME, password=PASSWORD,
+                                                            remote_path=REMOTE_DIR))
+        self.assertTrue(self.mega_api_lib.upload_to_account(username=USERNAME, password=PASSWORD,
+                                                            local_root=os.path.join(self.temp_dir, 'upload'),
+                                                            remote_root=REMOTE_DIR))
+
+        snapshot = self.mega_api_lib.get_remote_snapshot(username=USERNAME, password=PASSWORD,
+                                                         remote_path='/Root/backup')
+        self.assertIsNotNone(snapshot)
+        for name, local_file_path in self.local_files.items():
+            entry = snapshot.get_entry('%s/%s' % (REMOTE_DIR, name))
+            self.assertIsNotNone(entry)
+            self.assertEqual(entry[3], os.path.getsize(local_file_path))
+
+        for name, local_file_path in self.local_files.items():
+            download_file_path = os.path.join(self.temp_dir, 'download', name)
+            self.assertTrue(self.mega_api_lib.download_file(username=USERNAME, password=PASSWORD,
+                                                            localFilePath=download_file_path,
+                                                            remoteFilePath='%s/%s' % (REMOTE_DIR, name)))
+            with open(local_file_path, 'rb') as local_file, open(download_file_path, 'rb') as download_file:
+                self.assertEqual(local_file.read(), download_file.read())
+
+        used_space = sum(os.path.getsize(local_file_path) for local_file_path in self.local_files.values())
+        self.assertEqual(self.mega_api_lib.get_account_used_space(username=USERNAME, password=PASSWORD),
+                         '%.2f GiB' % (used_space / 1024.0 ** 3))
+
+        for name in self.local_files:
+            self.assertTrue(self.mega_api_lib.remove_remote_path(username=USERNAME, password=PASSWORD,
+                                                                 remote_file_path='%s/%s' % (REMOTE_DIR, name)))
+        self.assertFalse(self.mega_api_lib.remove_remote_path(username=USERNAME, password=PASSWORD,
+                                                              remote_file_path='%s/missing.txt' % REMOTE_DIR))
+
+        snapshot = self.mega_api_lib.get_remote_snapshot(username=USERNAME, password=PASSWORD,
+                                                         remote_path='/Root/backup', max_age=0)
+        self.assertEqual(snapshot.get_paths(), ['/Root/backup', REMOTE_DIR])
+
+    def test_reupload_same_name(self):
+        local_file_path = self.local_files['small.jpg']
+        for content in (b'old', b'new'):
+            with open(local_file_path, 'wb') as local_file:
+                local_file.write(content)
+            self.assertEqual(self.mega_api_lib.upload_files(username=USERNAME, password=PASSWORD,
+                                                            local_file_paths=[local_file_path],
+                                                            remote_dir_path=REMOTE_DIR), [local_file_path])
+
+        download_file_path = os.path.join(self.temp_dir, 'download', 'small.jpg')
+        self.assertTrue(self.mega_api_lib.download_file(username=USERNAME, password=PASSWORD,
+                                                        localFilePath=download_file_path,
+                                                        remoteFilePath='%s/small.jpg' % REMOTE_DIR))
+        with open(download_file_path, 'rb') as download_file:
+            self.assertEqual(download_file.read(), b'new')
+
+    def test_wrong_password(self):
+        self.assertFalse(self.mega_api_lib.create_remote_dir(username=USERNAME, password='wrong',
+                                                             remote_path=REMOTE_DIR))
+        self.assertFalse(self.mega_api_lib.upload_to_account(username=USERNAME, password='wrong',
+                                                             local_root=os.path.join(self.temp_dir, 'upload'),
+                                                             remote_root=REMOTE_DIR))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Benchmark of FileHasher settings against Lib.get_file_md5_hash, on synthetic files or an existing directory.
+#
+# Usage, from megamanager directory:
+#     python tools/hash_benchmark.py --files 200 --size-mb 4
+#     python tools/hash_benchmark.py --path /mnt/nas/pictures --algorithms md5 blake2b --workers 1 4 8
+###
+
+import os
+import sys
+from argparse import ArgumentParser
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.file_hasher_lib import FileHasher  # noqa: E402
+from libs.lib import Lib  # noqa: E402
+from libs.parallel_walker_lib import ParallelWalker  # noqa: E402
+
+__author__ = 'szmania'
+
+
+def create_files(dir_path, files, size_mb):
+    """
+    Create files of random content.
+
+    Args:
+        dir_path (str): Directory to create files in.
+        files (int): Number of files.
+        size_mb (float): Size of each file in MB.
+
+    Returns:
+        List: File paths.
+    """
+    block = os.urandom(1000000)
+    file_paths = []
+    for file_number in range(files):
+        file_path = os.path.join(dir_path, 'file_%d.jpg' % file_number)
+        with open(file_path, 'wb') as f:
+            remaining = int(size_mb * 1000000)
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def time_hash(hash_files, file_paths, repeat):
+    """
+    Time hashing of files, keeping best of repeat runs.
+
+    Args:
+        hash_files (function): Called with file paths, hashing all of them.
+        file_paths (list): File paths.
+        repeat (int): Number of runs.
+
+    Returns:
+        Float: Best time in seconds.
+    """
+    best_seconds = None
+    for run in range(repeat):
+        start_time = perf_counter()
+        hash_files(file_paths)
+        seconds = perf_counter() - start_time
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    return best_seconds
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark FileHasher settings against Lib.get_file_md5_hash.')
+    parser.add_argument('--path', help='Existing directory whose files are hashed. Synthetic files if not given.')
+    parser.add_argument('--files', type=int, default=100, help='Number of synthetic files.')
+    parser.add_argument('--size-mb', type=float, default=4, help='Size of each synthetic file in MB.')
+    parser.add_argument('--algorithms', nargs='+', default=['md5', 'blake2b'], help='Hash algorithms to time.')
+    parser.add_argument('--buffer-kb', type=int, nargs='+', default=[64, 1024], help='Read buffer sizes to time.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8], help='Worker counts to time.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per setting. Best time is kept.')
+    args = parser.parse_args()
+
+    temp_dir_path = None
+    if args.path:
+        file_paths = [entry.path for entry in ParallelWalker(log_level='ERROR').iter_files(root_path=args.path)]
+    else:
+        temp_dir_path = mkdtemp(prefix='hash_benchmark_')
+        file_paths = create_files(dir_path=temp_dir_path, files=args.files, size_mb=args.size_mb)
+    total_mb = sum(os.path.getsize(file_path) for file_path in file_paths) / 1000000
+    print('{} files, {:.1f} MB. Files are read from page cache after the first run, unless larger than memory.'.format(
+        len(file_paths), total_mb))
+
+    try:
+        lib = Lib(log_level='ERROR')
+        seconds = time_hash(hash_files=lambda paths: [lib.get_file_md5_hash(file_path) for file_path in paths],
+                            file_paths=file_paths, repeat=args.repeat)
+        print('{:<36}{:>10.3f} s{:>10.1f} MB/s'.format('Lib.get_file_md5_hash', seconds, total_mb / seconds))
+        for algorithm in args.algorithms:
+            for buffer_kb in args.buffer_kb:
+                for workers in args.workers:
+                    hasher = FileHasher(algorithm=algorithm, buffer_size=buffer_kb * 1024, workers=workers,
+                                        log_level='ERROR')
+                    seconds = time_hash(hash_files=lambda paths: list(hasher.hash_files(file_paths=paths)),
+                                        file_paths=file_paths, repeat=args.repeat)
+                    name = '{} {} KB x{}'.format(algorithm, buffer_kb, workers)
+                    print('{:<36}{:>10.3f} s{:>10.1f} MB/s'.format(name, seconds, total_mb / seconds))
+    finally:
+        if temp_dir_path:
+            rmtree(temp_dir_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# In-memory stub of the MEGA API, for testing MegaApi_Lib without a MEGA account. Serves the commands MegaApiSession
+# sends (us0, us, ug, f, uq, u, p, g, d), plus the upload and download URLs handed out by "u" and "g".
+#
+# Usage, from megamanager directory:
+#     python tools/mega_api_stub_server.py --port 8080 --username user@example.com --password secret
+###
+
+import os
+import sys
+from argparse import ArgumentParser
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import pbkdf2_hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Lock, Thread
+from time import time
+from urllib.parse import urlsplit
+
+from Crypto.Cipher import AES
+
+__author__ = 'szmania'
+
+STUB_ERROR_ARGS = -2
+STUB_ERROR_NOT_FOUND = -9
+STUB_NODE_FILE = 0
+STUB_NODE_DIR = 1
+STUB_NODE_ROOT = 2
+STUB_NODE_RUBBISH = 4
+STUB_STORAGE_TOTAL = 50 * 1024 ** 3
+
+
+def _base64_url_decode(data):
+    """
+    Decode MEGA flavoured base64, which is URL safe and unpadded.
+
+    Args:
+        data (str): Data to decode.
+
+    Returns:
+        Bytes: Decoded data.
+    """
+    return urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _base64_url_encode(data):
+    """
+    Encode data as MEGA flavoured base64, which is URL safe and unpadded.
+
+    Args:
+        data (bytes): Data to encode.
+
+    Returns:
+        str: Encoded data.
+    """
+    return urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+class MegaApiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, body, status=200):
+        """
+        Send response, keeping connection alive.
+
+        Args:
+            body (object): Response body. Bytes are sent as is, anything else as JSON.
+            status (int): HTTP status code.
+        """
+        if not isinstance(body, bytes):
+            body = dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """
+        Serve byte range of stored file, at download URL handed out by "g" command. ie: "/dl/<handle>/0-1023"
+        """
+        parts = urlsplit(self.path).path.strip('/').split('/')
+        data = self.server.get_file_range(*parts[1:]) if len(parts) == 3 and parts[0] == 'dl' else None
+        self._reply(data if data is not None else b'', status=200 if data is not None else 404)
+
+    def do_POST(self):
+        """
+        Serve API command batch at "/cs", or upload chunk at upload URL handed out by "u" command.
+        ie: "/ul/<upload id>/<offset>"
+        """
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        parts = urlsplit(self.path).path.strip('/').split('/')
+        if parts == ['cs']:
+            self._reply([self.server.handle_command(command=command) for command in loads(body)])
+        elif len(parts) == 3 and parts[0] == 'ul':
+            self._reply(self.server.add_upload_chunk(upload_id=parts[1], offset=int(parts[2]), data=body))
+        else:
+            self._reply(STUB_ERROR_ARGS, status=404)
+
+    def log_message(self, format, *args):
+        """
+        Silence per request logging.
+        """
+        pass
+
+
+class MegaApiStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, username, password, host='127.0.0.1', port=0):
+        """
+        In-memory stub of the MEGA API, holding a single account. Files are stored unencrypted as uploaded, so stored
+        data is ciphertext the client can decrypt again.
+
+        Args:
+            username (str): username of account.
+            password (str): password of account.
+            host (str): Host to listen on.
+            port (int): Port to listen on. 0 picks a free port.
+        """
+        super(MegaApiStubServer, self).__init__((host, port), MegaApiStubHandler)
+        self.__username = username.lower()
+        self.__salt = os.urandom(32)
+        derived_key = pbkdf2_hmac('sha512', password.encode('utf-8'), self.__salt, 100000, 32)
+        self.__password_key = derived_key[:16]
+        self.__user_hash = _base64_url_encode(derived_key[16:])
+        self.__master_key = os.urandom(16)
+        self.__user_handle = 'STUBUSER'
+        self.__lock = Lock()
+        self.__counter = 0
+        self.__nodes = [{'h': 'STUBROOT', 'p': '', 't': STUB_NODE_ROOT, 'ts': int(time())},
+                        {'h': 'STUBRUBB', 'p': '', 't': STUB_NODE_RUBBISH, 'ts': int(time())}]
+        self.__files = {}
+        self.__uploads = {}
+        self.__thread = None
+
+    @property
+    def api_url(self):
+        """
+        Getter for API URL to hand to MegaApi_Lib.
+
+        Returns:
+            str: Returns API URL. ie: "http://127.0.0.1:8080"
+        """
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def _new_handle(self):
+        """
+        Get new unique node handle.
+
+        Returns:
+            str: Returns handle.
+        """
+        self.__counter += 1
+        return 'H%07d' % self.__counter
+
+    def _remove_node(self, handle):
+        """
+        Remove node and all its descendants.
+
+        Args:
+            handle (str): Handle of node to remove.
+
+        Returns:
+            Int: 0 if removed, or error code if node does not exist.
+        """
+        if not any(node['h'] == handle for node in self.__nodes):
+            return STUB_ERROR_NOT_FOUND
+        removed = {handle}
+        pending = [handle]
+        while pending:
+            parent = pending.pop()
+            for node in self.__nodes:
+                if node['p'] == parent and node['h'] not in removed:
+                    removed.add(node['h'])
+                    pending.append(node['h'])
+        self.__nodes = [node for node in self.__nodes if node['h'] not in removed]
+        for removed_handle in removed:
+            self.__files.pop(removed_handle, None)
+        return 0
+
+    def add_upload_chunk(self, upload_id, offset, data):
+        """
+        Store uploaded chunk. Once whole file is uploaded, it is stored under a new completion handle.
+
+        Args:
+            upload_id (str): Upload ID of upload URL.
+            offset (int): Offset of chunk in file.
+            data (bytes): Chunk data.
+
+        Returns:
+            Object: Completion handle as bytes once file is complete, empty bytes before, error code if unknown upload.
+        """
+        with self.__lock:
+            upload = self.__uploads.get(upload_id)
+            if upload is None:
+                return STUB_ERROR_NOT_FOUND
+            upload['chunks'][offset] = data
+            if sum(len(chunk) for chunk in upload['chunks'].values()) < upload['size']:
+                return b''
+            handle = self._new_handle()
+            self.__files[handle] = b''.join(upload['chunks'][key] for key in sorted(upload['chunks']))
+            del self.__uploads[upload_id]
+            return handle.encode('ascii')
+
+    def get_file_range(self, handle, byte_range):
+        """
+        Get byte range of stored file.
+
+        Args:
+            handle (str): Handle of file node.
+            byte_range (str): Inclusive byte range. ie: "0-1023"
+
+        Returns:
+            Bytes: Data of range, or None if file does not exist.
+        """
+        start, _, end = byte_range.partition('-')
+        with self.__lock:
+            data = self.__files.get(handle)
+        return data[int(start):int(end) + 1] if data is not None else None
+
+    def handle_command(self, command):
+        """
+        Answer one API command.
+
+        Args:
+            command (dict): API command. ie: {"a": "uq"}
+
+        Returns:
+            Object: Command result, or negative int error code.
+        """
+        action = command.get('a')
+        with self.__lock:
+            if action == 'us0':
+                return {'v': 2, 's': _base64_url_encode(self.__salt)}
+            if action == 'us':
+                if command.get('user') != self.__username or command.get('uh') != self.__user_hash:
+                    return STUB_ERROR_NOT_FOUND
+                session_id = os.urandom(16)
+                return {'k': _base64_url_encode(AES.new(self.__password_key, AES.MODE_ECB).encrypt(self.__master_key)),
+                        'tsid': _base64_url_encode(session_id +
+                                                   AES.new(self.__master_key, AES.MODE_ECB).encrypt(session_id))}
+            if action == 'ug':
+                return {'u': self.__user_handle, 'email': self.__username}
+            if action == 'f':
+                return {'f': [dict(node) for node in self.__nodes]}
+            if action == 'uq':
+                return {'cstrg': sum(len(data) for data in self.__files.values()), 'mstrg': STUB_STORAGE_TOTAL}
+            if action == 'u':
+                upload_id = 'U%s' % self._new_handle()
+                self.__uploads[upload_id] = {'size': command.get('s', 0), 'chunks': {}}
+                return {'p': '%s/ul/%s' % (self.api_url, upload_id)}
+            if action == 'p':
+                if not any(node['h'] == command.get('t') for node in self.__nodes):
+                    return STUB_ERROR_NOT_FOUND
+                added = []
+                for new_node in command.get('n', []):
+                    if new_node['t'] == STUB_NODE_FILE and new_node['h'] not in self.__files:
+                        return STUB_ERROR_NOT_FOUND
+                    node = {'h': new_node['h'] if new_node['t'] == STUB_NODE_FILE else self._new_handle(),
+                            'p': command['t'], 't': new_node['t'], 'a': new_node['a'],
+                            'k': '%s:%s' % (self.__user_handle, new_node['k']), 'ts': int(time())}
+                    if new_node['t'] == STUB_NODE_FILE:
+                        node['s'] = len(self.__files[node['h']])
+                    self.__nodes.append(node)
+                    added.append(dict(node))
+                return {'f': added}
+            if action == 'g':
+                if command.get('n') not in self.__files:
+                    return STUB_ERROR_NOT_FOUND
+                return {'g': '%s/dl/%s' % (self.api_url, command['n']), 's': len(self.__files[command['n']])}
+            if action == 'd':
+                return self._remove_node(handle=command.get('n'))
+        return STUB_ERROR_ARGS
+
+    def start(self):
+        """
+        Serve requests in background thread.
+
+        Returns:
+            MegaApiStubServer: Returns self, started.
+        """
+        self.__thread = Thread(target=self.serve_forever, name='thread_mega_api_stub_server', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close listening socket.
+        """
+        self.shutdown()
+        self.server_close()
+        if self.__thread:
+            self.__thread.join()
+
+
+def main():
+    parser = ArgumentParser(description='In-memory stub of the MEGA API, for testing MegaApi_Lib.')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to listen on.')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on.')
+    parser.add_argument('--username', required=True, help='Username of stub account.')
+    parser.add_argument('--password', required=True, help='Password of stub account.')
+    args = parser.parse_args()
+
+    server = MegaApiStubServer(username=args.username, password=args.password, host=args.host, port=args.port)
+    print('MEGA API stub listening on %s' % server.api_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+##
+# Created by: Curtis Szmania
+# Date: 10/18/2026
+# Initial Creation.
+# Benchmark of ParallelWalker against os.walk, on a synthetic deep tree or an existing directory.
+#
+# Usage, from megamanager directory:
+#     python tools/walk_benchmark.py --depth 4 --fanout 6 --files 10 --latency-ms 2
+#     python tools/walk_benchmark.py --path /mnt/nas/pictures --workers 1 4 8 16
+###
+
+import os
+import sys
+from argparse import ArgumentParser
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs import parallel_walker_lib  # noqa: E402
+from libs.parallel_walker_lib import ParallelWalker  # noqa: E402
+
+__author__ = 'szmania'
+
+
+def create_tree(root_path, depth, fanout, files):
+    """
+    Create synthetic tree with fanout subdirectories per directory, depth levels deep, and files empty files in every
+    directory.
+
+    Args:
+        root_path (str): Directory to create tree in.
+        depth (int): Levels of subdirectories.
+        fanout (int): Subdirectories per directory.
+        files (int): Files per directory.
+
+    Returns:
+        Tuple: Number of directories and number of files created.
+    """
+    dir_count = 0
+    file_count = 0
+    pending = [(root_path, 0)]
+    while pending:
+        dir_path, level = pending.pop()
+        os.makedirs(dir_path, exist_ok=True)
+        dir_count += 1
+        for file_number in range(files):
+            open(os.path.join(dir_path, 'file_%d.jpg' % file_number), 'wb').close()
+            file_count += 1
+        if level < depth:
+            pending.extend((os.path.join(dir_path, 'dir_%d' % dir_number), level + 1) for dir_number in range(fanout))
+    return dir_count, file_count
+
+
+def add_latency(latency_seconds):
+    """
+    Delay every directory listing of os.walk and ParallelWalker, simulating a network mount.
+
+    Args:
+        latency_seconds (float): Seconds to delay each listing by.
+    """
+    scandir = os.scandir
+
+    def slow_scandir(dir_path='.'):
+        sleep(latency_seconds)
+        return scandir(dir_path)
+
+    os.scandir = slow_scandir
+    parallel_walker_lib.scandir = slow_scandir
+
+
+def walk_os(root_path):
+    """
+    List all files with os.walk, as MegaManager used to.
+
+    Args:
+        root_path (str): Root directory path.
+
+    Returns:
+        Integer: Number of files.
+    """
+    return sum(len(files) for dir_path, dir_names, files in os.walk(root_path))
+
+
+def walk_parallel(root_path, workers):
+    """
+    List all files with ParallelWalker.
+
+    Args:
+        root_path (str): Root directory path.
+        workers (int): Number of directories listed concurrently.
+
+    Returns:
+        Integer: Number of files.
+    """
+    return sum(1 for entry in ParallelWalker(workers=workers, log_level='ERROR').iter_files(root_path=root_path))
+
+
+def time_walk(walk, repeat):
+    """
+    Time walk function, keeping best of repeat runs.
+
+    Args:
+        walk (function): Function walking tree, returning number of files.
+        repeat (int): Number of runs.
+
+    Returns:
+        Tuple: Best time in seconds and number of files.
+    """
+    best_seconds = None
+    file_count = 0
+    for run in range(repeat):
+        start_time = perf_counter()
+        file_count = walk()
+        seconds = perf_counter() - start_time
+        best_seconds = seconds if best_seconds is None else min(best_seconds, seconds)
+    return best_seconds, file_count
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark ParallelWalker against os.walk.')
+    parser.add_argument('--path', help='Existing directory to walk, ie: a network mount. Synthetic tree if not given.')
+    parser.add_argument('--depth', type=int, default=4, help='Levels of subdirectories of synthetic tree.')
+    parser.add_argument('--fanout', type=int, default=6, help='Subdirectories per directory of synthetic tree.')
+    parser.add_argument('--files', type=int, default=10, help='Files per directory of synthetic tree.')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Milliseconds added to every directory listing, simulating a network mount.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='Worker counts of ParallelWalker to time.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per walker. Best time is kept.')
+    args = parser.parse_args()
+
+    temp_dir_path = None
+    root_path = args.path
+    if not root_path:
+        temp_dir_path = mkdtemp(prefix='walk_benchmark_')
+        root_path = os.path.join(temp_dir_path, 'tree')
+        dir_count, file_count = create_tree(root_path=root_path, depth=args.depth, fanout=args.fanout,
+                                            files=args.files)
+        print('Synthetic tree: {} directories, {} files, depth {}.'.format(dir_count, file_count, args.depth))
+    if args.latency_ms:
+        add_latency(latency_seconds=args.latency_ms / 1000.0)
+        print('Added {} ms latency per directory listing.'.format(args.latency_ms))
+
+    try:
+        base_seconds, base_file_count = time_walk(walk=lambda: walk_os(root_path=root_path), repeat=args.repeat)
+        print('{:<24}{:>10.3f} s{:>10} files'.format('os.walk', base_seconds, base_file_count))
+        for workers in args.workers:
+            seconds, file_count = time_walk(walk=lambda: walk_parallel(root_path=root_path, workers=workers),
+                                            repeat=args.repeat)
+            print('{:<24}{:>10.3f} s{:>10} files{:>8.1f}x'.format('ParallelWalker({})'.format(workers), seconds,
+                                                                   file_count, base_seconds / seconds))
+    finally:
+        if temp_dir_path:
+            rmtree(temp_dir_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,7 @@ setup(
     python_requires='>=3.10',
     packages=["megamanager"],
     install_requires=['numpy', 'psutil'],
+    extras_require={'mega_api': ['pycryptodome']},
     entry_points={
         'console_scripts': [
             'megamanager = megamanager.__main__:main',